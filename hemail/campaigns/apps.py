@@ -1,5 +1,4 @@
 from django.apps import AppConfig
-from watson import search as watson
 
 
 class CampaignsConfig(AppConfig):
@@ -9,9 +8,10 @@ class CampaignsConfig(AppConfig):
     def ready(self) -> None:
         # noinspection PyUnresolvedReferences
         from .signals import handlers  # noqa
+        from . import search
 
         from django_mailbox.models import Message
-        watson.register(Message, fields=(
+        search.register(Message, fields=(
             'subject',
             'from_header',
             'to_header',
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Contact, ContactList, Note
+from .models import Contact, ContactList, Note, Segment
 
 
 class NoteInline(admin.StackedInline):
@@ -26,6 +26,13 @@ class ContactListAdmin(admin.ModelAdmin):
     filter_vertical = ('contacts',)
 
 
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'refreshed',
+    )
+
+
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
     list_display = ('id', 'topic', 'author', 'created', 'private')
@@ -1,5 +1,4 @@
 from django.apps import AppConfig
-from watson import search as watson
 
 
 class ContactsConfig(AppConfig):
@@ -8,9 +7,12 @@ class ContactsConfig(AppConfig):
 
     def ready(self) -> None:
         super().ready()
+        # noinspection PyUnresolvedReferences
+        from . import signals  # noqa
+        from .. import search
 
         Contact = self.get_model('Contact')
-        watson.register(Contact, fields=(
+        search.register(Contact, fields=(
             'email',
             'title',
             'company_name',
@@ -23,7 +25,7 @@ class ContactsConfig(AppConfig):
         ))
 
         Note = self.get_model('Note')
-        watson.register(Note, fields=(
+        search.register(Note, fields=(
             'topic',
             'content',
         ))
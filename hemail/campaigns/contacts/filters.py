@@ -1,6 +1,6 @@
 import django_filters
 
-from common.filters import NumberInAllFilter, NumberInAnyFilter, SearchFilter
+from common.filters import NumberInAllFilter, NumberInAnyFilter, NumberNotInFilter, SearchFilter
 from .models import Contact, Note
 
 
@@ -9,9 +9,13 @@ class ContactsFilter(django_filters.FilterSet):
 
     campaigns__in = NumberInAnyFilter(name='campaigns')
     campaigns = NumberInAllFilter(name='campaigns')
+    campaigns__not_in = NumberNotInFilter(name='campaigns')
 
     lists__in = NumberInAnyFilter(name='lists')
     lists = NumberInAllFilter(name='lists')
+    lists__not_in = NumberNotInFilter(name='lists')
+
+    segments__in = NumberInAnyFilter(name='segments')
 
     class Meta:
         model = Contact
@@ -0,0 +1,66 @@
+from typing import Iterable, List, Optional, Sequence
+
+from django.db import connections, models
+from django.db.models.signals import post_save
+
+
+class ContactQuerySet(models.QuerySet):
+
+    def upsert(self, contacts: Sequence['Contact'],
+               update_fields: Optional[Iterable[str]] = None) -> List[Optional[bool]]:
+        """
+        Writes contacts with a single `INSERT ... ON CONFLICT (email)` statement. Contacts which already exist
+        get only `update_fields` overwritten, or are left untouched if `update_fields` is None.
+        Emails have to be unique within the batch.
+
+        Returns for each contact whether it was created (True), updated (False) or skipped (None),
+        primary keys of written contacts are set.
+        """
+        if not contacts:
+            return []
+
+        self._for_write = True
+        connection = connections[self.db]
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+
+        fields = [field for field in opts.concrete_fields if not isinstance(field, models.AutoField)]
+        params = []
+        for contact in contacts:
+            params.extend(field.get_db_prep_save(field.pre_save(contact, True), connection) for field in fields)
+
+        if update_fields is None:
+            on_conflict = 'DO NOTHING'
+        else:
+            update_columns = [opts.get_field(name).column for name in sorted(set(update_fields) | {'updated'})]
+            on_conflict = 'DO UPDATE SET %s' % ', '.join('%s = EXCLUDED.%s' % (qn(c), qn(c)) for c in update_columns)
+
+        row_placeholder = '(%s)' % ', '.join(['%s'] * len(fields))
+        sql = 'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) %s RETURNING %s, %s, (xmax = 0)' % (
+            qn(opts.db_table),
+            ', '.join(qn(field.column) for field in fields),
+            ', '.join([row_placeholder] * len(contacts)),
+            qn(opts.get_field('email').column),
+            on_conflict,
+            qn(opts.pk.column),
+            qn(opts.get_field('email').column),
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            written = {email: (pk, created) for pk, email, created in cursor.fetchall()}
+
+        results = []
+        for contact in contacts:
+            if contact.email not in written:
+                results.append(None)
+                continue
+            contact.pk, created = written[contact.email]
+            contact._state.adding = False
+            contact._state.db = self.db
+            post_save.send(sender=contact.__class__, instance=contact, created=created, using=self.db)
+            results.append(created)
+        return results
+
+
+ContactManager = ContactQuerySet.as_manager
@@ -0,0 +1,28 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('contacts', '0006_auto_20180319_1859'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('refreshed', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('name', models.TextField(unique=True)),
+                ('filters', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict)),
+                ('contacts', models.ManyToManyField(blank=True, editable=False, related_name='segments',
+                                                    to='contacts.Contact')),
+            ],
+            options={
+                'verbose_name': 'Segment',
+                'verbose_name_plural': 'Segments',
+            },
+        ),
+    ]
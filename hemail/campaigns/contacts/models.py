@@ -1,9 +1,15 @@
+from typing import Iterable, Optional, Tuple
+
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.fields import JSONField
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, models
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
 from common.fields import TimeZoneField
+from .managers import ContactManager
 
 
 class Address(models.Model):
@@ -31,6 +37,8 @@ class Contact(Address, models.Model):
     phone_number = PhoneNumberField(blank=True)
     blacklisted = models.BooleanField(default=False)
 
+    objects = ContactManager()
+
     def __str__(self) -> str:
         return ' '.join(filter(None, [str(self.email), self.first_name, self.last_name]))
 
@@ -51,6 +59,82 @@ class ContactList(models.Model):
         return self.name
 
 
+class Segment(models.Model):
+    """
+    Saved filter of contacts (query parameters of `ContactsFilter`) with materialized set of matching contacts.
+    Members are refreshed as a whole once the segment is saved with new filters.
+    """
+    # segments are refreshed once contacts are committed, before they are indexed for search
+    not_allowed_filters = ('search', 'segments__in',)
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    refreshed = models.DateTimeField(blank=True, null=True, editable=False)
+
+    name = models.TextField(unique=True)
+    filters = JSONField(default=dict, blank=True)
+    contacts = models.ManyToManyField(Contact, related_name='segments', blank=True, editable=False)
+
+    class Meta:
+        verbose_name = _('Segment')
+        verbose_name_plural = _('Segments')
+
+    def __str__(self) -> str:
+        return self.name
+
+    def clean(self) -> None:
+        try:
+            self.validate_filters(self.filters)
+        except ValidationError as e:
+            raise ValidationError({'filters': e.messages})
+
+    @classmethod
+    def validate_filters(cls, filters) -> None:
+        from .filters import ContactsFilter
+
+        if not isinstance(filters, dict) or not all(isinstance(param, str) for param in filters.values()):
+            raise ValidationError(_('Filters should be an object of query parameters.'))
+        unknown = set(filters) - set(ContactsFilter.base_filters) | set(filters) & set(cls.not_allowed_filters)
+        if unknown:
+            raise ValidationError(_('Unsupported filters: %s.') % ', '.join(sorted(unknown)))
+
+        form = ContactsFilter(data=filters, queryset=Contact.objects.none()).form
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+
+    def filter(self, queryset: models.QuerySet) -> models.QuerySet:
+        from .filters import ContactsFilter
+
+        return ContactsFilter(data=self.filters, queryset=queryset).qs
+
+    def refresh(self, contact_ids: Optional[Iterable[int]] = None) -> Tuple[int, int]:
+        """
+        Brings members up to date with the filter, only given contacts are rechecked if they are passed.
+        Returns numbers of added and removed members.
+        """
+        using = self._state.db or DEFAULT_DB_ALIAS
+        through = Segment.contacts.through
+        contacts = Contact.objects.using(using).all()
+        members = through.objects.using(using).filter(segment_id=self.pk)
+        if contact_ids is not None:
+            contact_ids = set(contact_ids)
+            contacts = contacts.filter(pk__in=contact_ids)
+            members = members.filter(contact_id__in=contact_ids)
+
+        matched = set(self.filter(contacts).values_list('pk', flat=True))
+        current = set(members.values_list('contact_id', flat=True))
+        stale, new = current - matched, matched - current
+        if stale:
+            members.filter(contact_id__in=stale).delete()
+        through.objects.using(using).bulk_create(
+            [through(segment_id=self.pk, contact_id=pk) for pk in new], batch_size=1000)
+
+        if contact_ids is None:
+            self.refreshed = now()
+            Segment.objects.using(using).filter(pk=self.pk).update(refreshed=self.refreshed)
+        return len(new), len(stale)
+
+
 class Note(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
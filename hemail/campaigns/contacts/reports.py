@@ -0,0 +1,65 @@
+import csv
+from itertools import islice
+from typing import Any, Iterator, List
+
+from django.db import models
+from rest_framework import serializers
+
+
+class _Echo(object):
+    """
+    File-like object which returns what is written, so the csv writer gives back the lines it formats.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class ContactsCsvReport(object):
+    """
+    CSV rows of contacts with readable fields of the serializer, formatted by the fields as the list would be.
+    Contacts are read with a server-side cursor by chunks of `chunk_size` rows without creating model instances,
+    ids of related objects (e.g. lists and campaigns) are queried per chunk and joined into a single column.
+    """
+    chunk_size = 2000
+    related_separator = ','
+
+    def __init__(self, queryset: models.QuerySet, serializer: serializers.Serializer, **kwargs) -> None:
+        self.queryset = queryset
+        self.chunk_size = kwargs.pop('chunk_size', self.chunk_size)
+        fields = list(serializer._readable_fields)
+        self.related_fields = [field for field in fields if isinstance(field, serializers.ManyRelatedField)]
+        self.fields = [field for field in fields if field not in self.related_fields]
+        self.header = [field.field_name for field in fields]
+
+    def __iter__(self) -> Iterator[str]:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.header)
+
+        values = self.queryset.values_list('pk', *[field.source for field in self.fields]).iterator(
+            chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(values, self.chunk_size))
+            if not chunk:
+                return
+            for row in self._to_rows(chunk):
+                yield writer.writerow(row)
+
+    def _to_rows(self, chunk: List[tuple]) -> Iterator[List[Any]]:
+        related = [self._get_related(field, [values[0] for values in chunk]) for field in self.related_fields]
+        for values in chunk:
+            row = {
+                field.field_name: '' if value is None else field.to_representation(value)
+                for field, value in zip(self.fields, values[1:])
+            }
+            for field, ids in zip(self.related_fields, related):
+                row[field.field_name] = self.related_separator.join(str(pk) for pk in ids.get(values[0], ()))
+            yield [row[name] for name in self.header]
+
+    def _get_related(self, field: serializers.ManyRelatedField, pks: List[int]) -> dict:
+        related = dict()
+        for pk, related_pk in self.queryset.model._default_manager.filter(pk__in=pks).filter(**{
+            field.source + '__isnull': False,
+        }).order_by(field.source).values_list('pk', field.source):
+            related.setdefault(pk, []).append(related_pk)
+        return related
@@ -0,0 +1,33 @@
+from functools import partial
+from typing import Iterable
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from common.transactions import on_commit_batch
+from .models import Segment
+
+
+def refresh_segments(contact_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Rechecks memberships of the contacts in all segments, so only changed contacts are filtered again.
+    """
+    contact_ids = set(contact_ids)
+    if not contact_ids:
+        return
+    for segment in Segment.objects.using(using).all():
+        segment.refresh(contact_ids)
+
+
+def _queue_segments_refresh(tenant_id: int, contact_ids: Iterable[int]) -> None:
+    from ..tasks import refresh_segments_task
+
+    refresh_segments_task.delay(tenant_id, sorted(contact_ids))
+
+
+def mark_contacts_dirty(contact_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Segments are refreshed for the contacts by a background task queued once the transaction is committed,
+    all contacts marked within the same transaction are refreshed by a single task.
+    """
+    tenant_id = transaction.get_connection(using).tenant.id
+    on_commit_batch(('contacts.segments', tenant_id), partial(_queue_segments_refresh, tenant_id), contact_ids, using)
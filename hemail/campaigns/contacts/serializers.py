@@ -1,15 +1,19 @@
 from typing import Optional
 
 import rest_framework_bulk
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django_countries import countries
 from rest_framework import serializers
 from rest_framework.fields import CurrentUserDefault, Field, empty
 
 from common.serializers import PhoneNumberField, nested_view_contextual_default
-from .models import Contact, ContactList, Note
+from .models import Contact, ContactList, Note, Segment
 
 
 def get_region(field: Field) -> Optional[str]:
+    if 'region' in field.context:
+        # region was resolved in advance, e.g. for imports running in background
+        return field.context['region']
     request = field.context['request']
     if request.user.profile.country:
         return request.user.profile.country.code
@@ -65,6 +69,26 @@ class ContactListSerializer(rest_framework_bulk.BulkSerializerMixin, serializers
         fields = ('id', 'name', 'contacts_count', 'contacts')
 
 
+class SegmentSerializer(serializers.ModelSerializer):
+    contacts_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Segment
+        fields = ('id', 'name', 'filters', 'contacts_count', 'created', 'updated', 'refreshed',)
+        read_only_fields = ('created', 'updated', 'refreshed',)
+
+    def validate_filters(self, value):
+        try:
+            Segment.validate_filters(value)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict if hasattr(e, 'error_dict') else e.messages)
+        return value
+
+
+class SegmentSourceSerializer(serializers.Serializer):
+    segment = serializers.PrimaryKeyRelatedField(queryset=Segment.objects.all())
+
+
 class NestedContactListContactSerializer(ContactSerializer):
 
     def __init__(self, instance=None, data=empty, **kwargs) -> None:
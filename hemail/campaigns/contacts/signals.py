@@ -0,0 +1,43 @@
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Contact, ContactList, Segment
+from .segments import mark_contacts_dirty
+
+
+@receiver(post_save, sender=Contact)
+def _segments_check_on_contact_save(sender, instance: Contact, using: str, **kwargs) -> None:
+    mark_contacts_dirty([instance.pk], using)
+
+
+@receiver(m2m_changed, sender=ContactList.contacts.through)
+def _segments_check_on_lists_change(sender, instance, action: str, reverse: bool, pk_set, using: str,
+                                    **kwargs) -> None:
+    if reverse:
+        # lists of the contact were changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            mark_contacts_dirty([instance.pk], using)
+    elif action in ('post_add', 'post_remove'):
+        mark_contacts_dirty(pk_set, using)
+    elif action == 'pre_clear':
+        mark_contacts_dirty(instance.contacts.using(using).values_list('pk', flat=True), using)
+
+
+@receiver(pre_delete, sender=ContactList)
+def _segments_check_on_list_delete(sender, instance: ContactList, using: str, **kwargs) -> None:
+    # memberships of the deleted list are removed without m2m_changed signals
+    mark_contacts_dirty(instance.contacts.using(using).values_list('pk', flat=True), using)
+
+
+@receiver(pre_save, sender=Segment)
+def _segment_filters_check(sender, instance: Segment, raw: bool, using: str, **kwargs) -> None:
+    instance.filters_changed = not raw and (instance.pk is None or not Segment.objects.using(using).filter(
+        pk=instance.pk, filters=instance.filters).exists())
+
+
+@receiver(post_save, sender=Segment)
+def _segment_refresh_on_filters_change(sender, instance: Segment, using: str, **kwargs) -> None:
+    if not getattr(instance, 'filters_changed', False):
+        return
+    instance.filters_changed = False
+    instance.refresh()
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from rest_framework import status
+
+from tenancy.test.cases import TenantsAPIRequestFactory, TenantsTestCase
+from ...tasks import refresh_segments_task
+from ..models import Contact, ContactList, Segment
+from ..views import ContactListViewSet, SegmentViewSet
+
+
+class SegmentTestCase(TenantsTestCase):
+    auto_create_schema = True
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = cls.create_superuser('first', 'test@one.com', 'p', tenant=0)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.set_tenant(0)
+        cls.user.delete()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        # saved contacts are indexed by a background task once committed
+        index_patcher = patch('campaigns.tasks.update_search_index_task.delay')
+        index_patcher.start()
+        self.addCleanup(index_patcher.stop)
+        # segments are refreshed by a background task as well, it is run at once
+        refresh_patcher = patch('campaigns.tasks.refresh_segments_task.delay', side_effect=refresh_segments_task)
+        self.refresh_mock = refresh_patcher.start()
+        self.addCleanup(refresh_patcher.stop)
+
+    def test_segment_is_created_with_members(self) -> None:
+        self.set_tenant(0)
+
+        french = Contact.objects.create(email='french@example.com', country='France', company_name='Acme')
+        Contact.objects.create(email='blacklisted@example.com', country='France', blacklisted=True)
+        Contact.objects.create(email='german@example.com', country='Germany')
+
+        factory = TenantsAPIRequestFactory(force_authenticate=self.user)
+        request = factory.post('', dict(name='french', filters=dict(country='France', blacklisted='false')),
+                               format='json')
+        response = SegmentViewSet.as_view({'post': 'create'})(request)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, str(response.data))
+        segment = Segment.objects.get(pk=response.data['id'])
+        self.assertEqual([french.pk], list(segment.contacts.values_list('pk', flat=True)))
+        self.assertIsNotNone(segment.refreshed)
+
+    def test_unsupported_filters_are_rejected(self) -> None:
+        self.set_tenant(0)
+
+        factory = TenantsAPIRequestFactory(force_authenticate=self.user)
+        for filters in [dict(search='bond'), dict(unknown='value'), dict(lists='one')]:
+            request = factory.post('', dict(name='invalid', filters=filters), format='json')
+            response = SegmentViewSet.as_view({'post': 'create'})(request)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, str(filters))
+            self.assertIn('filters', response.data)
+
+    def test_members_are_refreshed_when_filters_change(self) -> None:
+        self.set_tenant(0)
+
+        french = Contact.objects.create(email='french@example.com', country='France')
+        german = Contact.objects.create(email='german@example.com', country='Germany')
+        segment = Segment.objects.create(name='french', filters=dict(country='France'))
+        self.assertEqual([french.pk], list(segment.contacts.values_list('pk', flat=True)))
+
+        segment.name = 'renamed'
+        with patch.object(Segment, 'refresh') as refresh:
+            segment.save()
+        refresh.assert_not_called()
+
+        segment.filters = dict(country='Germany')
+        segment.save()
+        self.assertEqual([german.pk], list(segment.contacts.values_list('pk', flat=True)))
+
+    def test_unsupported_filters_are_not_cleaned(self) -> None:
+        self.set_tenant(0)
+
+        with self.assertRaises(ValidationError) as context:
+            Segment(name='invalid', filters=dict(search='bond')).full_clean()
+        self.assertIn('filters', context.exception.message_dict)
+
+    def test_members_are_refreshed_for_changed_contacts(self) -> None:
+        self.set_tenant(0)
+
+        contact_list = ContactList.objects.create(name='vip')
+        segment = Segment.objects.create(name='french vip', filters=dict(country='France', lists=str(contact_list.pk)))
+        french = Contact.objects.create(email='french@example.com', country='France')
+        other = Contact.objects.create(email='other@example.com', country='Germany')
+        contact_list.contacts.add(french, other)
+        self.run_on_commit()
+        self.assertEqual([french.pk], list(segment.contacts.values_list('pk', flat=True)))
+
+        other.country = 'France'
+        other.save()
+        french.lists.clear()
+        self.refresh_mock.reset_mock()
+        self.run_on_commit()
+
+        self.refresh_mock.assert_called_once_with(self.get_current_tenant().id, sorted([french.pk, other.pk]))
+        self.assertEqual([other.pk], list(segment.contacts.values_list('pk', flat=True)))
+
+    def test_members_are_refreshed_when_list_is_deleted(self) -> None:
+        self.set_tenant(0)
+
+        contact_list = ContactList.objects.create(name='vip')
+        segment = Segment.objects.create(name='vip', filters=dict(lists=str(contact_list.pk)))
+        contact = Contact.objects.create(email='vip@example.com')
+        contact_list.contacts.add(contact)
+        self.run_on_commit()
+        self.assertEqual([contact.pk], list(segment.contacts.values_list('pk', flat=True)))
+
+        contact_list.delete()
+        self.refresh_mock.reset_mock()
+        self.run_on_commit()
+
+        self.refresh_mock.assert_called_once_with(self.get_current_tenant().id, [contact.pk])
+        self.assertFalse(segment.contacts.exists())
+
+    def test_segment_is_added_to_list(self) -> None:
+        self.set_tenant(0)
+
+        first = Contact.objects.create(email='first@example.com', country='France')
+        second = Contact.objects.create(email='second@example.com', country='France')
+        segment = Segment.objects.create(name='french', filters=dict(country='France'))
+        contact_list = ContactList.objects.create(name='target')
+        contact_list.contacts.add(first)
+
+        factory = TenantsAPIRequestFactory(force_authenticate=self.user)
+        request = factory.post('', dict(segment=segment.pk), format='json')
+        response = ContactListViewSet.as_view({'post': 'add_segment'})(request, pk=contact_list.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, str(response.data))
+        self.assertEqual(1, response.data['added'])
+        self.assertSetEqual({first.pk, second.pk}, set(contact_list.contacts.values_list('pk', flat=True)))
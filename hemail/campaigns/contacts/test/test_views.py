@@ -1,4 +1,6 @@
+import csv
 import json
+from unittest.mock import patch
 from urllib.parse import urlencode, urljoin
 
 from django.test import modify_settings
@@ -9,6 +11,7 @@ from tenant_schemas.test.client import TenantClient
 
 from tenancy.test.cases import TenantsAPIRequestFactory, TenantsRequestFactory, TenantsTestCase
 from ...contacts.models import Contact, ContactList
+from ...contacts.reports import ContactsCsvReport
 from ...contacts.views import ContactViewSet, NestedContactListContactViewSet
 
 
@@ -231,6 +234,69 @@ class ContactViewTestCase(TenantsTestCase):
         self.assertEqual(1, len(contacts_data))
         self.assertEqual(second_contact.id, contacts_data[0]['id'])
 
+    def test_contact_by_lists_set_operations(self) -> None:
+        self.set_tenant(0)
+
+        first_contact = Contact.objects.create(email='first@example.com')
+        second_contact = Contact.objects.create(email='second@example.com')
+        third_contact = Contact.objects.create(email='third@example.com')
+        fourth_contact = Contact.objects.create(email='fourth@example.com')
+
+        first_list = ContactList.objects.create(name='first list')
+        first_list.contacts.add(first_contact, second_contact, fourth_contact)
+        second_list = ContactList.objects.create(name='second list')
+        second_list.contacts.add(second_contact, fourth_contact)
+        third_list = ContactList.objects.create(name='third list')
+        third_list.contacts.add(fourth_contact)
+
+        factory = TenantsAPIRequestFactory(force_authenticate=self.user)
+
+        def filter_ids(**query) -> set:
+            response = ContactViewSet.as_view({'get': 'list'})(factory.get('', query))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, str(response.data))
+            return {c['id'] for c in response.data}
+
+        self.assertSetEqual({second_contact.id},
+                            filter_ids(lists='%d,%d' % (first_list.id, second_list.id)))
+        self.assertSetEqual({second_contact.id},
+                            filter_ids(lists='%d,%d,%d' % (first_list.id, second_list.id, first_list.id)))
+        self.assertSetEqual({fourth_contact.id},
+                            filter_ids(lists='%d,%d,%d' % (first_list.id, second_list.id, third_list.id)))
+        self.assertSetEqual({second_contact.id},
+                            filter_ids(lists__in=second_list.id, lists__not_in=third_list.id))
+        self.assertSetEqual({first_contact.id, third_contact.id},
+                            filter_ids(lists__not_in=second_list.id))
+
+    @patch.object(ContactsCsvReport, 'chunk_size', 1)
+    def test_reports_are_streamed(self) -> None:
+        self.set_tenant(0)
+
+        first_contact = Contact.objects.create(email='first@example.com', first_name='First',
+                                               phone_number='+13108487864')
+        second_contact = Contact.objects.create(email='second@example.com', first_name='Second')
+        Contact.objects.create(email='third@example.com', first_name='Third')
+        first_list = ContactList.objects.create(name='first list')
+        first_list.contacts.add(first_contact, second_contact)
+        second_list = ContactList.objects.create(name='second list')
+        second_list.contacts.add(first_contact)
+
+        factory = TenantsAPIRequestFactory(force_authenticate=self.user)
+        request = factory.get('', dict(lists__in=first_list.id, ordering='email'))
+        response = ContactViewSet.as_view({'get': 'reports'})(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual('attachment; filename=contacts.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+
+        self.assertEqual(['first@example.com', 'second@example.com'], [row['email'] for row in rows])
+        self.assertEqual(str(first_contact.id), rows[0]['id'])
+        self.assertEqual('First', rows[0]['first_name'])
+        self.assertEqual('+13108487864', rows[0]['phone_number'])
+        self.assertEqual('%d,%d' % (first_list.id, second_list.id), rows[0]['lists'])
+        self.assertEqual(str(first_list.id), rows[1]['lists'])
+        self.assertEqual('', rows[1]['campaigns'])
+
     def test_partial_bulk_update(self) -> None:
         self.set_tenant(0)
 
@@ -1,18 +1,23 @@
 import rest_framework_bulk
-from django.db import models
+from django.db import models, transaction
+from django.http import StreamingHttpResponse
 from django_filters import rest_framework
-from rest_framework import filters, permissions
-from rest_framework.decorators import list_route
+from rest_framework import filters, permissions, status, viewsets
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 from rest_framework.serializers import ALL_FIELDS
 from rest_framework_csv import renderers
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
+from common.viewsets import AtomicWritesMixin
 from .filters import ContactsFilter, NotesFilter
-from .models import Contact, ContactList, Note
+from .models import Contact, ContactList, Note, Segment
+from .reports import ContactsCsvReport
 from .serializers import (
     ContactListSerializer, ContactSerializer,
-    NestedContactListContactSerializer, NestedContactNoteSerializer
+    NestedContactListContactSerializer, NestedContactNoteSerializer,
+    SegmentSerializer, SegmentSourceSerializer,
 )
 
 
@@ -28,7 +33,9 @@ class ContactViewSet(rest_framework_bulk.BulkModelViewSet):
         renderer_classes=(renderers.CSVRenderer,)
     )
     def reports(self, request):
-        response = self.list(request)
+        # all filtered contacts are written while they are read, so the report is not paginated
+        report = ContactsCsvReport(self.filter_queryset(self.get_queryset()), self.get_serializer())
+        response = StreamingHttpResponse(report, content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename=contacts.csv'
         return response
 
@@ -41,6 +48,30 @@ class ContactListViewSet(rest_framework_bulk.BulkModelViewSet):
     ordering_fields = ('name', 'contacts_count')
     ordering = ('name',)
 
+    @detail_route(methods=['post'])
+    def add_segment(self, request, pk: int) -> Response:
+        """
+        Adds current members of the segment to the list.
+        """
+        contact_list = self.get_object()
+        serializer = SegmentSourceSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        segment = serializer.validated_data['segment']
+
+        with transaction.atomic():
+            contacts_ids = list(segment.contacts.exclude(lists=contact_list).values_list('pk', flat=True))
+            contact_list.contacts.add(*contacts_ids)
+        return Response(dict(added=len(contacts_ids)), status=status.HTTP_200_OK)
+
+
+class SegmentViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
+    queryset = Segment.objects.annotate(contacts_count=models.Count('contacts'))
+    serializer_class = SegmentSerializer
+    permission_classes = (permissions.DjangoModelPermissions,)
+    filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ('name', 'contacts_count', 'refreshed')
+    ordering = ('name',)
+
 
 class NestedContactNotesViewSet(NestedViewSetMixin, rest_framework_bulk.BulkModelViewSet):
     queryset = Note.objects.all()
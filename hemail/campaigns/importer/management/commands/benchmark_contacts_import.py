@@ -0,0 +1,68 @@
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from campaigns.contacts.models import Contact
+from campaigns.importer.uploader import ContactsCsvImporter
+from files.models import FileUpload
+
+MODES = {
+    # every row is looked up and written on its own, as the importer used to do
+    'per-row': dict(chunk_size=1, staging=False),
+    'batched': dict(chunk_size=ContactsCsvImporter.chunk_size, staging=False),
+    'copy': dict(chunk_size=ContactsCsvImporter.chunk_size, staging=True),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compares speed of contacts import loaders on generated CSV file, all changes are rolled back.
+    Should be run within tenant schema: `manage.py tenant_command benchmark_contacts_import --schema=...`.
+    """
+
+    help = 'Measures rows per second of per-row, batched and COPY contacts import, changes are rolled back.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--rows', action='store', dest='rows', type=int, default=10000,
+                            help='Number of rows in generated file. Default is 10000.')
+        parser.add_argument('--existing', action='store', dest='existing', type=float, default=0.1,
+                            help='Fraction of rows which update existing contacts. Default is 0.1.')
+        parser.add_argument('--mode', action='append', dest='modes', choices=sorted(MODES),
+                            help='Loader to measure, could be repeated. All of them by default.')
+
+    def handle(self, *args, **options) -> None:
+        rows = options['rows']
+        if rows < 1:
+            raise CommandError('At least one row is required')
+        existing_every = int(1 / options['existing']) if options['existing'] > 0 else 0
+
+        content = b'first_name,last_name,email,company_name\n' + b''.join(
+            b'First%d,Last%d,benchmark-%d@example.com,Company%d\n' % (i, i, i, i % 100) for i in range(rows)
+        )
+        headers = dict(first_name=0, last_name=1, email=2, company_name=3)
+
+        for mode in options['modes'] or list(MODES):
+            loader = dict(MODES[mode])
+            staging = loader.pop('staging')
+            importer = ContactsCsvImporter(contact_serializer_context=dict(region=None), **loader)
+            # file is not saved, importer only reads it
+            file_upload = FileUpload(name='benchmark.csv', file=ContentFile(content, 'benchmark.csv'))
+
+            with transaction.atomic():
+                if existing_every:
+                    Contact.objects.bulk_create(
+                        Contact(email='benchmark-%d@example.com' % i) for i in range(0, rows, existing_every)
+                    )
+
+                start = time.monotonic()
+                result = importer.parse_and_import(file_upload, headers, has_headers=True, delimiter=',',
+                                                   staging=staging)
+                elapsed = time.monotonic() - start
+
+                transaction.set_rollback(True)
+
+            self.stdout.write('%-8s %8d rows in %8.3f sec: %10.1f rows/sec (%d created, %d updated, %d errors)' % (
+                mode, rows, elapsed, rows / elapsed, result.created, result.updated, len(result.errors),
+            ))
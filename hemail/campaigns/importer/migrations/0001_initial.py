@@ -0,0 +1,62 @@
+# Generated by Django 2.0.6 on 2018-07-12 12:00
+
+import django.contrib.postgres.fields.jsonb
+import django.db.models.deletion
+import enumfields.fields
+from django.conf import settings
+from django.db import migrations, models
+
+import campaigns.importer.models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('files', '0003_auto_20180228_1507'),
+        ('contacts', '0006_auto_20180319_1859'),
+        ('campaigns', '0030_auto_20180615_1025'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactsImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('headers', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('options', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('region', models.CharField(blank=True, max_length=2)),
+                ('status', enumfields.fields.EnumField(default='QUEUED', enum=campaigns.importer.models.ImportJobStatus,
+                                                       max_length=32)),
+                ('status_description', models.TextField(blank=True)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('progress', models.FloatField(default=0, help_text='Fraction of the file which was read')),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('errors', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('eta', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                               related_name='+', to='campaigns.Campaign')),
+                ('contact_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                                   related_name='+', to='contacts.ContactList')),
+                ('failed_rows_file', models.ForeignKey(blank=True, null=True,
+                                                       on_delete=django.db.models.deletion.SET_NULL,
+                                                       related_name='+', to='files.FileUpload')),
+                ('file', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+',
+                                           to='files.FileUpload')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='contacts_import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'ContactsImportJob',
+                'verbose_name_plural': 'ContactsImportJobs',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
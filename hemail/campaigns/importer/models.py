@@ -0,0 +1,89 @@
+import enum
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+from enumfields import EnumField
+
+from files.models import FileUpload
+from ..contacts.models import ContactList
+from ..models import Campaign
+
+
+@enum.unique
+class ImportJobStatus(enum.Enum):
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    CANCELLED = 'CANCELLED'
+    FAILED = 'FAILED'
+    FINISHED = 'FINISHED'
+
+
+ACTIVE_IMPORT_JOB_STATUSES = (ImportJobStatus.QUEUED, ImportJobStatus.RUNNING,)
+RESUMABLE_IMPORT_JOB_STATUSES = (ImportJobStatus.CANCELLED, ImportJobStatus.FAILED,)
+
+
+class ContactsImportJob(models.Model):
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                              related_name='contacts_import_jobs')
+    file = models.ForeignKey(FileUpload, on_delete=models.SET_NULL, null=True, related_name='+')
+    headers = JSONField()
+    # keyword arguments of `ContactsCsvImporter.parse_and_import` except related objects
+    options = JSONField(default=dict)
+    campaign = models.ForeignKey(Campaign, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    contact_list = models.ForeignKey(ContactList, on_delete=models.SET_NULL, blank=True, null=True,
+                                     related_name='+')
+    # phone numbers region of the user who started the import
+    region = models.CharField(max_length=2, blank=True)
+
+    status = EnumField(ImportJobStatus, max_length=32, default=ImportJobStatus.QUEUED)
+    status_description = models.TextField(blank=True)
+
+    # checkpoint of the import: all rows before it are committed
+    rows = models.PositiveIntegerField(default=0)
+    progress = models.FloatField(default=0, help_text=_('Fraction of the file which was read'))
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    errors = JSONField(default=dict)
+    failed_rows_file = models.ForeignKey(FileUpload, on_delete=models.SET_NULL, blank=True, null=True,
+                                         related_name='+')
+
+    started = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    eta = models.DateTimeField(blank=True, null=True)
+
+    PROGRESS_FIELDS = ('rows', 'progress', 'created_count', 'updated_count', 'skipped_count', 'errors', 'eta',
+                       'updated',)
+
+    class Meta:
+        verbose_name = _('ContactsImportJob')
+        verbose_name_plural = _('ContactsImportJobs')
+        ordering = ('-created',)
+
+    def __str__(self) -> str:
+        return '%s (%s)' % (self.file, self.status.value)
+
+    @property
+    def errors_count(self) -> int:
+        return len(self.errors)
+
+    def get_checkpoint(self) -> 'ImportResult':
+        from .uploader import ImportResult
+
+        # keys of JSON objects are strings
+        errors = {int(num): error for num, error in self.errors.items()}
+        return ImportResult(self.created_count, self.updated_count, self.skipped_count, errors,
+                            self.failed_rows_file, self.rows)
+
+    def set_checkpoint(self, result: 'ImportResult', progress: float) -> None:
+        self.rows = result.rows
+        self.progress = progress
+        self.created_count = result.created
+        self.updated_count = result.updated
+        self.skipped_count = result.skipped
+        self.errors = result.errors
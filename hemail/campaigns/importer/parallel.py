@@ -0,0 +1,132 @@
+import io
+from collections import deque
+from typing import IO, Iterator, List, Optional, Tuple
+
+import billiard
+import unicodecsv
+
+# (row number, row, data, validated data, errors) as yielded by `ContactsCsvImporter._validate_rows`
+ValidatedRow = Tuple[int, Optional[List], Optional[dict], Optional[dict], Optional[dict]]
+
+# importer, headers indexes and csv format options of the running import, workers get them by forking
+_worker_context = None
+
+
+def is_splittable(encoding: str, quotechar: str) -> bool:
+    """
+    Files could be split by bytes only if line breaks and quotes are single bytes which never appear
+    inside of other characters, it is true for UTF-8 and single byte encodings.
+    """
+    return ('\n' + quotechar).encode(encoding) == ('\n' + quotechar).encode('ascii')
+
+
+def find_record_end(data: bytes, quotechar: bytes, in_quotes: bool = False, last: bool = True) -> int:
+    """
+    Returns position after the last (or the first) line break of `data` which is not inside a quoted field,
+    or -1 if there is no such line break. Escaped quotes are doubled, so quoting state is just
+    the parity of quotes met so far, as long as quotes are not used inside of unquoted fields.
+    """
+    if last:
+        # parity at the end of data, then going back from one line break to another
+        in_quotes ^= bool(data.count(quotechar) % 2)
+        end = len(data)
+        while True:
+            pos = data.rfind(b'\n', 0, end)
+            if pos < 0:
+                return -1
+            in_quotes ^= bool(data.count(quotechar, pos, end) % 2)
+            if not in_quotes:
+                return pos + 1
+            end = pos
+    else:
+        start = 0
+        while True:
+            pos = data.find(b'\n', start)
+            if pos < 0:
+                return -1
+            in_quotes ^= bool(data.count(quotechar, start, pos) % 2)
+            if not in_quotes:
+                return pos + 1
+            start = pos + 1
+
+
+def split_records(fp: IO[bytes], block_size: int, quotechar: bytes) -> Iterator[bytes]:
+    """
+    Reads the file by blocks of about `block_size` bytes, every block ends with a complete record.
+    Record longer than the block makes the block longer.
+    """
+    rest = b''
+    while True:
+        data = fp.read(block_size)
+        if not data:
+            if rest:
+                yield rest
+            return
+
+        block = rest + data
+        end = find_record_end(block, quotechar)
+        if end < 0:
+            rest = block
+            continue
+        rest = block[end:]
+        yield block[:end]
+
+
+def split_first_record(block: bytes, quotechar: bytes) -> Tuple[bytes, bytes]:
+    end = find_record_end(block, quotechar, last=False)
+    if end < 0:
+        return block, b''
+    return block[:end], block[end:]
+
+
+def _validate_block(block: bytes) -> Tuple[int, List[ValidatedRow]]:
+    importer, indexes, csv_format_opts = _worker_context
+    reader = unicodecsv.reader(io.BytesIO(block), **csv_format_opts)
+    rows = []
+    count = 0
+    for num, row, data, validated_data, errors in importer._validate_rows(reader, indexes):
+        count += 1
+        # valid rows are not needed to be sent back, only failed ones are written out
+        rows.append((num, row if errors is not None else None, data, validated_data, errors))
+    return count, rows
+
+
+def validate_in_parallel(importer, blocks: Iterator[bytes], indexes: dict, csv_format_opts: dict,
+                         processes: int, start: int = 0) -> Iterator[ValidatedRow]:
+    """
+    Parses and validates blocks of records in a pool of forked processes and yields rows in the order
+    of the file, so rows are numbered as if the file was read at once. Only a couple of blocks per process
+    are read ahead, so rows could be written while the following blocks are parsed.
+    Rows before `start` are yielded without data, as they would not be imported.
+    """
+    global _worker_context
+
+    _worker_context = (importer, indexes, csv_format_opts)
+    # billiard processes are allowed to fork from daemonic celery workers
+    pool = billiard.Pool(processes)
+    try:
+        pending = deque()
+
+        def submit() -> None:
+            block = next(blocks, None)
+            if block is not None:
+                pending.append(pool.apply_async(_validate_block, (block,)))
+
+        for _ in range(processes * 2):
+            submit()
+
+        offset = 0
+        while pending:
+            count, rows = pending.popleft().get()
+            submit()
+            for num, row, data, validated_data, errors in rows:
+                num += offset
+                if num < start:
+                    yield num, row, None, None, None
+                else:
+                    yield num, row, data, validated_data, errors
+            offset += count
+    finally:
+        pool.terminate()
+        pool.join()
+        _worker_context = None
@@ -0,0 +1,115 @@
+import datetime
+import enum
+import json
+import os
+import zipfile
+from collections import OrderedDict
+from typing import IO, Any, Iterator, List
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_end = object()
+
+
+class RowsReaderError(ValueError):
+    pass
+
+
+@enum.unique
+class ImportFileFormat(enum.Enum):
+    CSV = 'csv'
+    XLSX = 'xlsx'
+    JSONL = 'jsonl'
+
+    @classmethod
+    def guess(cls, name: str, mimetype: str = '') -> 'ImportFileFormat':
+        extension = os.path.splitext(name)[1].lower()
+        if extension == '.xlsx' or mimetype == XLSX_MIMETYPE:
+            return cls.XLSX
+        if extension in ('.jsonl', '.ndjson',) or mimetype in ('application/x-ndjson', 'application/jsonl',):
+            return cls.JSONL
+        return cls.CSV
+
+
+def cell_to_str(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # phone numbers and zip codes are often stored as numbers
+        return str(int(value))
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class XlsxRowsReader(object):
+    """
+    Rows of the first sheet of a workbook, which is opened in read-only mode, so rows are parsed from
+    the sheet while they are iterated instead of loading the whole workbook into memory.
+    """
+
+    def __init__(self, fp: IO[bytes]) -> None:
+        import openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            self.workbook = openpyxl.load_workbook(fp, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+            raise RowsReaderError("Not a valid XLSX file: %s" % e) from e
+        self.sheet = self.workbook.worksheets[0]
+        self.rows = 0
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for row in self.sheet.iter_rows():
+            self.rows += 1
+            yield [cell_to_str(cell.value) for cell in row]
+
+    @property
+    def progress(self) -> float:
+        # dimensions are taken from the sheet header, they could be missing
+        return min(self.rows / self.sheet.max_row, 1.0) if self.sheet.max_row else 0.0
+
+    def close(self) -> None:
+        self.workbook.close()
+
+
+class JsonLinesRowsReader(object):
+    """
+    Rows of a JSON Lines file, every line is an object (or an array of values). Keys of the first object
+    are the header, keys which are not in it are ignored. Nulls are read as empty values,
+    other values (e.g. lists of contact lists ids) are kept as they are.
+    """
+
+    def __init__(self, fp: IO[bytes], encoding: str) -> None:
+        self.fp = fp
+        self.encoding = encoding
+        self.lines = 0
+        self.header = None
+        # file is iterated only once, iterating it again would start from the beginning
+        self._records = self._read_records()
+        self._first = next(self._records, _end)
+        if isinstance(self._first, dict):
+            self.header = list(self._first.keys())
+
+    def _read_records(self) -> Iterator[Any]:
+        for line in self.fp:
+            self.lines += 1
+            line = line.decode(self.encoding).strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError as e:
+                raise RowsReaderError("Line %d: %s" % (self.lines, e)) from e
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        record = self._first
+        while record is not _end:
+            if isinstance(record, dict):
+                row = [record.get(key) for key in self.header or ()]
+            elif isinstance(record, list):
+                row = record
+            else:
+                raise RowsReaderError("Line %d: object or array is expected" % self.lines)
+            yield ['' if value is None else value for value in row]
+            record = next(self._records, _end)
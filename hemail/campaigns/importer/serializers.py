@@ -2,8 +2,10 @@ from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
-from common.serializers import ContextualPrimaryKeyRelatedField
+from common.serializers import ContextualPrimaryKeyRelatedField, EnumField
 from files.models import FileUpload
+from .models import ContactsImportJob, ImportJobStatus
+from .readers import ImportFileFormat
 from ..contacts.models import ContactList
 from ..contacts.serializers import ContactSerializer
 from ..models import Campaign
@@ -21,6 +23,36 @@ class ImportResultSerializer(serializers.Serializer):
     )
 
 
+class ContactsImportJobSerializer(serializers.ModelSerializer):
+    status = EnumField(ImportJobStatus, read_only=True)
+    errors_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ContactsImportJob
+        fields = (
+            'id',
+            'created',
+            'updated',
+            'file',
+            'campaign',
+            'contact_list',
+            'status',
+            'status_description',
+            'rows',
+            'progress',
+            'created_count',
+            'updated_count',
+            'skipped_count',
+            'errors_count',
+            'errors',
+            'failed_rows_file',
+            'started',
+            'finished',
+            'eta',
+        )
+        read_only_fields = fields
+
+
 class SniffQuerySerializer(serializers.Serializer):
     limit = serializers.IntegerField(required=False,
                                      default=5,
@@ -43,6 +75,18 @@ class FileUploadOptionsSerializer(serializers.Serializer):
     create_failed_rows_file = serializers.BooleanField(
         default=False,
         help_text=_('Generate and store file with rows that we failed to parse'))
+    staging = serializers.BooleanField(
+        default=False,
+        help_text=_('Load contacts through staging table, it is much faster for very large files '
+                    'but the import is done in one transaction'))
+    parallel = serializers.BooleanField(
+        default=False,
+        help_text=_('Parse and validate rows of large files in several processes'))
+    file_format = serializers.ChoiceField(
+        choices=[file_format.value for file_format in ImportFileFormat],
+        default=None,
+        allow_null=True,
+        help_text=_('Format of the file (CSV, XLSX or JSON Lines), by default it is guessed from the file name'))
     detailed_errors_limit = serializers.IntegerField(
         default=20,
         help_text=_('If case of errors response will contain only this number of detailed errors description'))
@@ -0,0 +1,193 @@
+import csv
+import io
+from typing import Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+from ..contacts.models import Contact, ContactList
+from ..models import Campaign, Participation, ParticipationStatus
+
+
+class ContactsStagingTable(object):
+    """
+    Unlogged table in the schema of the current tenant. Contacts are streamed into it with `COPY FROM STDIN`
+    and merged into the contacts table with set-based statements, all of them have to run in one transaction.
+    Every staged row carries all contact fields, so missing values are staged as field defaults.
+    With `lists` ids of contact lists of every row are staged as well, see `replace_lists`.
+    """
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS, lists: bool = False) -> None:
+        self.connection = connections[using]
+        self.name = 'importing_%s' % uuid4().hex
+        self.merged_name = '%s_merged' % self.name
+        self.fields = [field for field in Contact._meta.concrete_fields if not isinstance(field, models.AutoField)]
+        self.lists = lists
+        self.rows = 0
+
+    def __enter__(self) -> 'ContactsStagingTable':
+        qn = self.connection.ops.quote_name
+        columns = ', '.join('%s %s' % (qn(field.column), field.db_type(self.connection)) for field in self.fields)
+        if self.lists:
+            columns += ', lists integer[] NOT NULL'
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE UNLOGGED TABLE %s (num integer NOT NULL, %s)' % (qn(self.name), columns))
+            cursor.execute('CREATE UNLOGGED TABLE %s (id integer NOT NULL, created boolean NOT NULL)' % (
+                qn(self.merged_name)
+            ))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is not None:
+            # tables are gone with the rolled back transaction
+            return
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE %s, %s' % (qn(self.name), qn(self.merged_name)))
+
+    def copy(self, contacts: Iterable[Contact], contact_lists: Optional[Iterable[Iterable[int]]] = None) -> int:
+        """
+        Stages contacts, `contact_lists` are ids of lists of every contact and are required with `lists`.
+        """
+        qn = self.connection.ops.quote_name
+        buffer = io.StringIO()
+        # there are no nullable contact fields, so quoting everything keeps empty strings from becoming NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        columns = [qn(field.column) for field in self.fields]
+        if self.lists:
+            columns.append('lists')
+            rows = zip(contacts, contact_lists)
+        else:
+            rows = ((contact, None) for contact in contacts)
+
+        copied = 0
+        for contact, list_ids in rows:
+            values = [field.get_db_prep_save(field.pre_save(contact, True), self.connection) for field in self.fields]
+            if self.lists:
+                values.append('{%s}' % ','.join(str(pk) for pk in list_ids))
+            writer.writerow([self.rows + copied] + values)
+            copied += 1
+
+        buffer.seek(0)
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert('COPY %s (num, %s) FROM STDIN WITH (FORMAT csv)' % (
+                qn(self.name),
+                ', '.join(columns),
+            ), buffer)
+        self.rows += copied
+        return copied
+
+    def merge(self, update_fields: Optional[Iterable[str]] = None) -> Tuple[int, int]:
+        """
+        Inserts staged contacts, existing ones get only `update_fields` overwritten or are left untouched
+        if it is None. The latest row wins for repeated emails.
+        Returns numbers of created contacts and of other staged rows (updated or skipped ones).
+        """
+        qn = self.connection.ops.quote_name
+        opts = Contact._meta
+        columns = ', '.join(qn(field.column) for field in self.fields)
+        email = qn(opts.get_field('email').column)
+
+        if update_fields is None:
+            on_conflict = 'DO NOTHING'
+        else:
+            update_columns = [opts.get_field(name).column for name in sorted(set(update_fields) | {'updated'})]
+            on_conflict = 'DO UPDATE SET %s' % ', '.join('%s = EXCLUDED.%s' % (qn(c), qn(c)) for c in update_columns)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'WITH merged AS ('
+                ' INSERT INTO %(contacts)s (%(columns)s)'
+                ' SELECT DISTINCT ON (%(email)s) %(columns)s FROM %(staging)s ORDER BY %(email)s, num DESC'
+                ' ON CONFLICT (%(email)s) %(on_conflict)s'
+                ' RETURNING %(pk)s, (xmax = 0)'
+                ') INSERT INTO %(merged)s (id, created) SELECT * FROM merged' % dict(
+                    contacts=qn(opts.db_table),
+                    columns=columns,
+                    email=email,
+                    staging=qn(self.name),
+                    on_conflict=on_conflict,
+                    pk=qn(opts.pk.column),
+                    merged=qn(self.merged_name),
+                )
+            )
+            cursor.execute('SELECT count(*) FROM %s WHERE created' % qn(self.merged_name))
+            created = cursor.fetchone()[0]
+
+        return created, self.rows - created
+
+    def add_to_campaign(self, campaign: Campaign) -> int:
+        opts = Participation._meta
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (%s, %s, %s, %s, %s) SELECT now(), id, %%s, %%s, now() FROM %s'
+                ' ON CONFLICT (%s, %s) DO NOTHING' % (
+                    qn(opts.db_table),
+                    qn(opts.get_field('created').column),
+                    qn(opts.get_field('contact').column),
+                    qn(opts.get_field('campaign').column),
+                    qn(opts.get_field('status').column),
+                    qn(opts.get_field('activation').column),
+                    qn(self.merged_name),
+                    qn(opts.get_field('contact').column),
+                    qn(opts.get_field('campaign').column),
+                ),
+                [campaign.pk, ParticipationStatus.ACTIVE.value],
+            )
+            return cursor.rowcount
+
+    def replace_lists(self) -> None:
+        """
+        Replaces lists of merged contacts with lists of their latest staged rows, as the import without staging does.
+        """
+        through = Contact.lists.through
+        opts = through._meta
+        qn = self.connection.ops.quote_name
+        contact_opts = Contact._meta
+        names = dict(
+            through=qn(opts.db_table),
+            list=qn(opts.get_field('contactlist').column),
+            contact=qn(opts.get_field('contact').column),
+            contacts=qn(contact_opts.db_table),
+            pk=qn(contact_opts.pk.column),
+            email=qn(contact_opts.get_field('email').column),
+            staging=qn(self.name),
+            merged=qn(self.merged_name),
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %(through)s WHERE %(contact)s IN (SELECT id FROM %(merged)s)' % names)
+            cursor.execute(
+                'INSERT INTO %(through)s (%(list)s, %(contact)s)'
+                ' SELECT DISTINCT list_id, merged.id FROM ('
+                '  SELECT DISTINCT ON (%(email)s) %(email)s, lists FROM %(staging)s ORDER BY %(email)s, num DESC'
+                ' ) AS latest'
+                ' CROSS JOIN unnest(latest.lists) AS list_id'
+                ' JOIN %(contacts)s AS contact ON contact.%(email)s = latest.%(email)s'
+                ' JOIN %(merged)s AS merged ON merged.id = contact.%(pk)s' % names
+            )
+
+    def add_to_list(self, contact_list: ContactList) -> int:
+        through = ContactList.contacts.through
+        opts = through._meta
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (%s, %s) SELECT %%s, id FROM %s ON CONFLICT (%s, %s) DO NOTHING' % (
+                    qn(opts.db_table),
+                    qn(opts.get_field('contactlist').column),
+                    qn(opts.get_field('contact').column),
+                    qn(self.merged_name),
+                    qn(opts.get_field('contactlist').column),
+                    qn(opts.get_field('contact').column),
+                ),
+                [contact_list.pk],
+            )
+            return cursor.rowcount
+
+    def merged_ids(self, batch_size: int) -> Iterator[List[int]]:
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM %s ORDER BY id' % qn(self.merged_name))
+            for batch in iter(lambda: cursor.fetchmany(batch_size), []):
+                yield [pk for pk, in batch]
@@ -0,0 +1,146 @@
+import datetime
+import time
+from typing import Optional
+
+import unicodecsv
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from tenancy.utils import tenant_context_or_raise_reject
+from .models import ACTIVE_IMPORT_JOB_STATUSES, ContactsImportJob, ImportJobStatus
+from .readers import RowsReaderError
+from .serializers import ContactsImportJobSerializer
+from .uploader import ContactsCsvImporter, ImportResult, ParsingException
+
+logger = get_task_logger(__name__)
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def push_import_progress(job: ContactsImportJob) -> None:
+    from ..notifications.consumers import USER_CHANNEL
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(USER_CHANNEL.format(user_id=job.owner_id), dict(
+            type='import.progress',
+            job=dict(ContactsImportJobSerializer(instance=job).data),
+        ))
+    except Exception:
+        # progress is persisted anyway, so the import should not fail because of it
+        logger.warning("Failed to push progress of import job %d", job.pk, exc_info=True)
+
+
+def estimate_finish(started: float, started_progress: float, progress: float) -> Optional[datetime.datetime]:
+    done = progress - started_progress
+    if done <= 0:
+        return None
+    elapsed = time.monotonic() - started
+    return timezone.now() + datetime.timedelta(seconds=elapsed * (1.0 - progress) / done)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def import_contacts_task(tenant_id: int, job_id: int) -> Optional[str]:
+    """
+    Runs the import job from its checkpoint. Progress is committed with every chunk of contacts and pushed
+    to the owner, cancelled job is stopped before its next chunk is committed.
+    Atomic and staging imports are committed at once, so they are always started from the beginning.
+    """
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        runnable = ContactsImportJob.objects.filter(pk=job_id, status__in=ACTIVE_IMPORT_JOB_STATUSES).update(
+            status=ImportJobStatus.RUNNING,
+            status_description='',
+            started=timezone.now(),
+            finished=None,
+        )
+        if not runnable:
+            logger.info("[%d: %s]: import job %d is not active", tenant_id, tenant.schema_name, job_id)
+            return None
+
+        job = ContactsImportJob.objects.select_related('file', 'campaign', 'contact_list').get(pk=job_id)
+        atomic = job.options.get('atomic', False) or job.options.get('staging', False)
+        push_import_progress(job)
+
+        started = time.monotonic()
+        started_progress = 0.0 if atomic else job.progress
+
+        def on_chunk(result: ImportResult, progress: float) -> None:
+            jobs = ContactsImportJob.objects.filter(pk=job.pk)
+            if not atomic:
+                # cancellation waits for the chunk to be committed
+                jobs = jobs.select_for_update()
+            if jobs.values_list('status', flat=True).first() != ImportJobStatus.RUNNING:
+                raise ImportCancelled()
+
+            job.set_checkpoint(result, progress)
+            job.eta = estimate_finish(started, started_progress, progress)
+            if atomic:
+                # saving would lock the job until the whole import is committed
+                push_import_progress(job)
+            else:
+                job.save(update_fields=ContactsImportJob.PROGRESS_FIELDS)
+                transaction.on_commit(lambda: push_import_progress(job))
+
+        importer = ContactsCsvImporter(contact_serializer_context=dict(region=job.region or None))
+        try:
+            if job.file is None:
+                raise ParsingException("File was removed")
+
+            result = importer.parse_and_import(
+                job.file,
+                job.headers,
+                campaign=job.campaign,
+                contact_list=job.contact_list,
+                checkpoint=None if atomic else job.get_checkpoint(),
+                on_chunk=on_chunk,
+                **job.options
+            )
+        except ImportCancelled:
+            job.refresh_from_db()
+            push_import_progress(job)
+            logger.info("[%d: %s]: import job %d cancelled after %d rows",
+                        tenant_id, tenant.schema_name, job_id, job.rows)
+            return job.status.value
+        except (ParsingException, ValidationError, UnicodeDecodeError, unicodecsv.Error, RowsReaderError) as e:
+            # atomic import is rolled back, but errors of its rows are kept
+            errors = job.errors
+            job.refresh_from_db()
+            job.status = ImportJobStatus.FAILED
+            if isinstance(e, ValidationError):
+                job.status_description = 'Invalid rows were found, nothing was imported'
+                job.errors = errors
+            else:
+                job.status_description = str(e)
+            job.finished = timezone.now()
+            job.eta = None
+            job.save()
+            push_import_progress(job)
+            logger.info("[%d: %s]: import job %d failed: %s", tenant_id, tenant.schema_name, job_id, e)
+            return job.status.value
+        except Exception as e:
+            ContactsImportJob.objects.filter(pk=job_id).update(
+                status=ImportJobStatus.FAILED,
+                status_description=str(e),
+                finished=timezone.now(),
+                eta=None,
+            )
+            raise
+
+        job.set_checkpoint(result, 1.0)
+        job.failed_rows_file = result.failed_rows_file
+        job.status = ImportJobStatus.FINISHED
+        job.finished = timezone.now()
+        job.eta = None
+        job.save()
+        push_import_progress(job)
+
+        logger.info("[%d: %s]: import job %d finished: %d created, %d updated, %d skipped, %d errors",
+                    tenant_id, tenant.schema_name, job_id,
+                    result.created, result.updated, result.skipped, len(result.errors))
+        return job.status.value
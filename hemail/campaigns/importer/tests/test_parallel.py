@@ -0,0 +1,22 @@
+import io
+
+from django.test import SimpleTestCase
+
+from campaigns.importer.parallel import split_first_record, split_records
+
+
+class SplitRecordsTestCase(SimpleTestCase):
+
+    def test_blocks_end_with_records(self) -> None:
+        data = b'a,b\n"multi\nline, ""quoted""",c\nd,"e\n"\nf,g'
+
+        for block_size in range(1, len(data) + 1):
+            blocks = list(split_records(io.BytesIO(data), block_size, b'"'))
+            self.assertEqual(data, b''.join(blocks))
+            for block in blocks[:-1]:
+                self.assertEqual(0, block.count(b'"') % 2, blocks)
+                self.assertTrue(block.endswith(b'\n'), blocks)
+
+    def test_first_record(self) -> None:
+        self.assertTupleEqual((b'"a\nb",c\n', b'd\n'), split_first_record(b'"a\nb",c\nd\n', b'"'))
+        self.assertTupleEqual((b'a,b', b''), split_first_record(b'a,b', b'"'))
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+
+from campaigns.contacts.models import Contact
+from files.models import FileUpload
+from tenancy.test.cases import TenantsTestCase
+from ..models import ContactsImportJob, ImportJobStatus
+from ..tasks import import_contacts_task
+
+
+@patch('campaigns.importer.tasks.push_import_progress')
+class ImportContactsTaskTestCase(TenantsTestCase):
+    auto_create_schema = True
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = cls.create_superuser('first', 'test@one.com', 'p', tenant=0)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.user.delete()
+        super().tearDownClass()
+
+    def create_job(self, **kwargs) -> ContactsImportJob:
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'first_name,email,tel\na,a@gmail.com,\nb,b@mail.ru,wrong\nc,c@mail.ru,\nd,d@mail.ru,\n', 'test.csv'))
+        return ContactsImportJob.objects.create(
+            owner=self.user,
+            file=file_upload,
+            headers=dict(email=1, first_name=0, phone_number=2),
+            options=dict(has_headers=True, create_failed_rows_file=True),
+            **kwargs
+        )
+
+    def test_import(self, mock_push) -> None:
+        self.set_tenant(0)
+        job = self.create_job()
+
+        self.assertEqual('FINISHED', import_contacts_task(self.get_tenant(0).id, job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(ImportJobStatus.FINISHED, job.status)
+        self.assertEqual(4, job.rows)
+        self.assertEqual(1.0, job.progress)
+        self.assertEqual(3, job.created_count)
+        self.assertEqual(0, job.updated_count)
+        self.assertListEqual(['1'], list(job.errors.keys()))
+        self.assertIsNotNone(job.failed_rows_file)
+        self.assertIsNotNone(job.finished)
+        self.assertTrue(mock_push.called)
+
+    def test_resume_from_checkpoint(self, mock_push) -> None:
+        self.set_tenant(0)
+        job = self.create_job(
+            status=ImportJobStatus.QUEUED,
+            rows=2,
+            created_count=1,
+            errors={'1': {'phone_number': ['Enter a valid phone number.']}},
+        )
+
+        import_contacts_task(self.get_tenant(0).id, job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(ImportJobStatus.FINISHED, job.status)
+        self.assertEqual(4, job.rows)
+        self.assertEqual(3, job.created_count)
+        self.assertEqual(1, job.errors_count)
+        self.assertSetEqual({'c@mail.ru', 'd@mail.ru'}, set(Contact.objects.values_list('email', flat=True)))
+
+        with job.failed_rows_file.open() as f:
+            self.assertListEqual([b'first_name,email,tel\r\n', b'b,b@mail.ru,wrong\r\n'], f.readlines())
+
+    def test_cancelled_job_is_not_run(self, mock_push) -> None:
+        self.set_tenant(0)
+        job = self.create_job(status=ImportJobStatus.CANCELLED)
+
+        self.assertIsNone(import_contacts_task(self.get_tenant(0).id, job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(ImportJobStatus.CANCELLED, job.status)
+        self.assertFalse(Contact.objects.exists())
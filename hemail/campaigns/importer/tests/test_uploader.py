@@ -1,5 +1,7 @@
+import io
 from unittest.mock import MagicMock
 
+import openpyxl
 from django.core.files.base import ContentFile
 
 from campaigns.contacts.models import Contact, ContactList
@@ -187,3 +189,244 @@ class ContactUploaderTestCase(TenantsTestCase):
         self.assertSetEqual({
             'a@gmail.com', 'b@mail.ru',
         }, {c.email for c in contacts})
+
+    def test_import_in_chunks(self) -> None:
+        self.set_tenant(0)
+
+        existed = Contact.objects.create(email='existed@local.com', first_name='Bill', title='Dr.')
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'first_name,email\na,a@gmail.com\nb,b@mail.ru\nbob,existed@local.com\nc,c@mail.ru\n'
+            b'aa,a@gmail.com\nwrong,wrong\nd,d@mail.ru\n',
+            'test.csv'))
+
+        headers = dict(email=1, first_name=0)
+
+        campaign = Campaign.objects.create(name='testing', owner=self.user)
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+            chunk_size=2,
+        )
+
+        result = importer.parse_and_import(
+            file_upload,
+            headers,
+            has_headers=True,
+            campaign=campaign,
+        )
+
+        self.assertEqual(4, result.created)
+        self.assertEqual(2, result.updated)
+        self.assertEqual(0, result.skipped)
+        self.assertListEqual([5], list(result.errors.keys()))
+
+        existed.refresh_from_db()
+        self.assertEqual('bob', existed.first_name)
+        self.assertEqual('Dr.', existed.title)
+        self.assertEqual('aa', Contact.objects.get(email='a@gmail.com').first_name)
+        self.assertSetEqual({
+            'a@gmail.com', 'b@mail.ru', 'c@mail.ru', 'd@mail.ru', 'existed@local.com',
+        }, {c.email for c in campaign.contacts.all()})
+
+    def test_skip_existing_without_update(self) -> None:
+        self.set_tenant(0)
+
+        Contact.objects.create(email='existed@local.com', first_name='Bill')
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'first_name,email\na,a@gmail.com\nbob,existed@local.com\naa,a@gmail.com\n', 'test.csv'))
+
+        headers = dict(email=1, first_name=0)
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+        )
+
+        result = importer.parse_and_import(
+            file_upload,
+            headers,
+            has_headers=True,
+            allow_update=False,
+        )
+
+        self.assertEqual(1, result.created)
+        self.assertEqual(0, result.updated)
+        self.assertEqual(2, result.skipped)
+        self.assertEqual('Bill', Contact.objects.get(email='existed@local.com').first_name)
+        self.assertEqual('a', Contact.objects.get(email='a@gmail.com').first_name)
+
+    def test_import_through_staging_table(self) -> None:
+        self.set_tenant(0)
+
+        existed = Contact.objects.create(email='existed@local.com', first_name='Bill', title='Dr.')
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'first_name,email,tel\na,a@gmail.com,\nbob,existed@local.com,\nb,b@mail.ru,wrong\naa,a@gmail.com,\n',
+            'test.csv'))
+
+        headers = dict(email=1, first_name=0, phone_number=2)
+
+        campaign = Campaign.objects.create(name='testing', owner=self.user)
+        contact_list = ContactList.objects.create(name='very important list')
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+        )
+
+        result = importer.parse_and_import(
+            file_upload,
+            headers,
+            has_headers=True,
+            create_failed_rows_file=True,
+            campaign=campaign,
+            contact_list=contact_list,
+            staging=True,
+        )
+
+        self.assertEqual(1, result.created)
+        self.assertEqual(2, result.updated)
+        self.assertEqual(0, result.skipped)
+        self.assertListEqual([2], list(result.errors.keys()))
+        self.assertIsNotNone(result.failed_rows_file)
+
+        existed.refresh_from_db()
+        self.assertEqual('bob', existed.first_name)
+        self.assertEqual('Dr.', existed.title)
+        self.assertEqual('aa', Contact.objects.get(email='a@gmail.com').first_name)
+        self.assertSetEqual({'a@gmail.com', existed.email}, {c.email for c in campaign.contacts.all()})
+        self.assertSetEqual({'a@gmail.com', existed.email}, {c.email for c in contact_list.contacts.all()})
+
+    def test_import_lists_through_staging_table(self) -> None:
+        self.set_tenant(0)
+
+        old_list = ContactList.objects.create(name='old')
+        first_list = ContactList.objects.create(name='first')
+        second_list = ContactList.objects.create(name='second')
+        existed = Contact.objects.create(email='existed@local.com')
+        existed.lists.add(old_list)
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            ('{"email": "a@gmail.com", "lists": [%(first)d]}\n'
+             '{"email": "existed@local.com", "lists": [%(first)d, %(second)d]}\n'
+             '{"email": "a@gmail.com", "lists": [%(second)d]}\n' % dict(
+                 first=first_list.pk, second=second_list.pk)).encode(),
+            'test.jsonl'))
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+        )
+
+        result = importer.parse_and_import(
+            file_upload,
+            dict(email=0, lists=1),
+            staging=True,
+        )
+
+        self.assertEqual(1, result.created)
+        self.assertEqual(2, result.updated)
+        self.assertEqual(0, len(result.errors), str(result.errors))
+        self.assertSetEqual({first_list.pk, second_list.pk}, set(existed.lists.values_list('pk', flat=True)))
+        self.assertListEqual([second_list.pk], list(
+            Contact.objects.get(email='a@gmail.com').lists.values_list('pk', flat=True)))
+
+    def test_parallel_import(self) -> None:
+        self.set_tenant(0)
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'first_name,email,tel\n'
+            b'a,a@gmail.com,\n'
+            b'"b\nwith ""quoted"" line break",b@mail.ru,\n'
+            b'c,c@mail.ru,wrong\n'
+            b'd,d@mail.ru,\n'
+            b'"e\n",e@mail.ru,also wrong\n'
+            b'aa,a@gmail.com,\n',
+            'test.csv'))
+
+        headers = dict(email=1, first_name=0, phone_number=2)
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+            processes=2,
+            parallel_block_size=16,
+        )
+
+        result = importer.parse_and_import(
+            file_upload,
+            headers,
+            has_headers=True,
+            create_failed_rows_file=True,
+            parallel=True,
+        )
+
+        self.assertEqual(4, result.created)
+        self.assertEqual(1, result.updated)
+        self.assertListEqual([2, 4], sorted(result.errors.keys()))
+        self.assertEqual('b\nwith "quoted" line break', Contact.objects.get(email='b@mail.ru').first_name)
+        self.assertEqual('aa', Contact.objects.get(email='a@gmail.com').first_name)
+
+        with result.failed_rows_file.open() as f:
+            self.assertEqual(b'first_name,email,tel\r\nc,c@mail.ru,wrong\r\n"e\n",e@mail.ru,also wrong\r\n', f.read())
+
+    def test_import_json_lines(self) -> None:
+        self.set_tenant(0)
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(
+            b'{"first_name": "a", "email": "a@gmail.com", "phone_number": null}\n'
+            b'\n'
+            b'{"first_name": "b", "email": "b@mail.ru", "phone_number": "wrong", "unknown": 1}\n'
+            b'{"email": "c@mail.ru"}\n',
+            'test.jsonl'))
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+        )
+
+        sniffed = importer.sniff(file_upload, limit=1)
+        self.assertDictEqual(dict(first_name=0, email=1, phone_number=2), sniffed.headers)
+        self.assertListEqual([['a', 'a@gmail.com', '']], sniffed.rows)
+
+        result = importer.parse_and_import(
+            file_upload,
+            dict(first_name=0, email=1, phone_number=2),
+            create_failed_rows_file=True,
+        )
+
+        self.assertEqual(2, result.created)
+        self.assertListEqual([1], list(result.errors.keys()))
+        self.assertEqual('a', Contact.objects.get(email='a@gmail.com').first_name)
+        self.assertEqual('', Contact.objects.get(email='c@mail.ru').first_name)
+
+        with result.failed_rows_file.open() as f:
+            self.assertEqual(b'first_name,email,phone_number\r\nb,b@mail.ru,wrong\r\n', f.read())
+
+    def test_import_xlsx(self) -> None:
+        self.set_tenant(0)
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['First Name', 'Email', 'Tel'])
+        sheet.append(['a', 'a@gmail.com', 13108487866])
+        sheet.append(['b', 'b@mail.ru', 'wrong'])
+        sheet.append([None, 'c@mail.ru', None])
+        content = io.BytesIO()
+        workbook.save(content)
+
+        file_upload = FileUpload.objects.create(owner=self.user, file=ContentFile(content.getvalue(), 'test.xlsx'))
+
+        importer = ContactsCsvImporter(
+            contact_serializer_context=self.serializer_context,
+        )
+
+        sniffed = importer.sniff(file_upload, limit=1)
+        self.assertEqual('xlsx', sniffed.options['format'])
+        self.assertListEqual([['a', 'a@gmail.com', '13108487866']], sniffed.rows)
+
+        result = importer.parse_and_import(
+            file_upload,
+            dict(first_name=0, email=1, phone_number=2),
+        )
+
+        self.assertEqual(2, result.created)
+        self.assertListEqual([1], list(result.errors.keys()))
+        self.assertEqual('+13108487866', Contact.objects.get(email='a@gmail.com').phone_number.as_e164)
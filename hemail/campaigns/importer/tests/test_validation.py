@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+
+from ..serializers import CsvContactSerializer
+from ..validation import ContactsBatchValidator
+
+
+class ContactsBatchValidatorTestCase(SimpleTestCase):
+
+    def test_same_as_serializer(self) -> None:
+        rows = [
+            dict(email=' a@gmail.com ', first_name='a', phone_number='+13108487866', timezone='Europe/Moscow'),
+            dict(email='b@[127.0.0.1]', phone_number='(310) 848-7866', timezone='Europe/Moscow'),
+            dict(email='not an email', phone_number='+13108487866'),
+            dict(email='c@mail.ru', phone_number='wrong', timezone='Europe/Moscow'),
+            dict(first_name='no email'),
+            dict(email='d@mail.ru', phone_number='', country='US'),
+        ]
+        serializer = CsvContactSerializer(data={}, context=dict(region='US'))
+
+        validated, errors = ContactsBatchValidator(serializer).validate(rows)
+
+        self.assertListEqual([2, 3, 4], sorted(errors.keys()))
+        for index, row in enumerate(rows):
+            if index in errors:
+                self.assertIsNone(validated[index])
+                with self.assertRaises(ValidationError) as e:
+                    serializer.run_validation(row)
+                self.assertEqual(e.exception.detail, errors[index])
+            else:
+                self.assertEqual(serializer.run_validation(row), validated[index])
+
+    def test_values_are_memoized(self) -> None:
+        rows = [dict(email='%d@gmail.com' % num, timezone='Europe/Moscow') for num in range(10)]
+        serializer = CsvContactSerializer(data={}, context=dict(region='US'))
+        field = serializer.fields['timezone']
+
+        with patch.object(field, 'run_validation', wraps=field.run_validation) as run_validation:
+            validated, errors = ContactsBatchValidator(serializer).validate(rows)
+
+        self.assertDictEqual({}, errors)
+        self.assertEqual(1, run_validation.call_count)
+        self.assertSetEqual({'Europe/Moscow'}, {str(data['timezone']) for data in validated})
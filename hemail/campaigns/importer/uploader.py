@@ -1,9 +1,12 @@
 import datetime
 import difflib
+import io
+import os
 import tempfile
+from contextlib import ExitStack, closing
 from functools import partial
 from itertools import chain, islice
-from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import unicodecsv
 from django.conf import settings
@@ -13,9 +16,16 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from files.models import FileUpload, FileUploader
+from .readers import ImportFileFormat, JsonLinesRowsReader, RowsReaderError, XlsxRowsReader
+from .parallel import ValidatedRow, is_splittable, split_first_record, split_records, validate_in_parallel
 from .serializers import CsvContactSerializer
+from .staging import ContactsStagingTable
+from .validation import ContactsBatchValidator
+from .. import search
 from ..contacts.models import Contact, ContactList
+from ..contacts.segments import mark_contacts_dirty
 from ..models import Campaign, Participation
+from ..signals import participations_created
 
 
 class ImportResult(object):
@@ -24,12 +34,14 @@ class ImportResult(object):
                  updated: int,
                  skipped: int,
                  errors: Dict[int, Optional[List]],
-                 failed_rows_file: Optional[FileUpload]) -> None:
+                 failed_rows_file: Optional[FileUpload],
+                 rows: int = 0) -> None:
         self.created = created
         self.updated = updated
         self.skipped = skipped
         self.errors = errors
         self.failed_rows_file = failed_rows_file
+        self.rows = rows
 
 
 class SniffResult(object):
@@ -48,41 +60,55 @@ class ParsingException(Exception):
 class ContactsCsvImporter(object):
     contact_serializer_class = CsvContactSerializer
     contact_serializer_context = None
+    chunk_size = 500
+    processes = os.cpu_count() or 1
+    parallel_block_size = 1024 * 1024
 
     def __init__(self, **kwargs) -> None:
+        self.chunk_size = kwargs.pop('chunk_size', self.chunk_size)
+        self.processes = kwargs.pop('processes', self.processes)
+        self.parallel_block_size = kwargs.pop('parallel_block_size', self.parallel_block_size)
         self.contact_serializer_class = kwargs.pop('contact_serializer_class', self.contact_serializer_class)
         self.contact_serializer_context = kwargs.pop('contact_serializer_context', self.contact_serializer_context)
 
-    def get_existing_contact(self, validated_data: dict) -> Optional[Contact]:
-        try:
-            # we expect that `email` is required field
-            return Contact.objects.get(email=validated_data['email'])
-        except Contact.DoesNotExist:
-            return None
+    def get_existing_contacts(self, emails: List[str]) -> Dict[str, Contact]:
+        # we expect that `email` is required field
+        return {contact.email: contact for contact in Contact.objects.filter(email__in=emails)}
 
     def get_contact_serializer(self, data: dict) -> serializers.Serializer:
         return self.contact_serializer_class(data=data, context=self.contact_serializer_context)
 
     def sniff(self, file_upload: FileUpload,
               encoding: str = settings.DEFAULT_CHARSET,
-              limit: int = 5) -> SniffResult:
+              limit: int = 5,
+              file_format: Optional[str] = None) -> SniffResult:
+        """
+        Reads only the header and the first `limit` rows of the file.
+        """
+        file_format = self._get_file_format(file_upload, file_format)
+        options = dict(format=file_format.value)
 
         try:
-            with file_upload.open() as csv_file:
-                has_header = unicodecsv.Sniffer().has_header(csv_file.read(1024).decode(encoding))
-                csv_file.seek(0)
-                dialect = unicodecsv.Sniffer().sniff(csv_file.read(1024).decode(encoding))
-                csv_format_opts = dict(dialect=dialect, )
-                csv_file.seek(0)
-
-                reader = unicodecsv.reader(csv_file, **csv_format_opts)
-                if has_header:
-                    header = next(reader)
+            with file_upload.open() as csv_file, ExitStack() as stack:
+                if file_format == ImportFileFormat.CSV:
+                    has_header = unicodecsv.Sniffer().has_header(csv_file.read(1024).decode(encoding))
+                    csv_file.seek(0)
+                    dialect = unicodecsv.Sniffer().sniff(csv_file.read(1024).decode(encoding))
+                    csv_format_opts = dict(dialect=dialect, )
+                    csv_file.seek(0)
+                    options.update(has_header=has_header, delimiter=dialect.delimiter)
+
+                    reader = unicodecsv.reader(csv_file, **csv_format_opts)
+                    if has_header:
+                        header = next(reader)
+                    else:
+                        header = None
                 else:
-                    header = None
+                    header, reader, _ = self._read_rows(csv_file, file_format, encoding, None, stack)
+                    options.update(has_header=header is not None)
 
                 rows = list(islice(reader, max(0, limit))) if limit > 0 else []
-        except (UnicodeDecodeError, unicodecsv.Error) as e:
+        except (UnicodeDecodeError, unicodecsv.Error, RowsReaderError) as e:
             raise ParsingException(str(e)) from e
 
         contact_serializer = self.get_contact_serializer(data={})
@@ -97,7 +123,7 @@ class ContactsCsvImporter(object):
                     headers_mapping[fields_name] = num
 
         return SniffResult(
-            dict(has_header=has_header, delimiter=dialect.delimiter, ),
+            options,
             list(fields.keys()),
             rows,
             headers_mapping,
@@ -115,123 +141,362 @@ class ContactsCsvImporter(object):
                          create_failed_rows_file: bool = False,
                          detailed_errors_limit: int = 20,
                          campaign: Optional[Campaign] = None,
-                         contact_list: Optional[ContactList] = None) -> ImportResult:
+                         contact_list: Optional[ContactList] = None,
+                         staging: bool = False,
+                         parallel: bool = False,
+                         file_format: Optional[str] = None,
+                         checkpoint: Optional[ImportResult] = None,
+                         on_chunk: Optional[Callable[[ImportResult, float], None]] = None) -> ImportResult:
+        """
+        Without `on_chunk` the whole import is done in one transaction. Otherwise (unless import is `atomic`)
+        every chunk is committed separately and `on_chunk` is called within its transaction with the result
+        so far and the fraction of the file read; such result can be passed back as `checkpoint`
+        to continue the import after the last committed chunk.
+
+        With `staging` validated rows are copied into a staging table and merged into contacts at once
+        at the end, it is the fastest way for very large files, but such import is always done
+        in one transaction and could not be continued.
+
+        With `parallel` the file is split into blocks of records which are parsed and validated
+        in `processes` forked processes while validated rows are written. It is not applicable if contacts lists
+        are imported (their validation needs the database) or the encoding is not ASCII compatible.
+
+        Besides CSV files XLSX workbooks (rows of their first sheet) and JSON Lines files are imported,
+        the format is guessed from the file name unless `file_format` is given. The header of a workbook
+        is expected unless `has_headers` is False, keys of the first object are the header of JSON Lines.
+        Other formats are never parsed in parallel and rows which failed are always written as CSV.
+        """
+        file_format = self._get_file_format(file_upload, file_format)
 
         indexes = {index: header for header, index in headers.items()}
+        if checkpoint is None:
+            result = ImportResult(0, 0, 0, dict(), None)
+        else:
+            result = ImportResult(checkpoint.created, checkpoint.updated, checkpoint.skipped,
+                                  dict(checkpoint.errors), None, checkpoint.rows)
 
-        with file_upload.open() as csv_file:
+        with file_upload.open() as csv_file, ExitStack() as readers:
             csv_format_opts = dict(dialect=unicodecsv.excel,
                                    encoding=encoding, )
 
             try:
-                if has_headers is None:
-                    has_headers = unicodecsv.Sniffer().has_header(csv_file.read(1024).decode(encoding))
-                    csv_file.seek(0)
-                if delimiter is None:
-                    dialect = unicodecsv.Sniffer().sniff(csv_file.read(1024).decode(encoding))
-                    csv_format_opts['dialect'] = dialect
-                    csv_file.seek(0)
+                if file_format != ImportFileFormat.CSV:
+                    header, rows, read_progress = self._read_rows(csv_file, file_format, encoding, has_headers,
+                                                                  readers)
+                    validated_rows = self._validate_rows(rows, indexes, result.rows)
                 else:
-                    csv_format_opts['delimiter'] = delimiter
+                    header, validated_rows = self._read_csv(csv_file, csv_format_opts, has_headers, delimiter,
+                                                            encoding, indexes, parallel, result.rows)
+                    read_progress = self._read_progress(csv_file)
 
-                csv_reader = unicodecsv.reader(csv_file, **csv_format_opts)
-
-                header = next(csv_reader) if has_headers else None
+                if on_chunk:
+                    def chunk_callback(chunk_result: ImportResult) -> None:
+                        on_chunk(chunk_result, read_progress())
+                else:
+                    chunk_callback = None
 
                 process_rows = partial(
                     self._process_rows,
-                    csv_reader, indexes,
+                    validated_rows, result,
                     allow_update,
                     atomic,
-                    detailed_errors_limit)
-            except (UnicodeDecodeError, unicodecsv.Error) as e:
+                    detailed_errors_limit,
+                    campaign,
+                    contact_list,
+                    on_chunk=chunk_callback)
+            except (UnicodeDecodeError, unicodecsv.Error, RowsReaderError) as e:
                 raise ParsingException(str(e)) from e
 
-            failed_rows_file_upload = None
-            with transaction.atomic(savepoint=False):
+            with ExitStack() as stack:
+                if atomic or staging or not on_chunk:
+                    stack.enter_context(transaction.atomic(savepoint=False))
+                staging_table = None
+                if staging:
+                    staging_table = stack.enter_context(ContactsStagingTable(lists='lists' in headers))
+                    process_rows = partial(process_rows, staging=staging_table)
+
                 if not create_failed_rows_file:
-                    created_contacts, updated_contacts, skipped_contacts, errors = process_rows(None)
+                    process_rows(None)
                 else:
-                    with tempfile.TemporaryFile() as fp, transaction.atomic(savepoint=False):
+                    failed_rows_name = file_upload.name
+                    if file_format != ImportFileFormat.CSV:
+                        failed_rows_name = '%s.csv' % os.path.splitext(failed_rows_name)[0]
+
+                    with tempfile.TemporaryFile() as fp:
                         csv_writer = unicodecsv.writer(fp, **csv_format_opts)
 
                         if header:
                             csv_writer.writerow(header)
 
-                        created_contacts, updated_contacts, skipped_contacts, errors = process_rows(
-                            csv_writer.writerow
-                        )
+                        process_rows(csv_writer.writerow)
 
-                        if errors:
+                        if result.errors:
                             fp.seek(0)
-                            failed_rows_file_upload = FileUpload.objects.create(
+                            result.failed_rows_file = FileUpload.objects.create(
                                 owner=file_upload.owner,
                                 uploader=FileUploader.SYSTEM,
                                 ttl=datetime.timedelta(days=2),
-                                file=File(fp, "failed-rows-from-%s" % file_upload.name)
+                                file=File(fp, "failed-rows-from-%s" % failed_rows_name)
                             )
 
-                if campaign:
-                    participating = set(campaign.contacts.values_list('id', flat=True))
-                    Participation.objects.bulk_create((
-                        Participation(
-                            contact_id=contact_id,
-                            campaign=campaign,
-                        ) for contact_id in chain(created_contacts,
-                                                  filter(lambda contact_id: contact_id not in participating,
-                                                         updated_contacts)
-                                                  )
-                    ))
-
-                if contact_list:
-                    contact_list.contacts.add(*created_contacts)
-                    contact_list.contacts.add(*updated_contacts)
-
-            return ImportResult(
-                len(created_contacts), len(updated_contacts), len(skipped_contacts),
-                errors, failed_rows_file_upload
-            )
-
-    def _process_rows(self, reader: Iterator, indexes: Dict[int, str],
+                if staging_table:
+                    imported_fields = {name for name in headers if name not in self._related_fields()}
+                    self._merge_staging(staging_table, result,
+                                        imported_fields if allow_update else None, campaign, contact_list)
+
+            return result
+
+    def _read_csv(self, csv_file: IO[bytes], csv_format_opts: dict, has_headers: Optional[bool],
+                  delimiter: Optional[str], encoding: str, indexes: Dict[int, str], parallel: bool,
+                  start: int) -> Tuple[Optional[List], Iterator[ValidatedRow]]:
+        """
+        Sniffs missing format options into `csv_format_opts`, returns the header and validated rows.
+        """
+        if has_headers is None:
+            has_headers = unicodecsv.Sniffer().has_header(csv_file.read(1024).decode(encoding))
+            csv_file.seek(0)
+        if delimiter is None:
+            dialect = unicodecsv.Sniffer().sniff(csv_file.read(1024).decode(encoding))
+            csv_format_opts['dialect'] = dialect
+            csv_file.seek(0)
+        else:
+            csv_format_opts['delimiter'] = delimiter
+
+        dialect = csv_format_opts['dialect']
+        quotechar = csv_format_opts.get('quotechar', getattr(dialect, 'quotechar', None)) or '"'
+        # validation of lists needs the database, so they could not be imported in parallel
+        parallel = parallel and self.processes > 1 and 'lists' not in indexes.values()
+        if parallel and is_splittable(encoding, quotechar):
+            blocks = split_records(csv_file, self.parallel_block_size, quotechar.encode(encoding))
+            header = None
+            if has_headers:
+                header_record, rest = split_first_record(next(blocks, b''), quotechar.encode(encoding))
+                header = next(unicodecsv.reader(io.BytesIO(header_record), **csv_format_opts), None)
+                blocks = chain([rest], blocks)
+            validated_rows = validate_in_parallel(self, blocks, indexes, csv_format_opts,
+                                                  self.processes, start)
+        else:
+            csv_reader = unicodecsv.reader(csv_file, **csv_format_opts)
+            header = next(csv_reader) if has_headers else None
+            validated_rows = self._validate_rows(csv_reader, indexes, start)
+
+        return header, validated_rows
+
+    def _read_rows(self, fp: IO[bytes], file_format: ImportFileFormat, encoding: str, has_headers: Optional[bool],
+                   stack: ExitStack) -> Tuple[Optional[List], Iterator[List], Callable[[], float]]:
+        """
+        Opens a reader of other than CSV format within the `stack`,
+        returns the header, rows and a function which tells the fraction of rows read.
+        """
+        if file_format == ImportFileFormat.XLSX:
+            xlsx_reader = stack.enter_context(closing(XlsxRowsReader(fp)))
+            rows = iter(xlsx_reader)
+            header = next(rows, None) if has_headers is not False else None
+            return header, rows, lambda: xlsx_reader.progress
+
+        jsonl_reader = JsonLinesRowsReader(fp, encoding)
+        return jsonl_reader.header, iter(jsonl_reader), self._read_progress(fp)
+
+    @staticmethod
+    def _read_progress(fp: IO[bytes]) -> Callable[[], float]:
+        file_size = max(fp.size, 1)
+        return lambda: min(fp.tell() / file_size, 1.0)
+
+    @staticmethod
+    def _get_file_format(file_upload: FileUpload, file_format: Optional[str]) -> ImportFileFormat:
+        if file_format:
+            return ImportFileFormat(file_format)
+        return ImportFileFormat.guess(file_upload.name, file_upload.mimetype)
+
+    def _validate_rows(self, reader: Iterator, indexes: Dict[int, str], start: int = 0) -> Iterator[ValidatedRow]:
+        """
+        Yields every row with its number, data and either validated data or errors.
+        Rows before `start` are yielded without data, as they would not be imported.
+        """
+        rows = enumerate(reader)
+        for num, row in islice(rows, start):
+            yield num, row, None, None, None
+
+        # fields are built once, rows are validated by columns of chunks against the same serializer instance
+        validator = ContactsBatchValidator(self.get_contact_serializer(data={}))
+        for batch in iter(lambda: list(islice(rows, self.chunk_size)), []):
+            batch_data = [{indexes[index]: field for index, field in enumerate(row) if index in indexes}
+                          for _, row in batch]
+            validated, errors = validator.validate(batch_data)
+            for index, ((num, row), data) in enumerate(zip(batch, batch_data)):
+                yield num, row, data, validated[index], errors.get(index)
+
+    def _process_rows(self, validated_rows: Iterator[ValidatedRow], result: ImportResult,
                       allow_update: bool, atomic: bool, detailed_errors_limit: int,
-                      failed_rows_acceptor: Optional[Callable[[List], None]]) -> Tuple[
-        List[int], List[int], List[int], Dict[int, Optional[List]]
+                      campaign: Optional[Campaign], contact_list: Optional[ContactList],
+                      failed_rows_acceptor: Optional[Callable[[List], None]],
+                      on_chunk: Optional[Callable[[ImportResult], None]] = None,
+                      staging: Optional[ContactsStagingTable] = None) -> None:
+        if staging:
+            import_chunk = partial(self._stage_chunk, staging=staging, result=result, on_chunk=on_chunk)
+        else:
+            import_chunk = partial(self._import_chunk, result=result, allow_update=allow_update,
+                                   campaign=campaign, contact_list=contact_list, on_chunk=on_chunk)
+        chunk = dict()
+        start = processed = result.rows
+
+        for num, row, data, validated_data, errors in validated_rows:
+            if num < start:
+                # rows before the checkpoint are imported already, only failed ones are collected again
+                if failed_rows_acceptor and num in result.errors:
+                    failed_rows_acceptor(row)
+                continue
+
+            processed = num + 1
+            if errors is not None:
+                result.errors[num] = errors if len(result.errors) < detailed_errors_limit else None
+
+                if failed_rows_acceptor:
+                    failed_rows_acceptor(row)
+                continue
+
+            # the same contact could be met twice, so earlier row has to be written first
+            if validated_data['email'] in chunk or len(chunk) >= self.chunk_size:
+                import_chunk(list(chunk.values()), num)
+                chunk.clear()
+
+            chunk[validated_data['email']] = (data, validated_data)
+
+        import_chunk(list(chunk.values()), processed)
+
+        if result.errors and atomic:
+            raise ValidationError(result.errors)
+
+    def _import_chunk(self, chunk: List[Tuple[dict, dict]], processed: int, result: ImportResult,
+                      allow_update: bool, campaign: Optional[Campaign], contact_list: Optional[ContactList],
+                      on_chunk: Optional[Callable[[ImportResult], None]]) -> None:
+        with transaction.atomic(savepoint=False):
+            created_contacts, updated_contacts, skipped_contacts = self._write_contacts(chunk, allow_update)
+
+            imported_contacts = created_contacts + updated_contacts
+            if campaign and imported_contacts:
+                participating = set(Participation.objects.filter(
+                    campaign=campaign,
+                    contact_id__in=imported_contacts,
+                ).values_list('contact_id', flat=True))
+                Participation.objects.bulk_create((
+                    Participation(
+                        contact_id=contact_id,
+                        campaign=campaign,
+                    ) for contact_id in imported_contacts if contact_id not in participating
+                ))
+
+            if contact_list and imported_contacts:
+                contact_list.contacts.add(*imported_contacts)
+
+            result.created += len(created_contacts)
+            result.updated += len(updated_contacts)
+            result.skipped += len(skipped_contacts)
+            result.rows = processed
+
+            if on_chunk:
+                on_chunk(result)
+
+    def _stage_chunk(self, chunk: List[Tuple[dict, dict]], processed: int, staging: ContactsStagingTable,
+                     result: ImportResult, on_chunk: Optional[Callable[[ImportResult], None]]) -> None:
+        related_fields = self._related_fields()
+        staging.copy(
+            (Contact(**{name: value for name, value in validated_data.items() if name not in related_fields})
+             for _, validated_data in chunk),
+            ([contact_list.pk for contact_list in validated_data['lists']] for _, validated_data in chunk),
+        )
+        result.rows = processed
+
+        if on_chunk:
+            on_chunk(result)
+
+    def _merge_staging(self, staging: ContactsStagingTable, result: ImportResult,
+                       update_fields: Optional[Iterable[str]],
+                       campaign: Optional[Campaign], contact_list: Optional[ContactList]) -> None:
+        created, others = staging.merge(update_fields)
+        result.created += created
+        if update_fields is None:
+            result.skipped += others
+        else:
+            result.updated += others
+
+        if campaign and staging.add_to_campaign(campaign):
+            participations_created.send(sender=Participation, participations=None, campaign_ids={campaign.pk},
+                                        using=staging.connection.alias)
+
+        if staging.lists:
+            staging.replace_lists()
+
+        if contact_list:
+            staging.add_to_list(contact_list)
+
+        # contacts were inserted bypassing signals, all of them are indexed and added to segments after the import
+        for pks in staging.merged_ids(self.chunk_size):
+            search.reindex(Contact, pks, using=staging.connection.alias)
+            mark_contacts_dirty(pks, using=staging.connection.alias)
+
+    @staticmethod
+    def _related_fields() -> Set[str]:
+        return {field.name for field in Contact._meta.get_fields() if field.is_relation}
+
+    def _write_contacts(self, chunk: List[Tuple[dict, dict]], allow_update: bool) -> Tuple[
+        List[int], List[int], List[int]
     ]:
         created_contacts = list()
         updated_contacts = list()
         skipped_contacts = list()
-        errors = dict()
-
-        for num, row in enumerate(reader):
-            data = {indexes[index]: field for index, field in enumerate(row) if index in indexes}
-            contact_serializer = self.get_contact_serializer(data=data)
+        if not chunk:
+            return created_contacts, updated_contacts, skipped_contacts
+        existing = self.get_existing_contacts([validated_data['email'] for _, validated_data in chunk])
+        related_fields = self._related_fields()
+
+        contacts = []
+        update_fields = set()
+        lists = []
+        for data, validated_data in chunk:
+            values = {name: value for name, value in validated_data.items() if name not in related_fields}
+            instance = existing.get(values['email'])
+            if instance is None:
+                instance = Contact(**values)
+            elif allow_update:
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                update_fields.update(values.keys())
+            else:
+                skipped_contacts.append(instance.id)
+                continue
 
-            if not contact_serializer.is_valid(raise_exception=False):
-                errors[num] = contact_serializer.errors if len(errors) < detailed_errors_limit else None
+            contacts.append(instance)
+            # `lists` field has default value, so apply it only if it was really imported
+            if 'lists' in data:
+                lists.append((instance, validated_data['lists']))
 
-                if failed_rows_acceptor:
-                    failed_rows_acceptor(row)
-                continue
+        with search.skip_index_update():
+            results = Contact.objects.upsert(contacts, update_fields if allow_update else None)
 
-            instance = self.get_existing_contact(contact_serializer.validated_data)
-            if instance:
-                if allow_update:
-                    updated_contacts.append(
-                        contact_serializer.update(instance, validated_data=contact_serializer.validated_data).id
-                    )
-                else:
-                    skipped_contacts.append(instance.id)
+        conflicted = []
+        for contact, created in zip(contacts, results):
+            if created is None:
+                conflicted.append(contact.email)
+            elif created:
+                created_contacts.append(contact.id)
             else:
-                created_contacts.append(
-                    contact_serializer.create(validated_data=contact_serializer.validated_data).id
-                )
-
-        if errors and atomic:
-            raise ValidationError(errors)
-
-        return (
-            created_contacts,
-            updated_contacts,
-            skipped_contacts,
-            errors,
-        )
+                updated_contacts.append(contact.id)
+
+        if conflicted:
+            # contacts were created concurrently after we looked for existing ones
+            skipped_contacts.extend(Contact.objects.filter(email__in=conflicted).values_list('id', flat=True))
+
+        search.reindex(Contact, chain(created_contacts, updated_contacts))
+
+        lists = [(contact, contact_lists) for contact, contact_lists in lists if contact.id is not None]
+        if lists:
+            through = Contact.lists.through
+            through.objects.filter(contact_id__in=[contact.id for contact, _ in lists]).delete()
+            through.objects.bulk_create(
+                through(contact_id=contact.id, contactlist_id=contact_list.id)
+                for contact, contact_lists in lists
+                for contact_list in contact_lists
+            )
+
+        return created_contacts, updated_contacts, skipped_contacts
@@ -0,0 +1,124 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import EmailValidator, MaxLengthValidator
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, set_value
+
+# marks values which are not memoized yet
+_missing = object()
+
+
+class ContactsBatchValidator(object):
+    """
+    Validates rows of contacts column by column with fields of the serializer, as its `run_validation` would.
+    Values of `memoized_fields` are validated once per distinct value, as imported lists repeat
+    the same timezones, countries and phone numbers (which are parsed with the region of the importing user),
+    emails are checked with compiled regexes of the email validator.
+    Rows which failed are validated with the serializer again, so their errors are exactly the same.
+    """
+    memoized_fields = ('phone_number', 'timezone', 'country',)
+    memo_size = 10000
+
+    def __init__(self, serializer: serializers.Serializer) -> None:
+        self.serializer = serializer
+        self.fields = list(serializer._writable_fields)
+        self.memo = {name: dict() for name in self.memoized_fields}
+
+    def validate(self, rows: List[dict]) -> Tuple[List[Optional[dict]], Dict[int, dict]]:
+        """
+        Returns validated data of every row (None for invalid ones) and errors of invalid rows by their indexes.
+        """
+        validated = [dict() for _ in rows]
+        failed = set()
+
+        for field in self.fields:
+            validate_value = self._get_column_validator(field)
+            validate_method = getattr(self.serializer, 'validate_' + field.field_name, None)
+
+            for index, row in enumerate(rows):
+                if index in failed:
+                    continue
+                try:
+                    value = validate_value(field.get_value(row))
+                    if validate_method is not None:
+                        value = validate_method(value)
+                except (ValidationError, DjangoValidationError):
+                    failed.add(index)
+                except SkipField:
+                    pass
+                else:
+                    set_value(validated[index], field.source_attrs, value)
+
+        errors = dict()
+        for index, row in enumerate(rows):
+            if index not in failed:
+                try:
+                    self.serializer.run_validators(validated[index])
+                    validated[index] = self.serializer.validate(validated[index])
+                    continue
+                except (ValidationError, DjangoValidationError):
+                    pass
+            try:
+                validated[index] = self.serializer.run_validation(row)
+            except ValidationError as e:
+                validated[index] = None
+                errors[index] = e.detail
+
+        return validated, errors
+
+    def _get_column_validator(self, field: serializers.Field) -> Callable[[Any], Any]:
+        if field.field_name in self.memo:
+            return self._memoized(field, self.memo[field.field_name])
+        if isinstance(field, serializers.EmailField):
+            return self._email_validator(field)
+        return field.run_validation
+
+    def _memoized(self, field: serializers.Field, memo: dict) -> Callable[[Any], Any]:
+        def validate(value: Any) -> Any:
+            try:
+                result = memo.get(value, _missing)
+            except TypeError:  # not hashable
+                return field.run_validation(value)
+
+            if result is _missing:
+                try:
+                    result = field.run_validation(value), None
+                except (ValidationError, DjangoValidationError):
+                    # details are not needed, failed rows are validated again
+                    result = None, ValidationError
+                except SkipField:
+                    result = None, SkipField
+                if len(memo) >= self.memo_size:
+                    memo.clear()
+                memo[value] = result
+
+            value, error = result
+            if error is not None:
+                raise error()
+            return value
+
+        return validate
+
+    def _email_validator(self, field: serializers.EmailField) -> Callable[[Any], Any]:
+        email_validators = [validator for validator in field.validators if isinstance(validator, EmailValidator)]
+        if len(email_validators) != 1 or not field.trim_whitespace or any(
+                not isinstance(validator, (EmailValidator, MaxLengthValidator)) for validator in field.validators):
+            return field.run_validation
+
+        user_regex = email_validators[0].user_regex
+        domain_regex = email_validators[0].domain_regex
+        max_length = field.max_length
+
+        def validate(value: Any) -> Any:
+            if isinstance(value, str):
+                email = value.strip()
+                user, _, domain = email.rpartition('@')
+                if (user and (max_length is None or len(email) <= max_length) and
+                        user_regex.match(user) and domain_regex.match(domain)):
+                    return email
+            # literal domains, IDN and all invalid values are left to the field
+            return field.run_validation(value)
+
+        return validate
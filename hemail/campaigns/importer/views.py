@@ -1,15 +1,30 @@
 import rest_framework_bulk
+from django.db import connection, transaction
+from django.utils import timezone
 from rest_framework import mixins, permissions, response as rf_response, status, viewsets
+from rest_framework.decorators import detail_route
 from rest_framework.response import Response
 
-from common.exceptions import UnprocessableEntity
+from common.exceptions import Conflict, UnprocessableEntity
 from files.models import FileUpload
-from .serializers import CsvContactSerializer, FileUploadSerializer, ImportResultSerializer, SniffQuerySerializer
+from .models import (
+    ACTIVE_IMPORT_JOB_STATUSES, ContactsImportJob, ImportJobStatus, RESUMABLE_IMPORT_JOB_STATUSES,
+)
+from .serializers import (
+    ContactsImportJobSerializer, CsvContactSerializer, FileUploadSerializer, SniffQuerySerializer,
+)
+from .tasks import import_contacts_task
 from .uploader import ContactsCsvImporter, ParsingException
 from ..contacts.models import Contact
+from ..contacts.serializers import get_region
 from ..importer.serializers import SniffResultSerializer
 
 
+def submit_import_job(job: ContactsImportJob) -> None:
+    tenant_id = connection.tenant.id
+    transaction.on_commit(lambda: import_contacts_task.delay(tenant_id, job.id))
+
+
 class ContactsCsvSniffingViewSet(mixins.RetrieveModelMixin,
                                  viewsets.GenericViewSet):
     queryset = FileUpload.objects.all()
@@ -58,32 +73,61 @@ class ContactsCsvViewSet(rest_framework_bulk.BulkCreateModelMixin,
         serializer = self.get_serializer(data=request.data, contact_serializer=contact_serializer)
         serializer.is_valid(raise_exception=True)
 
-        file_upload = serializer.validated_data['file']
-        headers = serializer.validated_data['headers']
-        options = serializer.validated_data['options']
+        options = dict(serializer.validated_data['options'])
+        campaign = options.pop('campaign')
+        contact_list = options.pop('contact_list')
+
+        with transaction.atomic():
+            job = ContactsImportJob.objects.create(
+                owner=request.user,
+                file=serializer.validated_data['file'],
+                headers=serializer.validated_data['headers'],
+                options=options,
+                campaign=campaign,
+                contact_list=contact_list,
+                region=get_region(contact_serializer.fields['phone_number']) or '',
+            )
+            submit_import_job(job)
 
-        importer = ContactsCsvImporter(
-            contact_serializer_class=self.contact_serializer_class,
-            contact_serializer_context=self.get_serializer_context(),
-        )
+        return rf_response.Response(data=ContactsImportJobSerializer(instance=job).data,
+                                    status=status.HTTP_202_ACCEPTED)
 
-        try:
-            result = importer.parse_and_import(
-                file_upload,
-                headers,
-                **options,
+
+class ContactsImportJobViewSet(mixins.ListModelMixin,
+                               mixins.RetrieveModelMixin,
+                               viewsets.GenericViewSet):
+    queryset = ContactsImportJob.objects.none()
+    serializer_class = ContactsImportJobSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.request.user.contacts_import_jobs.all()
+
+    @detail_route(methods=['post'])
+    def cancel(self, request, pk):
+        job = self.get_object()
+        cancelled = ContactsImportJob.objects.filter(pk=job.pk, status__in=ACTIVE_IMPORT_JOB_STATUSES).update(
+            status=ImportJobStatus.CANCELLED,
+            finished=timezone.now(),
+            eta=None,
+        )
+        if not cancelled:
+            raise Conflict('Import job is not active')
+
+        job.refresh_from_db()
+        return Response(self.get_serializer(instance=job).data)
+
+    @detail_route(methods=['post'])
+    def resume(self, request, pk):
+        job = self.get_object()
+        with transaction.atomic():
+            resumed = ContactsImportJob.objects.filter(pk=job.pk, status__in=RESUMABLE_IMPORT_JOB_STATUSES).update(
+                status=ImportJobStatus.QUEUED,
+                finished=None,
             )
-        except ParsingException as e:
-            raise UnprocessableEntity(detail=str(e)) from e
+            if not resumed:
+                raise Conflict('Only cancelled or failed import job could be resumed')
+            submit_import_job(job)
 
-        if result.errors and not result.created and not result.updated:
-            response_status = status.HTTP_400_BAD_REQUEST
-        elif not result.errors and result.created and not result.updated:
-            response_status = status.HTTP_201_CREATED
-        elif not result.errors and not result.created and result.updated:
-            response_status = status.HTTP_200_OK
-        else:
-            response_status = status.HTTP_207_MULTI_STATUS
-
-        return rf_response.Response(data=ImportResultSerializer(instance=result).data,
-                                    status=response_status)
+        job.refresh_from_db()
+        return Response(self.get_serializer(instance=job).data, status=status.HTTP_202_ACCEPTED)
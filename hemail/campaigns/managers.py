@@ -1,7 +1,8 @@
 from typing import Iterable, Optional
 
-from django.db import models, router
-from django.db.models.signals import post_save
+from django.db import models
+
+from .signals import participations_created
 
 
 class ParticipationQuerySet(models.QuerySet):
@@ -12,9 +13,10 @@ class ParticipationQuerySet(models.QuerySet):
         for participation in participations:
             participation.update_activation()
         participations = super().bulk_create(participations, batch_size)
-        for participation in participations:
-            using = router.db_for_write(router, instance=participation)
-            post_save.send(sender=participation.__class__, instance=participation, created=True, using=using)
+        if participations:
+            participations_created.send(sender=self.model, participations=participations,
+                                        campaign_ids={participation.campaign_id for participation in participations},
+                                        using=self.db)
         return participations
 
 
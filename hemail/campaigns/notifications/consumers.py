@@ -11,6 +11,7 @@ from tenant_schemas.utils import tenant_context
 logger = logging.getLogger(__name__)
 
 NOTIFICATION_CHANNEL = "nyt_all-{notification_key:s}"
+USER_CHANNEL = "user-{user_id:d}"
 
 NOTICE_MEDIA, NOTICE_MEDIA_DEFAULTS = load_media_defaults()
 MEDIUM = 'channels'
@@ -45,6 +46,7 @@ class NotificationsConsumer(WebsocketConsumer):
             for notice_type in get_allowed_notice_types(user):
                 group_name = NOTIFICATION_CHANNEL.format(notification_key=notice_type.label)
                 async_to_sync(self.channel_layer.group_add)(group_name, self.channel_name)
+        async_to_sync(self.channel_layer.group_add)(USER_CHANNEL.format(user_id=user.id), self.channel_name)
 
         self.accept()
 
@@ -58,6 +60,7 @@ class NotificationsConsumer(WebsocketConsumer):
         for notice_type in get_allowed_notice_types(user):
             group_name = NOTIFICATION_CHANNEL.format(notification_key=notice_type.label)
             async_to_sync(self.channel_layer.group_discard)(group_name, self.channel_name)
+        async_to_sync(self.channel_layer.group_discard)(USER_CHANNEL.format(user_id=user.id), self.channel_name)
 
     def notification_message(self, event) -> None:
         if self.scope['user'].id != event.get('recipient', None):
@@ -66,3 +69,8 @@ class NotificationsConsumer(WebsocketConsumer):
         self.send(text_data=json.dumps(
             dict(type=event['notice'], context=event.get('context', {}))
         ))
+
+    def import_progress(self, event) -> None:
+        self.send(text_data=json.dumps(
+            dict(type='import_progress', context=event['job'])
+        ))
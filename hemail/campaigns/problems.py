@@ -0,0 +1,54 @@
+from typing import Iterable
+
+from django.db import DEFAULT_DB_ALIAS, models
+from django_postgres_extensions.models.functions import ArrayAppend, ArrayRemove
+
+from common.transactions import on_commit_batch
+from .models import (
+    Campaign, CampaignProblems, CampaignStatus, EmailStage, Participation, Step, StepProblems, TextStage,
+)
+
+
+def _set_problem(queryset: models.QuerySet, problem: str, condition: models.Q) -> None:
+    queryset.filter(condition).exclude(problems__contains=[problem]).update(
+        problems=ArrayAppend('problems', problem))
+    queryset.exclude(condition).filter(problems__contains=[problem]).update(
+        problems=ArrayRemove('problems', problem))
+
+
+def recheck_problems(campaign_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Recomputes problems of campaigns and their steps with a few set-based updates, campaigns left in draft
+    without problems are paused.
+    """
+    campaign_ids = list(campaign_ids)
+    if not campaign_ids:
+        return
+
+    steps = Step.objects.using(using).filter(campaign_id__in=campaign_ids)
+    _set_problem(steps, StepProblems.EMPTY_STEP, ~models.Q(pk__in=EmailStage.objects.using(using).values('step_id')) &
+                 ~models.Q(pk__in=TextStage.objects.using(using).values('step_id')))
+
+    campaigns = Campaign.objects.using(using).filter(pk__in=campaign_ids)
+    _set_problem(campaigns, CampaignProblems.NO_STEPS, ~models.Q(pk__in=steps.values('campaign_id')))
+    _set_problem(campaigns, CampaignProblems.EMPTY_STEP, models.Q(pk__in=steps.filter(
+        problems__contains=[StepProblems.EMPTY_STEP],
+    ).values('campaign_id')))
+    _set_problem(campaigns, CampaignProblems.NO_CONTACTS, ~models.Q(pk__in=Participation.objects.using(using).filter(
+        campaign_id__in=campaign_ids,
+    ).values('campaign_id')))
+
+    campaigns.filter(
+        status=CampaignStatus.DRAFT,
+        problems__len=0,
+    ).exclude(
+        pk__in=steps.filter(problems__len__gt=0).values('campaign_id'),
+    ).update(status=CampaignStatus.PAUSED)
+
+
+def mark_problems_dirty(campaign_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Problems of the campaigns are rechecked once the transaction is committed, all campaigns marked
+    within the same transaction are rechecked together. Outside of transactions they are rechecked at once.
+    """
+    on_commit_batch('campaigns.problems', lambda ids: recheck_problems(ids, using), campaign_ids, using)
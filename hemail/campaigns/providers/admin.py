@@ -7,6 +7,7 @@ from django_mailbox.signals import message_received
 from django_mailbox.utils import convert_header_to_unicode
 
 from .models import CoolMailbox, EmailAccount, SmtpConnectionSettings
+from .signals import messages_received
 
 __author__ = 'yushkovskiy'
 
@@ -36,9 +37,11 @@ verify_connections.short_description = 'Verify connections'
 
 
 def resend_message_received_signal(message_admin, request, queryset):
-    for message in queryset.all():
+    messages = list(queryset.all())
+    for message in messages:
         logger.debug("Resending 'message_received' signal for %s" % message)
         message_received.send(sender=message_admin, message=message)
+    messages_received.send(sender=message_admin, messages=messages)
 
 
 resend_message_received_signal.short_description = 'Re-send message received signal'
@@ -6,5 +6,9 @@ class ProvidersConfig(AppConfig):
     icon = '<i class="material-icons">import_export</i>'
 
     def ready(self):
+        # Do django_mailbox monkeypatches
+        from .hacks import monkeypatch_django_mailbox
+        monkeypatch_django_mailbox()
+
         # noinspection PyUnresolvedReferences
         from .signals import handlers  # noqa
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import DomainConfiguration
+
+
+@admin.register(DomainConfiguration)
+class DomainConfigurationAdmin(admin.ModelAdmin):
+    icon = '<i class="material-icons">dns</i>'
+    list_display = ('domain', 'direction', 'host', 'port', 'encryption', 'authentication', 'successes', 'failures',)
+    list_filter = ('direction',)
+    search_fields = ('domain', 'host',)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class DirectoryConfig(AppConfig):
+    """
+    Shared (public schema) directory of connection configurations proven to work by accounts of all tenants.
+    """
+
+    name = 'campaigns.providers.directory'
+    icon = '<i class="material-icons">dns</i>'
@@ -0,0 +1,70 @@
+from typing import Optional
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django_postgres_extensions.models.functions import ArrayAppend
+
+from ..configuration import BasicConfiguration, UsernameTemplates
+from ..utils import get_email_parts
+
+
+def get_username_template(email: str, username: str) -> Optional[UsernameTemplates]:
+    local_part = get_email_parts(email)[0]
+    if username == email:
+        return UsernameTemplates.EMAILADDRESS
+    if username == local_part:
+        return UsernameTemplates.EMAILLOCALPART
+    return None
+
+
+class DomainConfigurationQuerySet(models.QuerySet):
+    # configurations are shared by tenants, so one of them could not point accounts of others to its server
+    trusted_tenants = 3
+
+    def record(self, email: str, direction: 'ConnectionDirection', configuration: BasicConfiguration,
+               succeeded: bool, tenant_id: int) -> bool:
+        """
+        Counts connection result for configuration of the email domain, tenants which succeeded with it
+        are remembered. Configurations with usernames which could not be expressed by template are specific
+        to the account and skipped.
+        """
+        username_template = get_username_template(email, configuration.username_or_template)
+        if username_template is None or not configuration.host or configuration.port is None:
+            return False
+
+        lookup = dict(
+            domain=get_email_parts(email)[1].lower(),
+            direction=direction,
+            host=configuration.host.lower(),
+            port=configuration.port,
+            encryption=configuration.encryption,
+            username_template=username_template,
+            authentication=configuration.authentication,
+            provider=configuration.provider or '',
+        )
+        if not succeeded:
+            # failures are not interesting for configurations which never worked
+            return self.filter(**lookup).update(failures=F('failures') + 1) > 0
+
+        with transaction.atomic():
+            instance, created = self.get_or_create(**lookup)
+            self.filter(pk=instance.pk).update(successes=F('successes') + 1, last_succeeded=timezone.now())
+            self.filter(pk=instance.pk).exclude(tenants__contains=[tenant_id]).update(
+                tenants=ArrayAppend('tenants', tenant_id))
+        return True
+
+    def best(self, domain: str, direction: 'ConnectionDirection') -> Optional['DomainConfiguration']:
+        """
+        Returns the most successful configuration of the domain among ones which succeeded
+        for at least `trusted_tenants` tenants.
+        """
+        return self.filter(
+            domain=domain.lower(),
+            direction=direction,
+            successes__gt=F('failures'),
+            tenants__len__gte=self.trusted_tenants,
+        ).order_by('-successes', '-last_succeeded').first()
+
+
+DomainConfigurationManager = DomainConfigurationQuerySet.as_manager
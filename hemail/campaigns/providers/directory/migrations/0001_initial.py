@@ -0,0 +1,43 @@
+# Generated by Django 2.0.6 on 2018-07-06 12:00
+
+import enumfields.fields
+from django.db import migrations, models
+
+import campaigns.providers.configuration
+import campaigns.providers.directory.models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainConfiguration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255)),
+                ('direction', enumfields.fields.EnumField(
+                    enum=campaigns.providers.directory.models.ConnectionDirection, max_length=16)),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.PositiveIntegerField()),
+                ('encryption', enumfields.fields.EnumField(
+                    enum=campaigns.providers.configuration.EncryptionType, max_length=16)),
+                ('username_template', enumfields.fields.EnumField(
+                    enum=campaigns.providers.configuration.UsernameTemplates, max_length=32)),
+                ('authentication', enumfields.fields.EnumField(
+                    enum=campaigns.providers.configuration.AuthenticationType, max_length=16)),
+                ('provider', models.CharField(blank=True, max_length=64)),
+                ('successes', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('last_succeeded', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='domainconfiguration',
+            unique_together={('domain', 'direction', 'host', 'port', 'encryption', 'username_template',
+                              'authentication', 'provider')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.0.6 on 2026-10-19 12:00
+
+import django_postgres_extensions.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('directory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='domainconfiguration',
+            name='tenants',
+            field=django_postgres_extensions.models.fields.ArrayField(
+                base_field=models.IntegerField(), default=list, form_size=None, size=None),
+        ),
+    ]
@@ -0,0 +1,51 @@
+import enum
+from typing import Optional
+
+from django.db import models
+from django_postgres_extensions.models import ArrayField
+from enumfields import EnumField
+
+from ..configuration import AuthenticationType, EncryptionType, UsernameTemplates
+from .managers import DomainConfigurationManager
+
+
+@enum.unique
+class ConnectionDirection(enum.Enum):
+    INCOMING = 'INCOMING'
+    OUTGOING = 'OUTGOING'
+
+
+class DomainConfiguration(models.Model):
+    """
+    Connection configuration (without credentials) used by email accounts of the domain.
+    """
+
+    domain = models.CharField(max_length=255)
+    direction = EnumField(ConnectionDirection, max_length=16)
+
+    host = models.CharField(max_length=255)
+    port = models.PositiveIntegerField()
+    encryption = EnumField(EncryptionType, max_length=16)
+    username_template = EnumField(UsernameTemplates, max_length=32)
+    authentication = EnumField(AuthenticationType, max_length=16)
+    provider = models.CharField(max_length=64, blank=True)
+
+    successes = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    last_succeeded = models.DateTimeField(null=True)
+    # ids of tenants which succeeded with the configuration
+    tenants = ArrayField(models.IntegerField(), default=list)
+
+    objects = DomainConfigurationManager()
+
+    class Meta:
+        unique_together = [
+            ('domain', 'direction', 'host', 'port', 'encryption', 'username_template', 'authentication', 'provider',),
+        ]
+
+    def __str__(self) -> str:
+        return '%s: %s:%s' % (self.domain, self.host, self.port)
+
+    @property
+    def provider_or_none(self) -> Optional[str]:
+        return self.provider or None
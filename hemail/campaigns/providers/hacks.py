@@ -0,0 +1,14 @@
+def monkeypatch_django_mailbox():
+    from django.db import models
+    from django_mailbox.models import MessageAttachment
+    from .models import AttachmentContent
+
+    _original_delete = MessageAttachment.delete
+
+    def delete(self, *args, **kwargs):
+        if AttachmentContent.objects.filter(document=self.document.name).exists():
+            # shared content is referenced by other attachments, so it is released by 'post_delete' handler
+            return models.Model.delete(self, *args, **kwargs)
+        return _original_delete(self, *args, **kwargs)
+
+    MessageAttachment.delete = delete
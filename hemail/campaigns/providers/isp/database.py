@@ -0,0 +1,107 @@
+"""
+Local copy of the ISP configurations database (ISPDB) used by Thunderbird autoconfig.
+
+Configurations are stored as json: list of serialized configurations and index of domains pointing into it, so
+providers serving many domains are stored once. The file is loaded lazily and kept in memory of the process until
+it is changed on disk.
+"""
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Iterable, Optional, Tuple
+from xml.etree.ElementTree import ParseError
+
+from .parser import parse_configuration, parse_domains
+
+logger = logging.getLogger(__name__)
+
+ISP_DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'ispdb.json')
+ISP_DATABASE_VERSION = 1
+
+
+def build_database(sources: Iterable[Tuple[str, bytes]]) -> dict:
+    """
+    Builds database from ISPDB xml files, `sources` are pairs of file name (which is a domain as well) and content.
+    """
+    from ..serializers import ProviderConfigurationSerializer
+
+    configurations = []
+    domains = {}
+
+    for name, xml_string in sources:
+        try:
+            configuration = parse_configuration(xml_string)
+            configuration_domains = parse_domains(xml_string) if configuration is not None else []
+        except (ParseError, ValueError) as e:
+            logger.warning("Failed to parse ISP configuration '%s': %s", name, e)
+            continue
+        if configuration is None:
+            continue
+
+        configurations.append(ProviderConfigurationSerializer(instance=configuration).data)
+        for domain in configuration_domains + [name.lower()]:
+            domains.setdefault(domain, len(configurations) - 1)
+
+    return dict(version=ISP_DATABASE_VERSION, configurations=configurations, domains=domains)
+
+
+def write_database(database: dict, path: str = ISP_DATABASE_PATH) -> None:
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        json.dump(database, f, sort_keys=True, separators=(',', ':'))
+    # readers never see partially written database
+    os.replace(f.name, path)
+
+
+class IspDatabase(object):
+    def __init__(self, path: str = ISP_DATABASE_PATH) -> None:
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._configurations = []
+        self._domains = {}
+
+    def _load(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+
+            configurations, domains = [], {}
+            if mtime is not None:
+                with open(self.path) as f:
+                    database = json.load(f)
+                if database.get('version') == ISP_DATABASE_VERSION:
+                    configurations, domains = database['configurations'], database['domains']
+                else:
+                    logger.warning("Unsupported ISP database version in '%s'", self.path)
+
+            self._configurations, self._domains = configurations, domains
+            self._mtime = mtime
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._domains)
+
+    def lookup(self, domain: str) -> Optional[dict]:
+        """ Returns serialized configuration (see `ProviderConfigurationSerializer`) for the domain """
+        self._load()
+        index = self._domains.get(domain.lower())
+        if index is None:
+            return None
+        # callers fill username templates in place
+        return copy.deepcopy(self._configurations[index])
+
+
+isp_database = IspDatabase()
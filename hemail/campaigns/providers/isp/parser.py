@@ -46,8 +46,8 @@ class Skipable(object):
 _TBasicConfiguration = TypeVar('_TBasicConfiguration', covariant=True, bound=BasicConfiguration)
 
 
-def _choose_best_configuration(configurations: List[_TBasicConfiguration]) -> _TBasicConfiguration:
-    def authentication(conf: _TBasicConfiguration):
+def _configuration_priority(conf: BasicConfiguration) -> int:
+    def authentication(conf: BasicConfiguration):
         priority = [
             AuthenticationType.BASIC,
             AuthenticationType.OAUTH2,
@@ -63,7 +63,11 @@ def _choose_best_configuration(configurations: List[_TBasicConfiguration]) -> _T
             EncryptionType.SSL,
         ].index(conf.encryption)
 
-    return sorted(configurations, key=lambda conf: encryption(conf) + 10 * authentication(conf))[-1]
+    return encryption(conf) + 10 * authentication(conf)
+
+
+def _choose_best_configuration(configurations: List[_TBasicConfiguration]) -> _TBasicConfiguration:
+    return sorted(configurations, key=_configuration_priority)[-1]
 
 
 def _choose_best_incoming(incoming_configurations: List[IncomingConfiguration]) -> IncomingConfiguration:
@@ -125,6 +129,14 @@ def parse_configuration(xml_string: str) -> Optional[ProviderConfiguration]:
         return None
 
 
+def parse_domains(xml_string: str) -> List[str]:
+    """
+    Returns domains the configuration is provided for.
+    """
+    client_config = ElementTree.fromstring(xml_string)
+    return [domain.text.strip().lower() for domain in client_config.findall('emailProvider/domain') if domain.text]
+
+
 def _parse_outgoing_configuration(outgoing_server: ElementTree.Element,
                                   provider: Optional[str] = None) -> List[OutgoingConfiguration]:
     conf = Skipable(outgoing_server)
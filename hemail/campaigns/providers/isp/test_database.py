@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from .database import IspDatabase, build_database, write_database
+from .test_parser import _sample_response
+
+
+class IspDatabaseTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'ispdb.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_configuration_is_found_by_any_of_its_domains(self):
+        database = build_database([('googlemail.com', _sample_response), ('broken.com', '<clientConfig/>')])
+        self.assertEqual(1, len(database['configurations']))
+        write_database(database, self.path)
+
+        isp_database = IspDatabase(self.path)
+        self.assertEqual(4, len(isp_database))
+        for domain in ['gmail.com', 'GoogleMail.com', 'jazztel.es']:
+            configuration = isp_database.lookup(domain)
+            self.assertEqual('GMail', configuration['name'])
+            self.assertEqual('imap.gmail.com', configuration['incoming']['host'])
+            self.assertEqual('smtp.gmail.com', configuration['outgoing']['host'])
+        self.assertIsNone(isp_database.lookup('broken.com'))
+
+    def test_lookup_result_is_a_copy(self):
+        write_database(build_database([('googlemail.com', _sample_response)]), self.path)
+
+        isp_database = IspDatabase(self.path)
+        isp_database.lookup('gmail.com')['incoming']['username'] = 'user@gmail.com'
+        self.assertEqual('%EMAILADDRESS%', isp_database.lookup('gmail.com')['incoming']['username'])
+
+    def test_database_is_reloaded_when_changed(self):
+        isp_database = IspDatabase(self.path)
+        self.assertIsNone(isp_database.lookup('gmail.com'))
+
+        write_database(build_database([('googlemail.com', _sample_response)]), self.path)
+        os.utime(self.path, (0, 0))
+        self.assertIsNotNone(isp_database.lookup('gmail.com'))
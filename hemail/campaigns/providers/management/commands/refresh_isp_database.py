@@ -0,0 +1,83 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.providers.isp.database import ISP_DATABASE_PATH, build_database, write_database
+
+ISPDB_URL = 'https://autoconfig.thunderbird.net/v1.1/'
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds local ISP configurations database from ISPDB xml files.
+    """
+
+    help = 'Rebuilds local ISP configurations database from ISPDB xml files or from Thunderbird autoconfig server.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('sources', nargs='*',
+                            help='ISPDB xml files or directories with them. Downloaded from --url when omitted.')
+        parser.add_argument('--url', action='store', dest='url', default=ISPDB_URL,
+                            help='ISPDB url to download configurations from. Default is "%s".' % ISPDB_URL)
+        parser.add_argument('--output', action='store', dest='output', default=ISP_DATABASE_PATH,
+                            help='Database file to write. Default is bundled database.')
+
+    def handle(self, *args, **options) -> None:
+        verbosity = int(options.get('verbosity', 1))
+
+        sources = options['sources']
+        if sources:
+            files = self._read_files(sources)
+        else:
+            files = self._download(options['url'])
+
+        database = build_database(files)
+        if not database['domains']:
+            raise CommandError('No ISP configurations found, database is left untouched')
+
+        write_database(database, options['output'])
+        if verbosity >= 1:
+            self.stdout.write('%d configurations for %d domains are written into %s' % (
+                len(database['configurations']), len(database['domains']), options['output'],
+            ))
+
+    @staticmethod
+    def _read_files(sources: List[str]) -> Iterator[Tuple[str, bytes]]:
+        for source in sources:
+            if os.path.isdir(source):
+                paths = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+            else:
+                paths = [source]
+            for path in paths:
+                if os.path.isfile(path):
+                    with open(path, 'rb') as f:
+                        yield os.path.basename(path), f.read()
+
+    @staticmethod
+    def _download(url: str) -> List[Tuple[str, bytes]]:
+        import requests
+
+        session = requests.Session()
+        try:
+            r = session.get(url, timeout=30)
+            r.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise CommandError('Failed to get ISPDB index: %s' % e) from e
+
+        # index is a plain directory listing where each file is named by a domain
+        names = sorted(set(n for n in re.findall(r'href="([\w.-]+\.[\w-]+)"', r.text)))
+
+        def fetch(name: str) -> Tuple[str, bytes]:
+            response = session.get(urljoin(url, name), timeout=30)
+            response.raise_for_status()
+            return name, response.content
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            try:
+                return list(executor.map(fetch, names))
+            except requests.exceptions.RequestException as e:
+                raise CommandError('Failed to download ISPDB: %s' % e) from e
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
 
 
 class EmailAccountQuerySet(models.QuerySet):
@@ -7,3 +10,38 @@ class EmailAccountQuerySet(models.QuerySet):
 
 
 EmailAccountManager = EmailAccountQuerySet.as_manager
+
+
+class AttachmentContentQuerySet(models.QuerySet):
+    def acquire(self, digest: str, field_file: FieldFile, name: str, content: File) -> None:
+        """
+        Points field file to stored content with the same digest or stores the content if it is new one.
+        """
+        with transaction.atomic():
+            # unique digest blocks concurrent creators until the content is uploaded and committed
+            stored, created = self.select_for_update().get_or_create(digest=digest)
+            if created:
+                stored.document.save(name, content, save=False)
+                stored.save(update_fields=('document',))
+            self.filter(pk=stored.pk).update(references=F('references') + 1)
+
+        field_file.name = stored.document.name
+
+    def release(self, name: str) -> bool:
+        """
+        Drops a reference to stored content and removes the file when nobody refers it anymore.
+        Returns False if file with such name is not a shared content.
+        """
+        with transaction.atomic():
+            released = self.filter(document=name, references__gt=0).update(references=F('references') - 1)
+            if not released:
+                return False
+
+            for stored in self.select_for_update().filter(document=name, references=0):
+                stored.delete()
+                transaction.on_commit(lambda document=stored.document: document.delete(save=False))
+
+        return True
+
+
+AttachmentContentManager = AttachmentContentQuerySet.as_manager
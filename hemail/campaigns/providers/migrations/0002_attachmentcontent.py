@@ -0,0 +1,23 @@
+# Generated by Django 2.0.6 on 2018-07-02 12:00
+
+import django_mailbox.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('providers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentContent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('digest', models.CharField(help_text='SHA-256 of the decoded content', max_length=64, unique=True)),
+                ('document', models.FileField(db_index=True, upload_to=django_mailbox.utils.get_attachment_save_path)),
+                ('references', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+        ),
+    ]
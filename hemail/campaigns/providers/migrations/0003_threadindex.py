@@ -0,0 +1,37 @@
+# Generated by Django 2.0.6 on 2018-07-03 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_messages(apps, schema_editor):
+    Message = apps.get_model('django_mailbox', 'Message')
+    ThreadIndex = apps.get_model('providers', 'ThreadIndex')
+
+    batch = []
+    for record_id, message_id in Message.objects.exclude(message_id='').values_list('id', 'message_id').iterator():
+        batch.append(ThreadIndex(record_id=record_id, message_id=message_id))
+        if len(batch) >= 1000:
+            ThreadIndex.objects.bulk_create(batch)
+            batch = []
+    ThreadIndex.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('django_mailbox', '0005_auto_20160523_2240'),
+        ('providers', '0002_attachmentcontent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(db_index=True, max_length=255)),
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='thread_index',
+                                                to='django_mailbox.Message')),
+            ],
+        ),
+        migrations.RunPython(index_existing_messages, migrations.RunPython.noop),
+    ]
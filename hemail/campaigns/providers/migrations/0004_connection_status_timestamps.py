@@ -0,0 +1,42 @@
+# Generated by Django 2.0.6 on 2018-07-05 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('providers', '0003_threadindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coolmailbox',
+            name='authentication_failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coolmailbox',
+            name='status_checked',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='coolmailbox',
+            name='status_succeeded',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='smtpconnectionsettings',
+            name='authentication_failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='smtpconnectionsettings',
+            name='status_checked',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='smtpconnectionsettings',
+            name='status_succeeded',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
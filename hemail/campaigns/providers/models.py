@@ -1,3 +1,4 @@
+import datetime
 import email
 import enum
 import logging
@@ -5,16 +6,20 @@ import mimetypes
 import os
 import re
 import socket
+import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from email.message import Message as RawMessage
-from typing import Callable, List, Mapping, Optional
+from email.parser import BytesHeaderParser
+from typing import Callable, List, Mapping, Optional, Sequence
 from urllib.parse import parse_qs, quote_plus, unquote, urlencode, urlparse
 
-import six
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files import File
 from django.core.mail import EmailMultiAlternatives
-from django.db import models, transaction
+from django.db import connection as db_connection, models, transaction
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django_mailbox import utils
 from django_mailbox.models import ContentFile, Mailbox, Message, MessageAttachment
@@ -22,12 +27,23 @@ from enumfields import EnumField
 from post_office import models as post_office_models
 
 from .configuration import AuthenticationType, EncryptionType, IncomingConfiguration, OutgoingConfiguration
-from .managers import EmailAccountManager
+from .managers import AttachmentContentManager, EmailAccountManager
+from .signals import messages_received
+from .utils import decode_payload_into, get_file_digest, get_referenced_message_ids, is_truncated_payload
 
 logger = logging.getLogger(__name__)
 
 mailbox_settings = utils.get_settings()
 
+# attachments bigger than this are spooled to disk during decoding
+ATTACHMENT_SPOOL_MAX_SIZE = 1024 * 1024
+
+# connection which succeeded recently (e.g. during mail sync or sending) is not verified again
+VERIFICATION_HEALTHY_PERIOD = datetime.timedelta(hours=1)
+# repeated authentication failures are verified with exponential back off
+VERIFICATION_BACKOFF_BASE = datetime.timedelta(minutes=30)
+VERIFICATION_BACKOFF_MAX = datetime.timedelta(days=1)
+
 
 class ProviderNotSpecified(Exception):
     pass
@@ -105,7 +121,92 @@ class ConnectionStatus(enum.Enum):
     FAILED = 'FAILED'
 
 
-class SmtpConnectionSettings(models.Model):
+class ConnectionStatusModel(models.Model):
+    """
+    Status of the connection to a server. Subclasses open connections with
+    `get_connection(timeout=None, save=True)`, which updates the status and raises `ConnectionException` on failure.
+    """
+    status_description = models.TextField(blank=True, editable=False)
+    status = EnumField(ConnectionStatus, max_length=32, default=ConnectionStatus.UNKNOWN, editable=False)
+
+    status_checked = models.DateTimeField(null=True, editable=False)
+    status_succeeded = models.DateTimeField(null=True, editable=False)
+    authentication_failures = models.PositiveIntegerField(default=0, editable=False)
+
+    STATUS_FIELDS = ['status', 'status_description', 'status_checked', 'status_succeeded', 'authentication_failures']
+
+    class Meta:
+        abstract = True
+
+    def drop_status(self) -> None:
+        self.status = ConnectionStatus.UNKNOWN
+        self.status_description = ''
+        self.status_checked = None
+        self.authentication_failures = 0
+
+    def set_status(self, status: ConnectionStatus, description: str, save: bool = True) -> None:
+        now = timezone.now()
+        # handled on save (see `campaigns.providers.signals.handlers`)
+        self.status_changed = self.status != status
+        self.status = status
+        self.status_description = description
+        self.status_checked = now
+        if status == ConnectionStatus.SUCCESS:
+            self.status_succeeded = now
+            self.authentication_failures = 0
+        elif status == ConnectionStatus.AUTHENTICATION_FAILED:
+            self.authentication_failures += 1
+        if save:
+            self.save()
+
+    def is_verification_due(self, now: Optional[datetime.datetime] = None) -> bool:
+        now = now or timezone.now()
+        if self.status == ConnectionStatus.SUCCESS and self.status_succeeded is not None:
+            return now - self.status_succeeded >= VERIFICATION_HEALTHY_PERIOD
+        if self.status == ConnectionStatus.AUTHENTICATION_FAILED and self.status_checked is not None:
+            backoff = VERIFICATION_BACKOFF_BASE * 2 ** max(self.authentication_failures - 1, 0)
+            return now - self.status_checked >= min(backoff, VERIFICATION_BACKOFF_MAX)
+        return True
+
+    def verify_connection(self, timeout: Optional[float] = None, save: bool = True) -> bool:
+        """
+        Opens and closes connection to update its status.
+        """
+        try:
+            conn = self.get_connection(timeout=timeout, save=save)
+        except ConnectionException:
+            return False
+
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug("Failed to close verified connection to %s: %s", self.location, e)
+        return True
+
+
+def verify_connections(connections: Sequence[ConnectionStatusModel],
+                       timeout: Optional[float] = None, max_workers: int = 8) -> None:
+    """
+    Verifies connections concurrently, statuses are saved by the calling thread.
+    """
+    from tenancy.utils import in_tenant_thread
+
+    if not connections:
+        return
+
+    for conn in connections:
+        # related user is loaded by calling thread, so verifying threads hit database only for OAuth2 tokens
+        conn.emailaccount.user
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(connections))) as executor:
+        verify = in_tenant_thread(lambda conn: conn.verify_connection(timeout=timeout, save=False))
+        list(executor.map(verify, connections))
+
+    for conn in connections:
+        conn.save(update_fields=ConnectionStatusModel.STATUS_FIELDS)
+
+
+class SmtpConnectionSettings(ConnectionStatusModel):
     uri = models.TextField(
         _(u'URI'),
         help_text=(_(
@@ -119,9 +220,6 @@ class SmtpConnectionSettings(models.Model):
         default=None,
     )
 
-    status_description = models.TextField(blank=True, editable=False)
-    status = EnumField(ConnectionStatus, max_length=32, default=ConnectionStatus.UNKNOWN, editable=False)
-
     @staticmethod
     def get_uri_from(conf: OutgoingConfiguration,
                      password: Optional[str] = None,
@@ -154,10 +252,6 @@ class SmtpConnectionSettings(models.Model):
             self.provider
         )
 
-    def drop_status(self) -> None:
-        self.status = ConnectionStatus.UNKNOWN
-        self.status_description = ''
-
     @property
     def _protocol_info(self):
         return urlparse(self.uri)
@@ -244,7 +338,8 @@ class SmtpConnectionSettings(models.Model):
         if errors:
             raise ValidationError(errors)
 
-    def get_connection(self) -> 'django.core.mail.backends.smtp.EmailBackend':
+    def get_connection(self, timeout: Optional[float] = None,
+                       save: bool = True) -> 'django.core.mail.backends.smtp.EmailBackend':
         # todo: support connection cache as in post_office.connections.ConnectionHandler
 
         from .transports.oauth2 import OAuth2SmtpEmailBackend
@@ -253,7 +348,7 @@ class SmtpConnectionSettings(models.Model):
             self.emailaccount.user,
             host=self.location, port=self.port,
             username=self.username, password=self.password,
-            use_tls=self.use_tls, fail_silently=False, use_ssl=self.use_ssl,
+            use_tls=self.use_tls, fail_silently=False, use_ssl=self.use_ssl, timeout=timeout,
             authentication=self.authentication,
             provider=self.provider,
         )
@@ -263,40 +358,67 @@ class SmtpConnectionSettings(models.Model):
 
         try:
             conn.open()
-            self.status = ConnectionStatus.SUCCESS
-            self.status_description = 'Success'
-            self.save()
+            self.set_status(ConnectionStatus.SUCCESS, 'Success', save)
         except smtplib.SMTPAuthenticationError as e:
-            self.status = ConnectionStatus.AUTHENTICATION_FAILED
-            self.status_description = str(e.smtp_error)
-            self.save()
+            self.set_status(ConnectionStatus.AUTHENTICATION_FAILED, str(e.smtp_error), save)
             raise AuthenticationException(str(e.smtp_error)) from e
         except smtplib.SMTPResponseException as e:
-            self.status = ConnectionStatus.FAILED
-            self.status_description = str(e.smtp_error)
-            self.save()
+            self.set_status(ConnectionStatus.FAILED, str(e.smtp_error), save)
             raise ResponseException from e
         except (smtplib.SMTPException, socket.error) as e:
-            self.status = ConnectionStatus.FAILED
-            self.status_description = str(e)
-            self.save()
+            self.set_status(ConnectionStatus.FAILED, str(e), save)
             raise ConnectionException from e
         return conn
 
 
+class AttachmentContent(models.Model):
+    """
+    Inbound attachment file shared by all message attachments with the same content.
+    """
+
+    created = models.DateTimeField(auto_now_add=True)
+
+    digest = models.CharField(max_length=64, unique=True, help_text=_('SHA-256 of the decoded content'))
+    document = models.FileField(upload_to=utils.get_attachment_save_path, db_index=True)
+    references = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = AttachmentContentManager()
+
+    def __str__(self) -> str:
+        return self.digest
+
+
+class ThreadIndex(models.Model):
+    """
+    Indexed message ids of recorded messages to find messages replies refer to without scanning messages table.
+    """
+
+    record = models.OneToOneField(Message, on_delete=models.CASCADE, related_name='thread_index')
+    message_id = models.CharField(max_length=255, db_index=True)
+
+    def __str__(self) -> str:
+        return self.message_id
+
+
+def get_thread_references(message: Message) -> List[str]:
+    """
+    Returns ids of messages the recorded message replies to (see `get_referenced_message_ids`).
+    """
+    thread_references = getattr(message, 'thread_references', None)
+    if thread_references is None:
+        headers = BytesHeaderParser().parsebytes(message.get_body())
+        thread_references = get_referenced_message_ids(headers['in-reply-to'], headers['references'])
+    return thread_references
+
+
 class MessageStripReason(enum.Enum):
     NOT_ALLOWED = 'NOT_ALLOWED'
     TRUNCATED = 'TRUNCATED'
 
 
-class CoolMailbox(Mailbox):
-    status_description = models.TextField(blank=True, editable=False)
-    status = EnumField(ConnectionStatus, max_length=32, default=ConnectionStatus.UNKNOWN, editable=False)
-
+class CoolMailbox(ConnectionStatusModel, Mailbox):
     last_uid = models.IntegerField(null=True)
 
-    # todo: add last success date
-
     @staticmethod
     def get_uri_from(conf: IncomingConfiguration,
                      password: Optional[str] = None,
@@ -332,10 +454,6 @@ class CoolMailbox(Mailbox):
     def update_uri(self, uri: str) -> None:
         self.uri = uri
 
-    def drop_status(self) -> None:
-        self.status = ConnectionStatus.UNKNOWN
-        self.status_description = ''
-
     @property
     def password(self) -> Optional[str]:
         password = self._protocol_info.password
@@ -362,7 +480,8 @@ class CoolMailbox(Mailbox):
             return None
         return provider_ids[0]
 
-    def get_connection(self) -> 'django_mailbox.transports.base.EmailTransport':
+    def get_connection(self, timeout: Optional[float] = None,
+                       save: bool = True) -> 'django_mailbox.transports.base.EmailTransport':
         assert self.type == 'imap'
         prog = re.compile(r'\[(?P<type>\w+)\]\s?(?P<msg>.*)')
 
@@ -377,34 +496,28 @@ class CoolMailbox(Mailbox):
             folder=self.folder,
             authentication=self.authentication,
             provider=self.provider,
+            timeout=timeout,
         )
 
         try:
             conn.connect(self.username, self.password)
-            self.status = ConnectionStatus.SUCCESS
-            self.status_description = 'Success'
-            self.save()
+            self.set_status(ConnectionStatus.SUCCESS, 'Success', save)
         except socket.error as e:
-            self.status = ConnectionStatus.FAILED
-            self.status_description = str(os.strerror(e.errno)) if e.errno is not None else str(e)
-            self.save()
+            self.set_status(ConnectionStatus.FAILED,
+                            str(os.strerror(e.errno)) if e.errno is not None else str(e), save)
             raise ConnectionException from e
         except conn.transport.error as e:
             result = prog.match(str(e))
             if result:
                 t, msg = result.group('type', 'msg')
                 try:
-                    self.status = ConnectionStatus(t)
-                    self.status_description = msg
-                    self.save()
+                    self.set_status(ConnectionStatus(t), msg, save)
                     if self.status == ConnectionStatus.AUTHENTICATION_FAILED:
                         raise AuthenticationException(msg) from e
                     raise ConnectionException from e
                 except ValueError:
                     pass
-            self.status = ConnectionStatus.FAILED
-            self.status_description = str(e)
-            self.save()
+            self.set_status(ConnectionStatus.FAILED, str(e), save)
 
             raise ConnectionException from e
 
@@ -432,7 +545,7 @@ class CoolMailbox(Mailbox):
 
     def _get_dehydrated_attachment(self, msg: RawMessage, record: Message) -> RawMessage:
         raw_payload = msg.get_payload()
-        if raw_payload and raw_payload.splitlines()[-1] == '----- Message truncated -----':
+        if raw_payload and isinstance(raw_payload, str) and is_truncated_payload(raw_payload):
             return self._get_dehydrated_as_stripped(msg, record, reason=MessageStripReason.TRUNCATED)
 
         filename = None
@@ -450,14 +563,12 @@ class CoolMailbox(Mailbox):
 
         attachment = MessageAttachment()
 
-        attachment.document.save(
-            uuid.uuid4().hex + extension,
-            ContentFile(
-                six.BytesIO(
-                    msg.get_payload(decode=True)
-                ).getvalue()
-            )
-        )
+        with tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_MAX_SIZE) as fp:
+            decode_payload_into(msg, fp)
+            fp.seek(0)
+            digest = get_file_digest(fp)
+            fp.seek(0)
+            AttachmentContent.objects.acquire(digest, attachment.document, digest + extension, File(fp))
         attachment.message = record
         for key, value in msg.items():
             attachment[key] = value
@@ -575,6 +686,8 @@ class CoolMailbox(Mailbox):
                 message['Delivered-To']
             )
         msg.save()
+        if msg.message_id:
+            ThreadIndex.objects.create(record=msg, message_id=msg.message_id)
         dehydrated_message = self._get_dehydrated_message(message, msg)
 
         try:
@@ -590,28 +703,46 @@ class CoolMailbox(Mailbox):
                 raise e
 
         msg.set_body(message_context)
-        if dehydrated_message['in-reply-to']:
-            msg.in_reply_to = Message.objects.filter(
-                message_id=dehydrated_message['in-reply-to'].strip()
-            ).first()
+        msg.thread_references = get_referenced_message_ids(message['in-reply-to'], message['references'])
+        if msg.thread_references:
+            indexed = {
+                entry.message_id: entry.record for entry in ThreadIndex.objects.filter(
+                    message_id__in=msg.thread_references,
+                ).exclude(record=msg).select_related('record')
+            }
+            msg.in_reply_to = next((indexed[m] for m in msg.thread_references if m in indexed), None)
         msg.save()
         return msg
 
     def get_new_mail(self, condition: Optional[Callable[[RawMessage], bool]] = None) -> List[Message]:
         """Connect to this transport and fetch new messages."""
-        connection = self.get_connection()
+        from .transports.pool import imap_sessions
+
+        # session is reused only while mailbox configuration is the same
+        session_key = (db_connection.schema_name, self.pk, self.uri, self.folder)
+        connection = imap_sessions.acquire(session_key, self.get_connection)
         if not connection:
             return []
 
         new_mail = []
-        with transaction.atomic():
-            last_uid = self.last_uid
-            for uid, message in connection.get_new_message(last_uid=last_uid, condition=condition):
-                msg = self.process_incoming_message(message)
-                new_mail.append(msg)
-                last_uid = uid
-            self.last_uid = last_uid
-            self.save()
+        try:
+            with transaction.atomic():
+                last_uid = self.last_uid
+                for uid, message in connection.get_new_message(last_uid=last_uid, condition=condition):
+                    msg = self.process_incoming_message(message)
+                    new_mail.append(msg)
+                    last_uid = uid
+                self.last_uid = last_uid
+                # successful sync proves the connection is healthy, so it is not verified separately
+                self.status_succeeded = timezone.now()
+                self.save()
+                if new_mail:
+                    messages_received.send(sender=self, messages=new_mail)
+        except BaseException:
+            imap_sessions.discard(connection)
+            raise
+
+        imap_sessions.release(session_key, connection)
         return new_mail
 
 
@@ -654,15 +785,8 @@ class EmailAccount(models.Model):
     def full_clean(self, exclude=None, validate_unique=True):
         return super().full_clean(exclude, validate_unique)
 
-    def verify_connections(self) -> None:
-        try:
-            self.incoming.get_connection()
-        except ConnectionException:
-            pass
-        try:
-            self.outgoing.get_connection()
-        except ConnectionException:
-            pass
+    def verify_connections(self, timeout: Optional[float] = None) -> None:
+        verify_connections([self.incoming, self.outgoing], timeout=timeout)
 
     def get_new_mail(self):
         return self.incoming.get_new_mail()
@@ -0,0 +1,159 @@
+"""
+Provider configuration detection by probing common server names and ports of the email domain.
+
+All candidates are probed concurrently, so detection takes as long as the slowest useful probe: as soon as
+the best candidate (by the same rules as ISP configurations are chosen) is confirmed, other probes are cancelled.
+"""
+import asyncio
+import logging
+import ssl
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .configuration import (
+    AuthenticationType, BasicConfiguration, EncryptionType, IncomingConfiguration, OutgoingConfiguration,
+    ProviderConfiguration, UsernameTemplates,
+)
+from .isp.parser import _configuration_priority
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = 5
+
+# host templates go from the most specific one
+INCOMING_HOSTS = ['imap.{domain}', 'mail.{domain}', '{domain}']
+INCOMING_PORTS = [(993, EncryptionType.SSL), (143, EncryptionType.STARTTLS)]
+OUTGOING_HOSTS = ['smtp.{domain}', 'mail.{domain}', '{domain}']
+OUTGOING_PORTS = [(465, EncryptionType.SSL), (587, EncryptionType.STARTTLS), (25, EncryptionType.STARTTLS)]
+
+Probe = Callable[[BasicConfiguration, ssl.SSLContext], Awaitable[bool]]
+
+
+def get_common_candidates(domain: str) -> Tuple[List[IncomingConfiguration], List[OutgoingConfiguration]]:
+    def candidates(cls, hosts, ports):
+        return [
+            cls(host.format(domain=domain), port, encryption, UsernameTemplates.EMAILADDRESS.value,
+                AuthenticationType.BASIC)
+            for host in hosts for port, encryption in ports
+        ]
+
+    return (
+        candidates(IncomingConfiguration, INCOMING_HOSTS, INCOMING_PORTS),
+        candidates(OutgoingConfiguration, OUTGOING_HOSTS, OUTGOING_PORTS),
+    )
+
+
+async def _open_connection(conf: BasicConfiguration, ssl_context: ssl.SSLContext):
+    return await asyncio.open_connection(
+        conf.host, conf.port,
+        ssl=ssl_context if conf.encryption == EncryptionType.SSL else None,
+    )
+
+
+async def probe_imap(conf: BasicConfiguration, ssl_context: ssl.SSLContext) -> bool:
+    reader, writer = await _open_connection(conf, ssl_context)
+    try:
+        greeting = await reader.readline()
+        if not greeting.startswith(b'* OK'):
+            return False
+        if conf.encryption == EncryptionType.SSL:
+            return True
+
+        writer.write(b'p1 CAPABILITY\r\n')
+        capabilities = b''
+        while True:
+            line = await reader.readline()
+            if not line:
+                return False
+            if line.startswith(b'p1 '):
+                break
+            capabilities += line
+        return line.startswith(b'p1 OK') and b'STARTTLS' in capabilities.upper()
+    finally:
+        writer.close()
+
+
+async def _read_smtp_reply(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    lines = []
+    while True:
+        line = await reader.readline()
+        if len(line) < 4:
+            return -1, b''.join(lines)
+        lines.append(line[4:])
+        if line[3:4] != b'-':
+            return int(line[:3]), b''.join(lines)
+
+
+async def probe_smtp(conf: BasicConfiguration, ssl_context: ssl.SSLContext) -> bool:
+    reader, writer = await _open_connection(conf, ssl_context)
+    try:
+        code, _ = await _read_smtp_reply(reader)
+        if code != 220:
+            return False
+        if conf.encryption == EncryptionType.SSL:
+            return True
+
+        writer.write(b'EHLO localhost\r\n')
+        code, extensions = await _read_smtp_reply(reader)
+        writer.write(b'QUIT\r\n')
+        return code == 250 and b'STARTTLS' in extensions.upper()
+    finally:
+        writer.close()
+
+
+async def probe_best(candidates: List[BasicConfiguration], probe: Probe,
+                     timeout: float = PROBE_TIMEOUT,
+                     ssl_context: Optional[ssl.SSLContext] = None) -> Optional[BasicConfiguration]:
+    """
+    Returns the best of candidates confirmed by the probe, candidates of equal priority are preferred in
+    the given order.
+    """
+    if ssl_context is None:
+        ssl_context = ssl.create_default_context()
+
+    # sorting is stable, so given order of the same priority candidates is kept
+    ranked = sorted(candidates, key=_configuration_priority, reverse=True)
+    probes = [asyncio.ensure_future(asyncio.wait_for(probe(conf, ssl_context), timeout)) for conf in ranked]
+    confirmed = [None] * len(probes)
+
+    try:
+        pending = set(probes)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                index = probes.index(future)
+                exception = future.exception()
+                if exception is not None:
+                    logger.debug("Probe of %s:%s failed: %r", ranked[index].host, ranked[index].port, exception)
+                confirmed[index] = exception is None and future.result()
+
+            for index, result in enumerate(confirmed):
+                if result is None:
+                    # better candidate is still probing
+                    break
+                if result:
+                    return ranked[index]
+        return None
+    finally:
+        for future in probes:
+            future.cancel()
+
+
+async def probe_configuration(incoming_candidates: List[IncomingConfiguration],
+                              outgoing_candidates: List[OutgoingConfiguration],
+                              timeout: float = PROBE_TIMEOUT,
+                              ssl_context: Optional[ssl.SSLContext] = None) -> Optional[ProviderConfiguration]:
+    incoming, outgoing = await asyncio.gather(
+        probe_best(incoming_candidates, probe_imap, timeout, ssl_context),
+        probe_best(outgoing_candidates, probe_smtp, timeout, ssl_context),
+    )
+    if incoming is None or outgoing is None:
+        return None
+    return ProviderConfiguration(None, incoming, outgoing)
+
+
+def probe_common_server_names(domain: str, timeout: float = PROBE_TIMEOUT) -> Optional[ProviderConfiguration]:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(probe_configuration(*get_common_candidates(domain), timeout=timeout))
+    finally:
+        loop.close()
@@ -0,0 +1,3 @@
+from django.dispatch import Signal
+
+messages_received = Signal(providing_args=['messages'])
@@ -1,14 +1,19 @@
 from allauth.socialaccount.models import SocialLogin
 from allauth.socialaccount.signals import social_account_updated
 from celery import group
-from django.db.models.signals import pre_save
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django_mailbox.models import MessageAttachment
 from tenant_schemas.utils import tenant_context
 
 from campaigns.providers.configuration import AuthenticationType
 from tenancy.models import TenantData
 from tenancy.signals import tenant_prepared
-from ..models import EmailAccount
+from users.utils import invalidate_cached_oauth2_token
+from ..directory.models import ConnectionDirection, DomainConfiguration
+from ..models import AttachmentContent, ConnectionStatus, CoolMailbox, EmailAccount, SmtpConnectionSettings
 from ..tasks import create_default_provider, verify_email_account_task
 
 
@@ -25,6 +30,34 @@ def _reset_default_email_account(instance: EmailAccount, raw, using, update_fiel
         instance.default = True
 
 
+@receiver(post_delete, sender=MessageAttachment)
+def _release_attachment_content(instance: MessageAttachment, **kwargs) -> None:
+    if instance.document.name:
+        AttachmentContent.objects.release(instance.document.name)
+
+
+@receiver(post_save, sender=CoolMailbox)
+@receiver(post_save, sender=SmtpConnectionSettings)
+def _record_domain_configuration(instance, raw, **kwargs) -> None:
+    if raw or not getattr(instance, 'status_changed', False):
+        return
+    instance.status_changed = False
+    if instance.status not in (ConnectionStatus.SUCCESS, ConnectionStatus.FAILED):
+        return
+
+    try:
+        email = instance.emailaccount.email
+    except ObjectDoesNotExist:
+        return
+
+    direction = ConnectionDirection.INCOMING if isinstance(instance, CoolMailbox) else ConnectionDirection.OUTGOING
+    configuration = instance.to_configuration()
+    succeeded = instance.status == ConnectionStatus.SUCCESS
+    tenant_id = connection.tenant.id
+    transaction.on_commit(lambda: DomainConfiguration.objects.record(email, direction, configuration, succeeded,
+                                                                     tenant_id))
+
+
 @receiver(tenant_prepared, sender=TenantData)
 def _try_guess_user_email_provider_by_primary_email(tenant: TenantData, **kwargs) -> None:
     group(create_default_provider(user) for user in tenant.users.all()).delay()
@@ -33,12 +66,15 @@ def _try_guess_user_email_provider_by_primary_email(tenant: TenantData, **kwargs
 @receiver(social_account_updated, sender=SocialLogin)
 def _drop_connection_statuses(request, sociallogin: SocialLogin, **kwargs) -> None:
     user = sociallogin.user
+    provider = sociallogin.account.provider
+    # new tokens were stored, so cached one is outdated
+    invalidate_cached_oauth2_token(provider, user)
+
     tenant = user.profile.tenant if hasattr(user, 'profile') else None
     if not tenant:
         return
 
     with tenant_context(tenant):
-        provider = sociallogin.account.provider
         for email_account in user.email_accounts.all():
             changed = False
 
@@ -1,27 +1,36 @@
 import datetime
 import sys
+import time
 import traceback
 from collections import OrderedDict, namedtuple
 from functools import wraps
-from typing import Any, NamedTuple, Optional, Tuple, TypeVar
+from typing import Any, List, NamedTuple, Optional, Tuple, TypeVar
 
 from allauth.account.utils import user_email
 from celery import chain, shared_task
-from celery.exceptions import Reject
+from celery.exceptions import Reject, SoftTimeLimitExceeded
 from celery.schedules import schedule
 from celery.task import periodic_task
 from celery.utils.log import get_task_logger
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from tenant_schemas.utils import tenant_context
 
 from tenancy.utils import map_task_per_tenants, tenant_context_or_raise_reject
-from .configuration import UsernameTemplates
-from .models import ConnectionStatus, EmailAccount
+from .configuration import (
+    BasicConfiguration, IncomingConfiguration, OutgoingConfiguration, ProviderConfiguration, UsernameTemplates,
+)
+from .models import ConnectionException, ConnectionStatus, EmailAccount, verify_connections
 from .serializers import EmailAccountSerializer, ProviderConfigurationSerializer
 from .utils import get_email_domain
 
 logger = get_task_logger(__name__)
 
+# connections of accounts in one batch are verified concurrently with this timeout (in seconds)
+VERIFICATION_BATCH_SIZE = 50
+VERIFICATION_CONCURRENCY = 16
+VERIFICATION_TIMEOUT = 10
+
 T = TypeVar("T")
 E = TypeVar("E")
 TaskResult = NamedTuple('TaskResult', [('result', Optional[T]), ('error', Optional[E])])
@@ -145,7 +154,7 @@ def verify_email_account_task(email_account_id: int, user_id: int) -> TaskResult
     try:
         with tenant_context(tenant):
             email_account = EmailAccount.objects.get(pk=email_account_id, user=user)
-            email_account.verify_connections()
+            email_account.verify_connections(timeout=VERIFICATION_TIMEOUT)
     except EmailAccount.DoesNotExist as e:
         return err(str(e))
 
@@ -166,23 +175,79 @@ def verify_email_accounts_task(user_id: int) -> TaskResult:
         return err("User %s has no tenant" % user.pk)
 
     with tenant_context(tenant):
-        accounts_ids = user.email_accounts.filter(incoming__active=True).values_list('id', flat=True)
-        for email_account_id in accounts_ids:
-            verify_email_account_task.delay(email_account_id, user_id)
+        accounts_ids = list(user.email_accounts.filter(incoming__active=True).values_list('id', flat=True))
 
+    verify_email_accounts_batch_task.delay(tenant.id, accounts_ids, force=True)
     return ok(None)
 
 
+@shared_task(soft_time_limit=5 * 60, time_limit=6 * 60)
+def verify_email_accounts_batch_task(tenant_id: int, email_accounts_ids: List[int], force: bool = False) -> TaskResult:
+    """
+    Verifies IMAP and SMTP connections of the accounts concurrently. Connections which are proven healthy
+    or backed off after authentication failures are skipped unless `force` is set.
+    """
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        now = timezone.now()
+        connections = []
+        accounts = EmailAccount.objects.filter(
+            pk__in=email_accounts_ids,
+        ).select_related('user', 'incoming', 'outgoing')
+        for account in accounts:
+            connections += [conn for conn in (account.incoming, account.outgoing)
+                            if force or conn.is_verification_due(now)]
+
+        start = time.monotonic()
+        try:
+            verify_connections(connections, timeout=VERIFICATION_TIMEOUT, max_workers=VERIFICATION_CONCURRENCY)
+        except SoftTimeLimitExceeded:
+            logger.warning("[%d: %s]: verification of %d connections timed out",
+                           tenant_id, tenant.schema_name, len(connections))
+            return err("Verification timed out")
+
+        logger.info("[%d: %s]: %d connections verified in %.3f sec",
+                    tenant_id, tenant.schema_name, len(connections), time.monotonic() - start)
+        return ok(len(connections))
+
+
+@shared_task
+def verify_email_accounts_of_tenant_task(tenant_id: int) -> TaskResult:
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        now = timezone.now()
+        accounts = EmailAccount.objects.filter(
+            incoming__active=True,
+            user__is_active=True,
+        ).select_related('incoming', 'outgoing').order_by('id')
+        accounts_ids = [account.id for account in accounts
+                        if account.incoming.is_verification_due(now) or account.outgoing.is_verification_due(now)]
+
+    for i in range(0, len(accounts_ids), VERIFICATION_BATCH_SIZE):
+        verify_email_accounts_batch_task.delay(tenant_id, accounts_ids[i:i + VERIFICATION_BATCH_SIZE])
+
+    logger.info("[%d: %s]: verification submitted for %d accounts",
+                tenant_id, tenant.schema_name, len(accounts_ids))
+    return ok(len(accounts_ids))
+
+
 @shared_task
 @wrap_result
-def get_configurations_from_isp_task(email: str) -> TaskResult:
+def get_configurations_from_isp_task(email: str, network_fallback: bool = True) -> TaskResult:
+    """
+    Looks for configuration in local ISP database, Thunderbird autoconfig server is asked only for unknown domains.
+    """
     import requests
     from .isp import parser
+    from .isp.database import isp_database
+
+    domain = get_email_domain(email)
+    configuration_data = isp_database.lookup(domain)
+    if configuration_data is not None or not network_fallback:
+        return ok(configuration_data)
 
     try:
-        r = requests.get('https://autoconfig.thunderbird.net/v1.1/' + get_email_domain(email), timeout=5)
-    except requests.exceptions.ConnectionError as e:
-        raise err(str(e))
+        r = requests.get('https://autoconfig.thunderbird.net/v1.1/' + domain, timeout=5)
+    except requests.exceptions.RequestException as e:
+        return err(str(e))
 
     if r.status_code == requests.codes.ok:
         if r.headers.get('content-type') == 'text/xml':
@@ -196,24 +261,72 @@ def get_configurations_from_isp_task(email: str) -> TaskResult:
 
 
 @shared_task
+@wrap_result
 def get_configurations_trying_common_server_names_task(email: str) -> TaskResult:
     """
     Trying to get configuration by testing common names and ports.
     """
-    return ok(None)
+    from .probe import probe_common_server_names
+
+    configuration = probe_common_server_names(get_email_domain(email))
+    if configuration is None:
+        return ok(None)
+    return ok(ProviderConfigurationSerializer(instance=configuration).data)
 
 
 @shared_task
+@wrap_result
 def get_configurations_from_existing_task(email: str) -> TaskResult:
     """
-    This could be cool improvement. As we already have a db of active configuration we could try to find
-    the email domain in it
+    Looks for configuration which is already used by accounts of several tenants of the email domain.
     """
-    return ok(None)
+    from .directory.models import ConnectionDirection, DomainConfiguration
+
+    domain = get_email_domain(email)
+    known = [DomainConfiguration.objects.best(domain, direction) for direction in ConnectionDirection]
+    if None in known:
+        return ok(None)
+
+    def to_configuration(cls, conf: DomainConfiguration) -> BasicConfiguration:
+        return cls(conf.host, conf.port, conf.encryption, conf.username_template.value, conf.authentication,
+                   conf.provider_or_none)
+
+    incoming, outgoing = known
+    configuration = ProviderConfiguration(
+        None,
+        to_configuration(IncomingConfiguration, incoming),
+        to_configuration(OutgoingConfiguration, outgoing),
+    )
+    return ok(ProviderConfigurationSerializer(instance=configuration).data)
+
+
+@shared_task
+@wrap_result
+def guess_configuration_task(email: str, network_fallback: bool = True) -> TaskResult:
+    """
+    Tries the ways to get configuration from the most trusted one: ISP database (local one or autoconfig server),
+    configurations of existing accounts and probing of common server names. Without `network_fallback` only
+    the local ones are tried.
+    """
+    guesses = [
+        (get_configurations_from_isp_task, dict(network_fallback=network_fallback)),
+        (get_configurations_from_existing_task, {}),
+    ]
+    if network_fallback:
+        guesses.append((get_configurations_trying_common_server_names_task, {}))
+
+    error = None
+    for guess, kwargs in guesses:
+        configuration_data, error = guess(email, **kwargs)
+        if error:
+            logger.warning("Failed to guess configuration for %s with %s: %s", email, guess.name, error)
+        if configuration_data is not None:
+            return ok(configuration_data)
+
+    return err(error) if error else ok(None)
 
 
-# todo: should be chained when other ways will be implemented
-guess_configuration = get_configurations_from_isp_task
+guess_configuration = guess_configuration_task
 
 
 def create_default_provider(user) -> chain:
@@ -223,27 +336,60 @@ def create_default_provider(user) -> chain:
 
 @periodic_task(run_every=schedule(run_every=datetime.timedelta(minutes=30)))
 def verify_email_account_task_from_tenants() -> TaskResult:
-    UserModel = get_user_model()
-    # TODO: we can also check last_login not to verify all account
-    for user_id in UserModel.objects.filter(is_active=True).values_list('id', flat=True):
-        verify_email_accounts_task.delay(user_id)
-
+    map_task_per_tenants(verify_email_accounts_of_tenant_task)
     return ok(None)
 
 
+@shared_task(soft_time_limit=5 * 60, time_limit=6 * 60)
+def get_new_mail_for_account(tenant_id: int, email_account_id: int) -> TaskResult:
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        try:
+            account = EmailAccount.objects.select_related('incoming').get(
+                pk=email_account_id,
+                incoming__status=ConnectionStatus.SUCCESS,
+                incoming__active=True,
+            )
+        except EmailAccount.DoesNotExist as e:
+            return err(str(e))
+
+        start = time.monotonic()
+        try:
+            received = len(account.get_new_mail())
+        except SoftTimeLimitExceeded:
+            logger.warning("[%d: %s]: account %d (%s) mail sync timed out after %.3f sec",
+                           tenant_id, tenant.schema_name, email_account_id, account.incoming.location,
+                           time.monotonic() - start)
+            return err("Mail sync timed out")
+        except ConnectionException as e:
+            logger.warning("[%d: %s]: account %d (%s) mail sync failed after %.3f sec: %s",
+                           tenant_id, tenant.schema_name, email_account_id, account.incoming.location,
+                           time.monotonic() - start, e)
+            return err(str(e))
+
+        logger.info("[%d: %s]: account %d (%s) %d messages received in %.3f sec",
+                    tenant_id, tenant.schema_name, email_account_id, account.incoming.location,
+                    received, time.monotonic() - start)
+        return ok(received)
+
+
 @shared_task
 def get_new_mail(tenant_id: int) -> TaskResult:
+    """
+    Fans out mail sync into one task per account, so a slow IMAP server does not stall other accounts
+    of the tenant. Concurrency is bounded by the worker pool and each account is limited by the time limits
+    of `get_new_mail_for_account`.
+    """
     with tenant_context_or_raise_reject(tenant_id) as tenant:
-        total = 0
-        accounts = EmailAccount.objects.filter(
+        accounts_ids = list(EmailAccount.objects.filter(
             incoming__status=ConnectionStatus.SUCCESS,
             incoming__active=True,
-        )
-        for account in accounts:
-            total += len(account.get_new_mail())
+        ).values_list('id', flat=True))
+
+    for email_account_id in accounts_ids:
+        get_new_mail_for_account.delay(tenant_id, email_account_id)
 
-        logger.info("[%d: %s]: %s messages received", tenant_id, tenant.schema_name, total)
-        return ok(total)
+    logger.info("[%d: %s]: mail sync submitted for %d accounts", tenant_id, tenant.schema_name, len(accounts_ids))
+    return ok(len(accounts_ids))
 
 
 @periodic_task(run_every=schedule(run_every=datetime.timedelta(minutes=10)))
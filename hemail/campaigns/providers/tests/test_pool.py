@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..transports.pool import ImapSessionPool
+
+
+class _Transport(object):
+    def __init__(self, hostname: str) -> None:
+        self.hostname = hostname
+        self.noop = mock.Mock()
+        self.close = mock.Mock()
+
+
+class ImapSessionPoolTestCase(SimpleTestCase):
+    def test_session_is_reused_after_noop(self):
+        pool = ImapSessionPool(idle_timeout=60, max_sessions_per_host=2)
+        transport = _Transport('imap.example.com')
+        pool.release('a', transport)
+
+        connect = mock.Mock()
+        self.assertIs(transport, pool.acquire('a', connect))
+        transport.noop.assert_called_once_with()
+        connect.assert_not_called()
+
+    def test_broken_session_is_replaced(self):
+        pool = ImapSessionPool(idle_timeout=60, max_sessions_per_host=2)
+        broken = _Transport('imap.example.com')
+        broken.noop.side_effect = OSError('connection reset')
+        pool.release('a', broken)
+
+        fresh = _Transport('imap.example.com')
+        self.assertIs(fresh, pool.acquire('a', lambda: fresh))
+        broken.close.assert_called_once_with()
+
+    def test_idle_session_is_evicted(self):
+        pool = ImapSessionPool(idle_timeout=60, max_sessions_per_host=2)
+        transport = _Transport('imap.example.com')
+        with mock.patch('time.monotonic', return_value=0):
+            pool.release('a', transport)
+
+        fresh = _Transport('imap.example.com')
+        with mock.patch('time.monotonic', return_value=61):
+            self.assertIs(fresh, pool.acquire('a', lambda: fresh))
+        transport.noop.assert_not_called()
+        transport.close.assert_called_once_with()
+
+    def test_sessions_per_host_are_limited(self):
+        pool = ImapSessionPool(idle_timeout=60, max_sessions_per_host=2)
+        first, second, third = (_Transport('imap.example.com') for _ in range(3))
+        other = _Transport('imap.example.org')
+        pool.release('a', first)
+        pool.release('x', other)
+        pool.release('b', second)
+        pool.release('c', third)
+
+        first.close.assert_called_once_with()
+        for transport in (second, third, other):
+            transport.close.assert_not_called()
+
+    def test_replaced_session_is_closed(self):
+        pool = ImapSessionPool(idle_timeout=60, max_sessions_per_host=2)
+        older, newer = (_Transport('imap.example.com') for _ in range(2))
+        pool.release('a', older)
+        pool.release('a', newer)
+        pool.release('a', newer)
+
+        older.close.assert_called_once_with()
+        newer.close.assert_not_called()
+        self.assertIs(newer, pool.acquire('a', mock.Mock()))
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+from django.test import SimpleTestCase
+
+from ..configuration import (
+    AuthenticationType, EncryptionType, IncomingConfiguration, OutgoingConfiguration, UsernameTemplates,
+)
+from ..probe import probe_best, probe_configuration, probe_imap, probe_smtp
+
+
+def _candidate(cls, port: int, encryption: EncryptionType = EncryptionType.STARTTLS):
+    return cls('127.0.0.1', port, encryption, UsernameTemplates.EMAILADDRESS.value, AuthenticationType.BASIC)
+
+
+class ProbeTestCase(SimpleTestCase):
+    """
+    Probes run against local stand-in servers which speak just enough of IMAP and SMTP.
+    """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.servers = []
+        self.silent_connections = []
+
+    def tearDown(self):
+        for writer in self.silent_connections:
+            writer.close()
+        for server in self.servers:
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+
+    def _listen(self, handler) -> int:
+        server = self.loop.run_until_complete(asyncio.start_server(handler, '127.0.0.1', 0))
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    def _unused_port(self) -> int:
+        server = self.loop.run_until_complete(asyncio.start_server(lambda r, w: None, '127.0.0.1', 0))
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+        return port
+
+    def _imap(self, capabilities: bytes) -> int:
+        async def handle(reader, writer):
+            writer.write(b'* OK IMAP4rev1 ready\r\n')
+            line = await reader.readline()
+            tag = line.split(b' ', 1)[0]
+            writer.write(b'* CAPABILITY IMAP4rev1 ' + capabilities + b'\r\n' + tag + b' OK done\r\n')
+            await writer.drain()
+            writer.close()
+
+        return self._listen(handle)
+
+    def _smtp(self, extensions: bytes) -> int:
+        async def handle(reader, writer):
+            writer.write(b'220-smtp.localhost ESMTP\r\n220 ready\r\n')
+            await reader.readline()
+            writer.write(b'250-smtp.localhost\r\n250 ' + extensions + b'\r\n')
+            await writer.drain()
+            await reader.readline()
+            writer.close()
+
+        return self._listen(handle)
+
+    def _silent(self) -> int:
+        async def handle(reader, writer):
+            self.silent_connections.append(writer)
+            await reader.read()
+
+        return self._listen(handle)
+
+    def test_starttls_servers_are_detected(self):
+        imap_port = self._imap(b'STARTTLS AUTH=PLAIN')
+        smtp_port = self._smtp(b'STARTTLS')
+
+        configuration = self.loop.run_until_complete(probe_configuration(
+            [_candidate(IncomingConfiguration, imap_port)],
+            [_candidate(OutgoingConfiguration, smtp_port)],
+            timeout=1,
+        ))
+
+        self.assertIsNotNone(configuration)
+        self.assertEqual(imap_port, configuration.incoming.port)
+        self.assertEqual(EncryptionType.STARTTLS, configuration.incoming.encryption)
+        self.assertEqual(smtp_port, configuration.outgoing.port)
+
+    def test_plain_text_only_servers_are_rejected(self):
+        found = self.loop.run_until_complete(probe_best(
+            [_candidate(IncomingConfiguration, self._imap(b'AUTH=PLAIN'))], probe_imap, timeout=1,
+        ))
+        self.assertIsNone(found)
+
+        found = self.loop.run_until_complete(probe_best(
+            [_candidate(OutgoingConfiguration, self._smtp(b'AUTH PLAIN'))], probe_smtp, timeout=1,
+        ))
+        self.assertIsNone(found)
+
+    def test_probes_run_concurrently(self):
+        candidates = [_candidate(IncomingConfiguration, self._silent()) for _ in range(3)]
+        candidates.append(_candidate(IncomingConfiguration, self._unused_port()))
+        candidates.append(_candidate(IncomingConfiguration, self._imap(b'STARTTLS')))
+
+        start = time.monotonic()
+        found = self.loop.run_until_complete(probe_best(candidates, probe_imap, timeout=0.5))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIs(candidates[-1], found)
+
+    def test_probing_stops_when_best_candidate_is_confirmed(self):
+        best = _candidate(IncomingConfiguration, self._imap(b'STARTTLS'), EncryptionType.STARTTLS)
+        # the same priority candidates are preferred in the given order, so the silent one is just waited out
+        worse = _candidate(IncomingConfiguration, self._silent(), EncryptionType.STARTTLS)
+
+        start = time.monotonic()
+        found = self.loop.run_until_complete(probe_best([best, worse], probe_imap, timeout=5))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIs(best, found)
+
+    def test_better_candidate_is_waited_for(self):
+        slow = _candidate(IncomingConfiguration, self._silent(), EncryptionType.STARTTLS)
+        fast = _candidate(IncomingConfiguration, self._imap(b'STARTTLS'), EncryptionType.STARTTLS)
+
+        start = time.monotonic()
+        found = self.loop.run_until_complete(probe_best([slow, fast], probe_imap, timeout=0.5))
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+        self.assertIs(fast, found)
@@ -0,0 +1,54 @@
+import email
+import io
+import os
+from email import encoders
+from email.message import Message
+
+from django.test import SimpleTestCase
+
+from ..utils import decode_payload_into, get_referenced_message_ids, is_truncated_payload
+
+
+class DecodePayloadTestCase(SimpleTestCase):
+
+    @staticmethod
+    def _encoded(data: bytes, encoder) -> Message:
+        msg = Message()
+        msg.set_payload(data)
+        encoder(msg)
+        return email.message_from_string(msg.as_string())
+
+    def _assert_decoded_equally(self, msg: Message) -> None:
+        fp = io.BytesIO()
+        decode_payload_into(msg, fp, chunk_size=1000)
+        self.assertEqual(msg.get_payload(decode=True), fp.getvalue())
+
+    def test_base64_payload_decoded_by_chunks(self) -> None:
+        for size in [0, 1, 2, 3, 100, 30000]:
+            self._assert_decoded_equally(self._encoded(os.urandom(size), encoders.encode_base64))
+
+    def test_quoted_printable_payload_decoded_by_chunks(self) -> None:
+        data = 'Hello = world, très bien!\n'.encode('utf-8') * 1000
+        self._assert_decoded_equally(self._encoded(data, encoders.encode_quopri))
+
+    def test_not_encoded_payload(self) -> None:
+        self._assert_decoded_equally(self._encoded(b'plain text', encoders.encode_7or8bit))
+
+    def test_truncated_payload_detection(self) -> None:
+        self.assertTrue(is_truncated_payload('abc\n----- Message truncated -----\n'))
+        self.assertFalse(is_truncated_payload('abc----- Message truncated -----'))
+        self.assertFalse(is_truncated_payload('abc'))
+
+
+class ReferencedMessageIdsTestCase(SimpleTestCase):
+
+    def test_in_reply_to_goes_before_references(self) -> None:
+        self.assertListEqual(
+            ['<c@local>', '<b@local>', '<a@local>'],
+            get_referenced_message_ids('<c@local>', '<a@local> <b@local>\n\t<c@local>'))
+
+    def test_only_references(self) -> None:
+        self.assertListEqual(['<b@local>', '<a@local>'], get_referenced_message_ids(None, '<a@local> <b@local>'))
+
+    def test_nothing_referenced(self) -> None:
+        self.assertListEqual([], get_referenced_message_ids(None, None))
@@ -1,6 +1,7 @@
 import imaplib
 import logging
 import smtplib
+import socket
 from email.message import Message
 from typing import Callable, Iterator, Optional, Tuple
 
@@ -8,17 +9,16 @@ from django.core.mail.backends.smtp import EmailBackend as SmtpEmailBackend
 from django_mailbox.transports.imap import ImapTransport
 from oauthlib.oauth2 import OAuth2Error
 
-from users.utils import get_oauth2_token, get_social_token
+from users.utils import get_cached_oauth2_token, invalidate_cached_oauth2_token
 from ..configuration import AuthenticationType
 
 logger = logging.getLogger(__name__)
 
 
 def _get_oauth2_object(user, username: str, provider: str) -> Optional[Callable[[bytes], str]]:
-    social_token = get_social_token(provider, user)
-    if social_token is None:
+    access_token = get_cached_oauth2_token(provider, user)
+    if access_token is None:
         return None
-    access_token = get_oauth2_token(social_token)
     return lambda ignored=None: 'user=%s\1auth=Bearer %s\1\1' % (
         username,
         access_token
@@ -57,13 +57,21 @@ def fetch_new_mail(server: imaplib.IMAP4, last_uid: Optional[int] = None) -> Ite
             yield uid, data[0][1]
 
 
+class _TimeoutImap4(imaplib.IMAP4):
+    connect_timeout = None  # type: Optional[float]
+
+    def _create_socket(self, *args):
+        return socket.create_connection((self.host, self.port), self.connect_timeout)
+
+
 class OAuth2ImapTransport(ImapTransport):
     def __init__(self, user, hostname: str, port: int = None,
                  ssl: bool = False, tls: bool = False,
                  archive: str = '', folder: str = None,
                  authentication: AuthenticationType = AuthenticationType.OAUTH2,
                  provider: Optional[str] = None,
-                 readonly: bool = True):
+                 readonly: bool = True,
+                 timeout: Optional[float] = None):
         self.server = None
         self.user = user
         self.authentication = authentication
@@ -82,15 +90,28 @@ class OAuth2ImapTransport(ImapTransport):
 
                 if auth_object is None:
                     raise server.error("[AUTHENTICATIONFAILED] no token stored")
-                typ, msg = server.authenticate('XOAUTH2', auth_object)
+                try:
+                    typ, msg = server.authenticate('XOAUTH2', auth_object)
+                except server.error:
+                    # cached token could be revoked, so next attempt should take it from provider again
+                    invalidate_cached_oauth2_token(provider, user)
+                    raise
                 return typ, msg
 
             self.transport = type(
                 'OAuth2Imap4SSL' if ssl else 'OAuth2Imap4',
-                (imaplib.IMAP4_SSL if ssl else imaplib.IMAP4,),
+                (self.transport,),
                 dict(login=login)
             )
 
+        if timeout is not None:
+            # IMAP4_SSL wraps the socket created by the base class, so timeout class goes after it
+            self.transport = type(
+                self.transport.__name__,
+                (self.transport, _TimeoutImap4,),
+                dict(connect_timeout=timeout)
+            )
+
     def get_new_message(self, last_uid: Optional[int] = None,
                         condition: Optional[Callable[[Message], bool]] = None) -> Iterator[Tuple[int, Message]]:
 
@@ -122,6 +143,19 @@ class OAuth2ImapTransport(ImapTransport):
                 logger.warning("Failed to parse message: %s", e, )
                 continue
 
+    def noop(self) -> None:
+        typ, data = self.server.noop()
+        if typ != 'OK':
+            raise self.server.error("NOOP failed: %s" % data)
+
+    def close(self) -> None:
+        if getattr(self, 'server', None) is None:
+            return
+        try:
+            self.server.logout()
+        finally:
+            self.server = None
+
     def get_message(self, condition=None):
         """
         Default implementation delete message from server.
@@ -184,6 +218,8 @@ class OAuth2SmtpEmailBackend(SmtpEmailBackend):
                                              initial_response_ok=initial_response_ok)
                 return code, resp
             except smtplib.SMTPAuthenticationError as e:
+                # cached token could be revoked, so next attempt should take it from provider again
+                invalidate_cached_oauth2_token(self.provider, self.user)
                 raise e
 
         return type(
@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+_Session = namedtuple('_Session', ['transport', 'host', 'last_used'])
+
+
+class ImapSessionPool(object):
+    """
+    Keeps authenticated and selected IMAP sessions of the worker between polls.
+
+    Sessions are checked with NOOP before reuse, evicted when they were idle longer than `idle_timeout`
+    seconds or failed, and no more than `max_sessions_per_host` sessions are kept open for a server host.
+    """
+
+    def __init__(self, idle_timeout: float, max_sessions_per_host: int) -> None:
+        super().__init__()
+        self.idle_timeout = idle_timeout
+        self.max_sessions_per_host = max_sessions_per_host
+        self._sessions = OrderedDict()  # least recently used go first
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable, connect: Callable[[], 'OAuth2ImapTransport']) -> 'OAuth2ImapTransport':
+        """ Takes session out of the pool or opens new one with `connect` """
+        with self._lock:
+            session = self._sessions.pop(key, None)
+
+        if session is not None:
+            if time.monotonic() - session.last_used < self.idle_timeout:
+                try:
+                    session.transport.noop()
+                    return session.transport
+                except Exception as e:
+                    logger.info("Pooled IMAP session to %s is broken: %s", session.host, e)
+            self.discard(session.transport)
+
+        return connect()
+
+    def release(self, key: Hashable, transport: 'OAuth2ImapTransport') -> None:
+        """ Returns healthy session back into the pool """
+        evicted = []
+        with self._lock:
+            # overlapping polls of the same mailbox could both release their sessions, only the latest is kept
+            previous = self._sessions.pop(key, None)
+            if previous is not None and previous.transport is not transport:
+                evicted.append(previous.transport)
+            self._sessions[key] = _Session(transport, transport.hostname, time.monotonic())
+
+            now = time.monotonic()
+            host_sessions = 0
+            for session_key, session in reversed(list(self._sessions.items())):
+                if session.host == transport.hostname:
+                    host_sessions += 1
+                if now - session.last_used >= self.idle_timeout or (
+                    session.host == transport.hostname and host_sessions > self.max_sessions_per_host
+                ):
+                    evicted.append(self._sessions.pop(session_key).transport)
+
+        for evicted_transport in evicted:
+            self.discard(evicted_transport)
+
+    def discard(self, transport: 'OAuth2ImapTransport') -> None:
+        """ Closes session which should not be reused """
+        try:
+            transport.close()
+        except Exception as e:
+            logger.debug("Failed to close IMAP session to %s: %s", transport.hostname, e)
+
+    def clear(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            self.discard(session.transport)
+
+
+# IMAP servers should not drop idle sessions earlier than in 30 minutes (RFC 3501)
+imap_sessions = ImapSessionPool(idle_timeout=25 * 60, max_sessions_per_host=10)
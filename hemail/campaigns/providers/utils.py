@@ -1,4 +1,14 @@
-from typing import Tuple
+import binascii
+import hashlib
+import re
+from collections import OrderedDict
+from email.message import Message
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+PAYLOAD_DECODING_CHUNK_SIZE = 64 * 1024
+TRUNCATED_PAYLOAD_MARKER = '----- Message truncated -----'
+
+_message_id_re = re.compile(r'<[^<>\s]+>')
 
 
 def get_email_parts(email: str) -> Tuple[str, str]:
@@ -19,3 +29,87 @@ def get_default_sender_name(user) -> str:
 
 def get_default_signature(user) -> str:
     return 'Regards, %s' % get_default_sender_name(user)
+
+
+def is_truncated_payload(payload: str) -> bool:
+    """ Checks the marker some servers put at the end of a message body they were not able to fetch completely """
+    # only the tail is checked to avoid splitting the whole payload into lines
+    lines = payload[-len(TRUNCATED_PAYLOAD_MARKER) - 4:].splitlines()
+    return bool(lines) and lines[-1] == TRUNCATED_PAYLOAD_MARKER
+
+
+def _iter_payload_chunks(payload: str, chunk_size: int) -> Iterator[bytes]:
+    # chunks are always ended on line boundary, so quoted-printable soft line breaks are never split
+    start = 0
+    while start < len(payload):
+        end = payload.find('\n', start + chunk_size)
+        end = len(payload) if end < 0 else end + 1
+        yield payload[start:end].encode('ascii', 'surrogateescape')
+        start = end
+
+
+def _decode_base64_into(payload: str, fp: BinaryIO, chunk_size: int) -> None:
+    tail = b''
+    for chunk in _iter_payload_chunks(payload, chunk_size):
+        data = tail + b''.join(chunk.split())
+        aligned = len(data) - len(data) % 4
+        fp.write(binascii.a2b_base64(data[:aligned]))
+        tail = data[aligned:]
+
+    if len(tail) > 1:
+        # the same way as email package does we are trying to recover missing padding
+        fp.write(binascii.a2b_base64(tail + b'=' * (-len(tail) % 4)))
+
+
+def _decode_quoted_printable_into(payload: str, fp: BinaryIO, chunk_size: int) -> None:
+    for chunk in _iter_payload_chunks(payload, chunk_size):
+        fp.write(binascii.a2b_qp(chunk))
+
+
+def decode_payload_into(msg: Message, fp: BinaryIO, chunk_size: int = PAYLOAD_DECODING_CHUNK_SIZE) -> None:
+    """
+    Writes decoded payload of non multipart message into the file object chunk by chunk.
+
+    It is equivalent of `fp.write(msg.get_payload(decode=True))`, but never keeps whole decoded payload in memory.
+    """
+    payload = msg.get_payload()
+    encoding = str(msg.get('content-transfer-encoding', '')).lower()
+    decoders = {
+        'base64': _decode_base64_into,
+        'quoted-printable': _decode_quoted_printable_into,
+    }
+    if not isinstance(payload, str) or encoding not in decoders:
+        fp.write(msg.get_payload(decode=True) or b'')
+        return
+
+    position = fp.tell()
+    try:
+        decoders[encoding](payload, fp, chunk_size)
+    except binascii.Error:
+        # fallback to permissive email package decoder which reports defects instead of raising
+        fp.seek(position)
+        fp.truncate()
+        fp.write(msg.get_payload(decode=True) or b'')
+
+
+def get_file_digest(fp: BinaryIO, chunk_size: int = PAYLOAD_DECODING_CHUNK_SIZE) -> str:
+    """ Calculates sha256 of file object content from its current position """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fp.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_referenced_message_ids(in_reply_to: Optional[str], references: Optional[str]) -> List[str]:
+    """
+    Returns message ids the message replies to ordered from the most to the least relevant:
+    'In-Reply-To' goes first and then 'References' from the latest to the oldest one.
+    """
+    message_ids = []
+    if in_reply_to:
+        message_ids += _message_id_re.findall(str(in_reply_to)) or [str(in_reply_to).strip()[0:255]]
+    if references:
+        message_ids += reversed(_message_id_re.findall(str(references)))
+
+    # remove duplicates keeping the order
+    return list(OrderedDict.fromkeys(message_id[0:255] for message_id in message_ids if message_id))
@@ -22,12 +22,27 @@ from .utils import get_email_parts
 logger = logging.getLogger(__name__)
 
 
+class ConfigurationsCache(CachedDelay):
+    """
+    Guessed configurations by email domain, they are rarely changed so could be served stale for a long time.
+    """
+
+    def __init__(self) -> None:
+        super().__init__('providers-isp-configurations',
+                         timeout=24 * 60 * 60, stale_timeout=7 * 24 * 60 * 60, negative_timeout=10 * 60,
+                         task_name=guess_configuration.name)
+
+    def is_negative(self, value) -> bool:
+        # task result with no configuration found
+        return value is None or value[0] is None
+
+
 class ProviderConfigurationView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     serializer_class = GuessingProviderConfigurationSerializer
 
-    cache = CachedDelay('providers-isp-configurations')
+    cache = ConfigurationsCache()
 
     def post(self, request, *args, **kwargs) -> Response:
         serializer = self.serializer_class(data=request.data)
@@ -57,11 +72,11 @@ class EmailAccountViewSet(viewsets.ModelViewSet):
     serializer_class = EmailAccountSerializer
     permission_classes = (permissions.DjangoModelPermissions,)
 
-    class C(CachedDelay):
+    class C(ConfigurationsCache):
         def failure(self):
             raise UnprocessableEntity()
 
-    cache = C('providers-isp-configurations')
+    cache = C()
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -184,7 +199,7 @@ class EmailAccountPresetsListView(generics.ListAPIView):
     serializer_class = None
     permission_classes = (permissions.IsAuthenticated,)
 
-    cache = CachedDelay('providers-isp-configurations')
+    cache = ConfigurationsCache()
 
     def list(self, request, *args, **kwargs):
         configurations = self.cache.get_many(self.domains, lambda domain: guess_configuration.delay('user@' + domain))
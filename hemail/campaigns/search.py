@@ -0,0 +1,133 @@
+"""
+Search index of django-watson maintained in background.
+
+Saved objects of registered models are queued by their primary keys once the transaction is committed, all objects
+saved within the same transaction are indexed by a single `update_search_index_task` in bulk. Objects are read
+by the task, so the index is stale for no longer than the task waits in the queue, and the task is acknowledged
+after it is done, so updates are not lost with workers. Objects saved outside of transactions are queued at once,
+loops of saves should be wrapped in a transaction to be indexed together.
+Bulk operations could skip indexing of every row with `skip_index_update` and queue all of them with `reindex`.
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models.signals import post_save
+from watson import search as watson
+from watson.models import SearchEntry
+
+from common.transactions import on_commit_batch
+
+_skipping = threading.local()
+
+
+def register(model: models.Model, **kwargs) -> None:
+    """
+    Registers the model with the default search engine of watson, its saves are indexed in background.
+    """
+    watson.register(model, **kwargs)
+    engine = watson.default_search_engine
+    post_save.disconnect(engine._post_save_receiver, model)
+    post_save.connect(_post_save_receiver, model, dispatch_uid='search-index-%s' % model._meta.label_lower)
+
+
+@contextmanager
+def skip_index_update():
+    """
+    Saved objects are not queued for indexing within the block, they are expected to be queued with `reindex`.
+    """
+    _skipping.depth = getattr(_skipping, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _skipping.depth -= 1
+
+
+def _post_save_receiver(sender, instance, using: str = DEFAULT_DB_ALIAS, **kwargs) -> None:
+    if not getattr(_skipping, 'depth', 0):
+        reindex(sender, [instance.pk], using)
+
+
+def _queue_index_update(tenant_id: int, items: Iterable[Tuple[str, int]]) -> None:
+    from .tasks import update_search_index_task
+
+    pks_by_model = dict()
+    for label, pk in items:
+        pks_by_model.setdefault(label, []).append(pk)
+    update_search_index_task.delay(tenant_id, {label: sorted(pks) for label, pks in pks_by_model.items()})
+
+
+def reindex(model: models.Model, pks: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Queues objects for indexing once the transaction is committed, objects queued within the same transaction
+    are indexed together, outside of transactions they are queued at once.
+    Deleted objects are removed from the index.
+    """
+    connection = transaction.get_connection(using)
+    tenant_id = connection.tenant.id
+    label = model._meta.label_lower
+    items = ((label, pk) for pk in pks)
+    on_commit_batch(('campaigns.search', tenant_id), partial(_queue_index_update, tenant_id), items, using)
+
+
+def _search_entries(engine: watson.SearchEngine, content_type: ContentType,
+                    objects: Iterable[models.Model]) -> Iterable[SearchEntry]:
+    adapter = engine.get_adapter(content_type.model_class())
+    for obj in objects:
+        yield SearchEntry(
+            engine_slug=engine._engine_slug,
+            content_type=content_type,
+            object_id=str(obj.pk),
+            object_id_int=obj.pk,
+            title=adapter.get_title(obj),
+            description=adapter.get_description(obj),
+            content=adapter.get_content(obj),
+            url=adapter.get_url(obj),
+            meta_encoded=adapter.serialize_meta(obj),
+        )
+
+
+def _lock_objects(content_type: ContentType, pks: List[int], using: str) -> None:
+    """
+    Takes transaction level advisory locks of the objects in the order of their sorted primary keys,
+    so concurrent tasks replace entries of the same object one after another. Locks are shared by schemas,
+    so tasks of different tenants could only wait for each other.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, pk) FROM unnest(%s::integer[]) AS pk', [
+            content_type.pk, sorted(pks),
+        ])
+
+
+def update_index(pks_by_model: Dict[str, List[int]], batch_size: int = 500) -> int:
+    """
+    Replaces search entries of the objects with entries of their current state, entries of the objects
+    which do not exist anymore are just removed. Returns the number of indexed objects.
+    """
+    engine = watson.default_search_engine
+    indexed = 0
+    for label, pks in pks_by_model.items():
+        model = apps.get_model(label)
+        if not engine.is_registered(model):
+            continue
+        content_type = ContentType.objects.get_for_model(model)
+        using = SearchEntry.objects.db
+
+        pks = iter(sorted(pks))
+        for batch in iter(lambda: list(islice(pks, batch_size)), []):
+            with transaction.atomic(using=using):
+                _lock_objects(content_type, batch, using)
+                SearchEntry.objects.filter(
+                    engine_slug=engine._engine_slug,
+                    content_type=content_type,
+                    object_id_int__in=batch,
+                ).delete()
+                entries = list(_search_entries(engine, content_type, model._default_manager.filter(pk__in=batch)))
+                SearchEntry.objects.bulk_create(entries, batch_size=100)
+            indexed += len(entries)
+    return indexed
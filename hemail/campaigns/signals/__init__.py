@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sent once for participations created in bulk instead of `post_save` for every one of them,
+# `participations` is None if they were inserted with SQL and only `campaign_ids` are known
+participations_created = Signal(providing_args=['participations', 'campaign_ids', 'using'])
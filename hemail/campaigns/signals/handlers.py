@@ -1,18 +1,26 @@
+import functools
+import itertools
 import logging
+import operator
+from typing import List, Optional, Set
 from urllib.parse import urljoin
 
 from django.conf import settings
 from django.db import connection
+from django.db.models import Q
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django_mailbox.models import Message
-from django_mailbox.signals import message_received
 
 from ..models import (
-    Campaign, CampaignProblems, CampaignSettings, CampaignStatus, EmailStage, LeadGenerationRequest, Participation,
-    ParticipationStatus, Step, StepProblems, TrackingInfo, TrackingType
+    Campaign, CampaignSettings, CampaignStatus, EmailStage, LeadGenerationRequest, Participation, ParticipationStatus,
+    ScheduledEmail, Step, TrackingInfo, TrackingType
 )
-from ..providers.models import CoolMailbox
+from ..contacts.segments import mark_contacts_dirty
+from ..problems import mark_problems_dirty
+from ..providers.models import get_thread_references
+from ..providers.signals import messages_received
+from ..signals import participations_created
 from ..tasks import process_lead_generation_request
 
 logger = logging.getLogger(__name__)
@@ -37,111 +45,95 @@ def _change_status_with_paused(sender, instance: Campaign, **kwargs) -> None:
 
 
 @receiver(post_save, sender=Step)
-def _campaign_problem_check_on_steps_creation(sender, instance: Step, created: bool, **kwargs) -> None:
+def _campaign_problem_check_on_steps_creation(sender, instance: Step, created: bool, using: str, **kwargs) -> None:
     if created:
-        modified = False
-        campaign = instance.campaign
-        campaign.refresh_from_db(fields=['problems', ])
-        if CampaignProblems.NO_STEPS in campaign.problems:
-            campaign.problems.remove(CampaignProblems.NO_STEPS)
-            modified = True
-        if CampaignProblems.EMPTY_STEP not in campaign.problems:
-            campaign.problems.append(CampaignProblems.EMPTY_STEP)
-            modified = True
-
-        if modified:
-            campaign.save(update_fields=('problems',))
+        mark_problems_dirty([instance.campaign_id], using)
 
 
 @receiver(post_delete, sender=Step)
-def _campaign_problem_check_on_steps_deletion(sender, instance: Step, **kwargs) -> None:
-    campaign = instance.campaign
-    campaign.refresh_from_db(fields=['problems', ])
-
-    modified = False
-    if CampaignProblems.NO_STEPS not in campaign.problems:
-        if not campaign.steps.exists():
-            campaign.problems.append(CampaignProblems.NO_STEPS)
-            modified = True
-            if CampaignProblems.EMPTY_STEP in campaign.problems:
-                campaign.problems.remove(CampaignProblems.EMPTY_STEP)
-        elif not campaign.steps.filter(emails=None).exists():
-            campaign.problems.remove(CampaignProblems.EMPTY_STEP)
-            modified = True
-
-    if modified:
-        campaign.save(update_fields=('problems',))
+def _campaign_problem_check_on_steps_deletion(sender, instance: Step, using: str, **kwargs) -> None:
+    mark_problems_dirty([instance.campaign_id], using)
 
 
 @receiver(post_save, sender=EmailStage)
-def _campaign_problem_check_on_email_stage_creation(sender, instance: EmailStage, created: bool, **kwarg) -> None:
-    step = instance.step
-    step.refresh_from_db(fields=['problems', ])
-    if StepProblems.EMPTY_STEP in step.problems:
-        step.problems.remove(StepProblems.EMPTY_STEP)
-        step.save(update_fields=('problems',))
-    campaign = step.campaign
-    campaign.refresh_from_db(fields=['problems', ])
-    if CampaignProblems.EMPTY_STEP in campaign.problems:
-        if not campaign.steps.filter(emails=None).exists():
-            campaign.problems.remove(CampaignProblems.EMPTY_STEP)
-            campaign.save(update_fields=('problems',))
+def _campaign_problem_check_on_email_stage_creation(sender, instance: EmailStage, using: str, **kwarg) -> None:
+    mark_problems_dirty([instance.step.campaign_id], using)
 
 
 @receiver(post_delete, sender=EmailStage)
-def _campaign_problem_check_on_email_stage_deletion(sender, instance: EmailStage, **kwargs) -> None:
-    step = instance.step
-    if not step.emails.exists() and not step.texts.exists():
-        campaign = step.campaign
-        campaign.refresh_from_db(fields=['problems', ])
-        if CampaignProblems.EMPTY_STEP not in campaign.problems:
-            campaign.problems.append(CampaignProblems.EMPTY_STEP)
-            campaign.save(update_fields=['problems', ])
-        step.refresh_from_db(fields=['problems', ])
-        if StepProblems.EMPTY_STEP not in step.problems:
-            step.problems.append(StepProblems.EMPTY_STEP)
-            step.save(update_fields=['problems', ])
+def _campaign_problem_check_on_email_stage_deletion(sender, instance: EmailStage, using: str, **kwargs) -> None:
+    mark_problems_dirty([instance.step.campaign_id], using)
 
 
 @receiver(post_save, sender=Participation)
 def _campaign_problem_check_on_participation_creation(sender, instance: Participation,
-                                                      created: bool, **kwarg) -> None:
+                                                      created: bool, using: str, **kwarg) -> None:
     if created:
-        campaign = instance.campaign
-        campaign.refresh_from_db(fields=['problems', ])
-        if CampaignProblems.NO_CONTACTS in campaign.problems:
-            campaign.problems.remove(CampaignProblems.NO_CONTACTS)
-            campaign.save(update_fields=['problems', ])
+        mark_problems_dirty([instance.campaign_id], using)
+
+
+@receiver(participations_created, sender=Participation)
+def _campaign_problem_check_on_participations_bulk_creation(sender, campaign_ids: Set[int], using: str,
+                                                            **kwargs) -> None:
+    mark_problems_dirty(campaign_ids, using)
 
 
 @receiver(post_delete, sender=Participation)
-def _campaign_problem_check_on_participation_deletion(sender, instance: Participation, **kwargs) -> None:
-    campaign = instance.campaign
-    if CampaignProblems.NO_CONTACTS not in campaign.problems:
-        campaign.refresh_from_db(fields=['problems', ])
-        if not campaign.participation_set.exists():
-            campaign.problems.append(CampaignProblems.NO_CONTACTS)
-            campaign.save(update_fields=('problems',))
-
-
-@receiver(message_received)
-def _try_match_message(sender: CoolMailbox, message: Message, **kwarg) -> None:
-    if not message.outgoing:
-        return
-    in_reply_to = message.in_reply_to
-    if in_reply_to is None:
-        # todo: should submit task for more complicated comparation
-        return
+def _campaign_problem_check_on_participation_deletion(sender, instance: Participation, using: str,
+                                                      **kwargs) -> None:
+    mark_problems_dirty([instance.campaign_id], using)
+
 
-    scheduled = in_reply_to.scheduled
-    if scheduled is None:
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def _segments_check_on_participation_change(sender, instance: Participation, using: str, **kwargs) -> None:
+    mark_contacts_dirty([instance.contact_id], using)
+
+
+@receiver(participations_created, sender=Participation)
+def _segments_check_on_participations_bulk_creation(sender, participations: Optional[List[Participation]],
+                                                    using: str, **kwargs) -> None:
+    # participations merged from staging table are not passed, their contacts are rechecked by the importer
+    if participations is not None:
+        mark_contacts_dirty({participation.contact_id for participation in participations}, using)
+
+
+@receiver(messages_received)
+def _try_match_messages(sender, messages: List[Message], **kwarg) -> None:
+    references = [get_thread_references(message) for message in messages if not message.outgoing]
+    message_ids = set(itertools.chain.from_iterable(references))
+    if not message_ids:
         return
 
-    campaign = scheduled.stage.step.campaign
+    participations = {
+        message_id: (contact_id, campaign_id)
+        for message_id, contact_id, campaign_id in ScheduledEmail.objects.filter(
+            inbox_message__thread_index__message_id__in=message_ids,
+        ).values_list(
+            'inbox_message__thread_index__message_id',
+            'contact_id',
+            'stage__step__campaign_id',
+        )
+    }
+
+    replied = set()
+    for message_references in references:
+        for message_id in message_references:
+            if message_id in participations:
+                replied.add(participations[message_id])
+                break
+
+    if not replied:
+        return
 
-    participation = scheduled.contact.participation_set.get(campaign=campaign)
-    participation.status = ParticipationStatus.RESPOND
-    participation.save(update_fields=('status',))
+    responded = Participation.objects.filter(
+        functools.reduce(operator.or_, (Q(contact_id=contact_id, campaign_id=campaign_id)
+                                        for contact_id, campaign_id in replied))
+    ).exclude(status=ParticipationStatus.RESPOND)
+    contact_ids = set(responded.values_list('contact_id', flat=True))
+    if responded.update(status=ParticipationStatus.RESPOND):
+        # participations are updated at once without post_save, so their contacts are marked as it would do
+        mark_contacts_dirty(contact_ids, responded.db)
 
 
 @receiver(post_save, sender=TrackingInfo)
@@ -1,4 +1,5 @@
 import datetime
+from typing import Dict, List
 
 from celery import shared_task
 from celery.schedules import schedule
@@ -9,8 +10,9 @@ from django.db.models import Q
 from django.utils.timezone import now
 
 from tenancy.utils import map_task_per_tenants, tenant_context_or_raise_reject
-from . import utils
+from . import search, utils
 from .contacts.models import Contact
+from .contacts.segments import mark_contacts_dirty, refresh_segments
 from .models import (
     CompanyEmployeeCountLevel, CompanyRevenue, ContactLead, ContactLeadStatus, LeadDepartment, LeadGenerationRequest,
     LeadGenerationRequestStatus, LeadLevel, Participation
@@ -45,6 +47,21 @@ def send_queued_tenants_emails():
     return map_task_per_tenants(send_queued_emails)
 
 
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def update_search_index_task(tenant_id: int, pks_by_model: Dict[str, List[int]]):
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        indexed = search.update_index(pks_by_model)
+        logger.info("[%d: %s]: %d objects indexed", tenant_id, tenant.schema_name, indexed)
+        return indexed
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def refresh_segments_task(tenant_id: int, contact_ids: List[int]):
+    with tenant_context_or_raise_reject(tenant_id) as tenant:
+        refresh_segments(contact_ids)
+        logger.info("[%d: %s]: Segments refreshed for %d contacts", tenant_id, tenant.schema_name, len(contact_ids))
+
+
 @shared_task
 def process_lead_generation_request(tenant_id: int, lead_generation_request_id: int):
     with tenant_context_or_raise_reject(tenant_id):
@@ -155,6 +172,8 @@ def add_leads_into_campaigns(tenant_id: int):
 
                 contacts = [l.to_contact() for l in leads_by_email.values()]
                 contacts = Contact.objects.bulk_create(contacts)
+                search.reindex(Contact, [contact.pk for contact in contacts])
+                mark_contacts_dirty([contact.pk for contact in contacts])
 
                 Participation.objects.bulk_create((
                     Participation(
@@ -1,5 +1,4 @@
 from django.apps import AppConfig
-from watson import search as watson
 
 
 class TemplatesConfig(AppConfig):
@@ -8,9 +7,10 @@ class TemplatesConfig(AppConfig):
 
     def ready(self) -> None:
         super().ready()
+        from .. import search
 
         EmailTemplate = self.get_model('EmailTemplate')
-        watson.register(EmailTemplate, fields=(
+        search.register(EmailTemplate, fields=(
             'name',
             'description',
             'subject',
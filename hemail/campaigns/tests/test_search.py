@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from watson.models import SearchEntry
+
+from tenancy.test.cases import TenantsTestCase
+from .. import search
+from ..contacts.models import Contact
+
+
+class SearchIndexTestCase(TenantsTestCase):
+    auto_create_schema = True
+
+    def entries(self):
+        return SearchEntry.objects.filter(content_type=ContentType.objects.get_for_model(Contact))
+
+    @patch('campaigns.tasks.refresh_segments_task.delay')
+    @patch('campaigns.tasks.update_search_index_task.delay')
+    def test_saves_are_indexed_once_per_transaction(self, delay_mock, refresh_mock):
+        self.set_tenant(0)
+
+        first = Contact.objects.create(email='first@example.com', first_name='First')
+        second = Contact.objects.create(email='second@example.com', company_name='Bond & Co')
+        with search.skip_index_update():
+            Contact.objects.create(email='third@example.com')
+        self.assertFalse(self.entries().exists())
+
+        self.run_on_commit()
+
+        delay_mock.assert_called_once_with(self.get_current_tenant().id, {
+            Contact._meta.label_lower: sorted([first.pk, second.pk]),
+        })
+
+    @patch('campaigns.tasks.update_search_index_task.delay')
+    def test_saves_outside_of_transactions_are_queued_at_once(self, delay_mock):
+        self.set_tenant(0)
+
+        with patch.object(connections['default'], 'in_atomic_block', False):
+            search.reindex(Contact, [2, 1])
+            search.reindex(Contact, [])
+
+        delay_mock.assert_called_once_with(self.get_current_tenant().id, {Contact._meta.label_lower: [1, 2]})
+
+    def test_index_is_updated_in_bulk(self):
+        self.set_tenant(0)
+
+        with search.skip_index_update():
+            first = Contact.objects.create(email='first@example.com', company_name='Spectre')
+            second = Contact.objects.create(email='second@example.com', company_name='Bond & Co')
+
+        self.assertEqual(2, search.update_index({Contact._meta.label_lower: [first.pk, second.pk]}))
+        self.assertSetEqual({str(first.pk), str(second.pk)}, set(self.entries().values_list('object_id', flat=True)))
+        self.assertIn('Bond & Co', self.entries().get(object_id_int=second.pk).content)
+
+        pk = second.pk
+        with search.skip_index_update():
+            second.delete()
+            first.company_name = 'MI6'
+            first.save()
+        self.assertEqual(1, search.update_index({Contact._meta.label_lower: [first.pk, pk]}))
+        self.assertEqual([first.pk], list(self.entries().values_list('object_id_int', flat=True)))
+        self.assertIn('MI6', self.entries().get().content)
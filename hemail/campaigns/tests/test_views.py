@@ -13,7 +13,7 @@ from rest_framework_extensions.utils import compose_parent_pk_kwarg_name
 from tenant_schemas.test.client import TenantClient
 
 from tenancy.test.cases import TenantsAPIRequestFactory, TenantsTestCase
-from ..contacts.models import Contact
+from ..contacts.models import Contact, Segment
 from ..models import (
     Campaign, CampaignProblems, CampaignStatus, EmailStage, Participation, ParticipationStatus, Step,
     StepProblems, Weekdays)
@@ -230,6 +230,45 @@ class CampaignsViewsTestCase(TenantsTestCase):
         participation = Participation.objects.get(campaign=campaign)
         self.assertEqual(second_contact, participation.contact)
 
+    def test_participations_filtering_by_foreign_keys(self) -> None:
+        self.set_tenant(0)
+
+        user = self.users[0]
+        contacts = [Contact.objects.create(email='%s@example.com' % name) for name in ['first', 'second', 'third']]
+        campaign = Campaign.objects.create(name='cool campaign', owner=user)
+        Participation.objects.bulk_create([Participation(campaign=campaign, contact=contact) for contact in contacts])
+
+        t_client = TenantClient(self.get_current_tenant())
+        t_client.handler = ForceAuthClientHandler(enforce_csrf_checks=False)
+        t_client.handler._force_user = user
+        self.assertTrue(t_client.login(username=user.username, password='first-secret'), 'Test user was not logged in')
+
+        url = reverse.reverse('api:campaigns-contacts-list', args=[campaign.pk, ])
+        with modify_settings(ALLOWED_HOSTS={'append': self.get_current_tenant().domain_url}):
+            response = t_client.get(urljoin(url, '?contact__in=%d,%d' % (contacts[0].id, contacts[2].id)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, str(response.content))
+        self.assertSetEqual({contacts[0].id, contacts[2].id}, {item['contact'] for item in response.json()})
+
+    def test_segment_is_added_to_campaign(self) -> None:
+        self.set_tenant(0)
+
+        user = self.users[0]
+        participating = Contact.objects.create(email='participating@example.com', country='France')
+        french = Contact.objects.create(email='french@example.com', country='France')
+        Contact.objects.create(email='german@example.com', country='Germany')
+        segment = Segment.objects.create(name='french', filters=dict(country='France'))
+        campaign = Campaign.objects.create(name='cool campaign', owner=user)
+        Participation.objects.create(campaign=campaign, contact=participating)
+
+        factory = TenantsAPIRequestFactory(force_authenticate=user)
+        request = factory.post('', dict(segment=segment.pk), format='json')
+        response = CampaignsViewSet.as_view({'post': 'add_segment'})(request, pk=campaign.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, str(response.data))
+        self.assertEqual(1, response.data['added'])
+        self.assertSetEqual({participating.pk, french.pk}, set(campaign.contacts.values_list('pk', flat=True)))
+
     def test_sample_emails_preview(self) -> None:
         self.set_tenant(0)
 
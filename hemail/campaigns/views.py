@@ -2,7 +2,7 @@ import logging
 
 import rest_framework_bulk
 from django.core.cache import cache
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.http import Http404
 from django_filters import rest_framework
@@ -19,9 +19,10 @@ from rest_framework_extensions.mixins import NestedViewSetMixin
 from tenant_schemas.utils import get_public_schema_name, get_tenant_model, tenant_context
 
 from common.models import SQCount
-from common.viewsets import RetrieveUpdateSingleModelViewSet
+from common.viewsets import AtomicWritesMixin, RetrieveUpdateSingleModelViewSet
 from . import serializers
 from .contacts.models import Contact
+from .contacts.serializers import SegmentSourceSerializer
 from .filters import ContactLeadFilter, MessageFilter, ParticipationFilter
 from .models import (
     Attachment, Campaign, CampaignSettings, ContactLead, EmailStage, LeadGenerationRequest, Participation,
@@ -98,6 +99,24 @@ class CampaignsViewSet(rest_framework_bulk.BulkModelViewSet):
 
         return Response(total, status=status.HTTP_200_OK)
 
+    @detail_route(methods=['post'])
+    def add_segment(self, request, pk: int) -> Response:
+        """
+        Adds current members of the segment to the campaign.
+        """
+        campaign = self.get_object()
+        serializer = SegmentSourceSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        segment = serializer.validated_data['segment']
+
+        with transaction.atomic():
+            contacts_ids = segment.contacts.exclude(campaigns=campaign).values_list('pk', flat=True)
+            participations = Participation.objects.bulk_create(
+                (Participation(campaign=campaign, contact_id=contact_id) for contact_id in contacts_ids),
+                batch_size=1000,
+            )
+        return Response(dict(added=len(participations)), status=status.HTTP_200_OK)
+
 
 class CampaignSettingsViewSet(NestedViewSetMixin, RetrieveUpdateSingleModelViewSet):
     queryset = CampaignSettings.objects.all()
@@ -105,13 +124,13 @@ class CampaignSettingsViewSet(NestedViewSetMixin, RetrieveUpdateSingleModelViewS
     permission_classes = (permissions.DjangoObjectPermissions,)
 
 
-class StepViewSet(NestedViewSetMixin, rest_framework_bulk.BulkModelViewSet):
+class StepViewSet(NestedViewSetMixin, AtomicWritesMixin, rest_framework_bulk.BulkModelViewSet):
     queryset = Step.objects.all()
     serializer_class = serializers.StepSerializer
     permission_classes = (permissions.DjangoModelPermissions,)
 
 
-class EmailStageViewSet(NestedViewSetMixin, rest_framework_bulk.BulkModelViewSet):
+class EmailStageViewSet(NestedViewSetMixin, AtomicWritesMixin, rest_framework_bulk.BulkModelViewSet):
     queryset = EmailStage.objects.all()
     serializer_class = serializers.EmailStageSerializer
     permission_classes = (permissions.DjangoModelPermissions,)
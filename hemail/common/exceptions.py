@@ -22,3 +22,9 @@ class UnprocessableEntity(exceptions.APIException):
     status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
     default_detail = _('Unprocessable entity.')
     default_code = 'unprocessable_entity'
+
+
+class Conflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('Conflict.')
+    default_code = 'conflict'
@@ -1,6 +1,11 @@
+import abc
+from typing import Tuple
+
 import django_filters
 from django import forms
-from django.db.models import Count
+from django.db import models
+from django.db.models import Count, Q
+from django_filters.constants import EMPTY_VALUES
 from watson import search as watson
 
 
@@ -14,32 +19,81 @@ class SearchFilter(django_filters.CharFilter):
         return watson.filter(qs, value, ranking=self.ranking)
 
 
-class NumberInAnyFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+def get_membership(model: models.Model, field_name: str) -> Tuple[models.QuerySet, str, str]:
+    """
+    Returns queryset of the intermediate model of many-to-many field and names of its foreign keys
+    to the model and to related one.
+    """
+    field = model._meta.get_field(field_name)
+    if field.auto_created:
+        # reverse side of the relation
+        field = field.field
+        source, target = field.m2m_reverse_field_name(), field.m2m_field_name()
+    else:
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    return field.remote_field.through._default_manager.all(), source, target
+
+
+class MembershipFilter(django_filters.BaseInFilter, django_filters.NumberFilter, metaclass=abc.ABCMeta):
+    """
+    Filters objects by their memberships in many-to-many relation with a semi-join over the intermediate table,
+    which is served by its indexes, instead of joining the relation for every value and removing duplicates.
+    Other relations (e.g. foreign keys) have no intermediate table and are filtered with the `in` lookup.
+    """
 
     def __init__(self, *args, **kwargs) -> None:
         kwargs.setdefault('lookup_expr', 'in')
         kwargs.setdefault('distinct', True)
         super().__init__(*args, **kwargs)
 
+    @abc.abstractmethod
+    def membership(self, qs: models.QuerySet, values: set) -> models.QuerySet:
+        """
+        Returns ids of the objects matching the values, as a subquery.
+        """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        assert isinstance(value, list)
+        if not qs.model._meta.get_field(self.field_name).many_to_many:
+            return super().filter(qs, value)
+        return self.get_method(qs)(pk__in=self.membership(qs, set(value)))
+
 
-class NumberInAllFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+class NumberInAnyFilter(MembershipFilter):
+    """
+    Objects related to any of the values.
+    """
+
+    def membership(self, qs: models.QuerySet, values: set) -> models.QuerySet:
+        through, source, target = get_membership(qs.model, self.field_name)
+        return through.filter(**{target + '__in': values}).values(source)
+
+
+class NumberNotInFilter(NumberInAnyFilter):
+    """
+    Objects related to none of the values.
+    """
 
     def __init__(self, *args, **kwargs) -> None:
-        kwargs.setdefault('lookup_expr', 'exact')
-        kwargs.setdefault('distinct', True)
+        kwargs.setdefault('exclude', True)
         super().__init__(*args, **kwargs)
 
-    def filter(self, qs, value):
-        assert isinstance(value, list)
 
-        count_name = '_%s_count' % self.field_name
-        filtered_qs = self.get_method(qs.annotate(
-            **{count_name: Count(self.field_name)}
-        ))(**{count_name: len(value)})
-        for val in value:
-            filtered_qs = super().filter(filtered_qs, val)
+class NumberInAllFilter(MembershipFilter):
+    """
+    Objects related to all of the values and nothing else. Relations are counted only for objects related
+    to any of the values, so the intermediate table is not aggregated as a whole.
+    """
 
-        return filtered_qs
+    def membership(self, qs: models.QuerySet, values: set) -> models.QuerySet:
+        through, source, target = get_membership(qs.model, self.field_name)
+        candidates = through.filter(**{target + '__in': values}).values(source)
+        return through.filter(**{source + '__in': candidates}).values(source).annotate(
+            _total=Count('pk'),
+            _matched=Count('pk', filter=Q(**{target + '__in': values})),
+        ).filter(_total=len(values), _matched=len(values)).values(source)
 
 
 class OnTrueFilter(django_filters.BooleanFilter):
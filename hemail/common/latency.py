@@ -0,0 +1,98 @@
+"""
+Task latency histograms shared by all processes through the 'deferred-tasks' cache.
+
+Latencies are counted in logarithmic buckets (each one is `BUCKET_GROWTH` times wider than previous), so memory
+is bounded by `BUCKETS` counters per task name. When task gets more than `MAX_SAMPLES` samples its counters are
+halved, so old samples fade away and estimations follow current latencies.
+"""
+import math
+import time
+from typing import Dict, Optional, Sequence
+
+from celery.signals import task_postrun, task_prerun
+from django.core.cache import caches
+
+MIN_LATENCY = 0.05
+BUCKET_GROWTH = 1.5
+BUCKETS = 32  # up to ~2.5 hours
+MAX_SAMPLES = 1000
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= MIN_LATENCY:
+        return 0
+    return min(int(math.log(seconds / MIN_LATENCY, BUCKET_GROWTH)) + 1, BUCKETS - 1)
+
+
+def _bucket_upper_bound(bucket: int) -> float:
+    return MIN_LATENCY * BUCKET_GROWTH ** bucket
+
+
+class LatencyHistogram(object):
+    def __init__(self, cache_name: str = 'deferred-tasks', prefix: str = 'task-latency') -> None:
+        super().__init__()
+        self.cache_name = cache_name
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.cache_name]
+
+    def _key(self, name: str, field) -> str:
+        return '%s|%s|%s' % (self.prefix, name, field)
+
+    def _incr(self, key: str, delta: int = 1) -> int:
+        self.cache.add(key, 0, None)
+        return self.cache.incr(key, delta)
+
+    def observe(self, name: str, seconds: float) -> None:
+        self._incr(self._key(name, _bucket(seconds)))
+        if self._incr(self._key(name, 'samples')) > MAX_SAMPLES:
+            self._decay(name)
+
+    def _decay(self, name: str) -> None:
+        # concurrent updates could be lost here, it is fine for estimation
+        keys = [self._key(name, bucket) for bucket in range(BUCKETS)]
+        counters = self.cache.get_many(keys)
+        halved = {key: count // 2 for key, count in counters.items()}
+        halved[self._key(name, 'samples')] = sum(halved.values())
+        self.cache.set_many(halved, None)
+
+    def counters(self, name: str) -> Dict[int, int]:
+        keys = {self._key(name, bucket): bucket for bucket in range(BUCKETS)}
+        return {keys[key]: count for key, count in self.cache.get_many(keys.keys()).items() if count}
+
+    def percentiles(self, name: str, quantiles: Sequence[float]) -> Optional[Sequence[float]]:
+        """
+        Returns estimated latencies (upper bounds of buckets) for the quantiles or None if there are no samples.
+        """
+        counters = self.counters(name)
+        total = sum(counters.values())
+        if not total:
+            return None
+
+        results = []
+        for quantile in quantiles:
+            accumulated = 0
+            for bucket in sorted(counters):
+                accumulated += counters[bucket]
+                if accumulated >= quantile * total:
+                    results.append(_bucket_upper_bound(bucket))
+                    break
+        return results
+
+
+task_latencies = LatencyHistogram()
+
+
+@task_prerun.connect
+def _start_timing(sender, task_id, task, **kwargs) -> None:
+    # stored in request context, so nothing is left when task is not finished
+    task.request.latency_started = time.monotonic()
+
+
+@task_postrun.connect
+def _record_latency(sender, task_id, task, **kwargs) -> None:
+    started = getattr(task.request, 'latency_started', None)
+    if started is not None:
+        task_latencies.observe(task.name, time.monotonic() - started)
@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from .latency import BUCKETS, LatencyHistogram, MAX_SAMPLES
+
+_caches = {
+    name: dict(BACKEND='django.core.cache.backends.locmem.LocMemCache', LOCATION=name)
+    for name in ['default', 'latency-test']
+}
+
+
+@override_settings(CACHES=_caches)
+class LatencyHistogramTestCase(SimpleTestCase):
+    def setUp(self):
+        self.histogram = LatencyHistogram('latency-test')
+        self.histogram.cache.clear()
+
+    def test_percentiles_are_estimated_per_task(self):
+        self.assertIsNone(self.histogram.percentiles('fast', [0.5]))
+
+        for _ in range(90):
+            self.histogram.observe('fast', 0.2)
+        for _ in range(10):
+            self.histogram.observe('fast', 10)
+        self.histogram.observe('slow', 300)
+
+        p50, p90, p99 = self.histogram.percentiles('fast', [0.5, 0.9, 0.99])
+        self.assertTrue(0.2 <= p50 < 0.2 * 1.5, p50)
+        self.assertEqual(p50, p90)
+        self.assertTrue(10 <= p99 < 10 * 1.5, p99)
+
+        p50, = self.histogram.percentiles('slow', [0.5])
+        self.assertTrue(300 <= p50 < 300 * 1.5, p50)
+
+    def test_memory_is_bounded(self):
+        for i in range(MAX_SAMPLES * 2):
+            self.histogram.observe('task', i)
+
+        counters = self.histogram.counters('task')
+        self.assertLessEqual(len(counters), BUCKETS)
+        self.assertLessEqual(sum(counters.values()), MAX_SAMPLES + 1)
+
+    def test_cached_delay_hint_is_based_on_task_latency(self):
+        from .views import CachedDelay
+
+        for _ in range(10):
+            self.histogram.observe('guess', 4)
+
+        cached_delay = CachedDelay('latency-test', task_name='guess')
+        with patch('common.views.task_latencies', self.histogram):
+            p50, p90 = cached_delay.get_wait_estimates()
+        self.assertTrue(4 <= p50 < 6, p50)
+        self.assertEqual(p50, p90)
@@ -0,0 +1,75 @@
+from django.db import transaction
+
+from tenancy.test.cases import TenantsTestCase
+from .transactions import on_commit_batch
+from .viewsets import AtomicWritesMixin
+
+
+class _RolledBack(Exception):
+    pass
+
+
+class _BulkDestroyMixin(object):
+    def perform_destroy(self, instance):
+        on_commit_batch('destroyed', self.calls.append, [instance])
+
+    def perform_bulk_destroy(self, objects):
+        for obj in objects:
+            self.perform_destroy(obj)
+
+
+class _Destroyer(AtomicWritesMixin, _BulkDestroyMixin):
+    def __init__(self):
+        self.calls = []
+
+
+class OnCommitBatchTestCase(TenantsTestCase):
+    def test_items_are_collected_per_key(self):
+        calls = []
+        on_commit_batch('first', calls.append, [1, 2])
+        on_commit_batch('first', calls.append, [2, 3])
+        on_commit_batch('second', calls.append, [4])
+        on_commit_batch('second', calls.append, [])
+
+        with transaction.atomic(savepoint=False):
+            on_commit_batch('first', calls.append, [5])
+
+        try:
+            with transaction.atomic():
+                on_commit_batch('first', calls.append, [6])
+                raise _RolledBack()
+        except _RolledBack:
+            pass
+
+        with transaction.atomic():
+            on_commit_batch('first', calls.append, [7])
+            on_commit_batch('first', calls.append, [8])
+
+        self.run_on_commit()
+
+        self.assertListEqual([{1, 2, 3, 5, 6, 7, 8}, {4}], calls)
+
+    def test_items_of_rolled_back_savepoint_are_discarded(self):
+        calls = []
+        try:
+            with transaction.atomic():
+                on_commit_batch('first', calls.append, [1])
+                raise _RolledBack()
+        except _RolledBack:
+            pass
+
+        with transaction.atomic():
+            on_commit_batch('first', calls.append, [2])
+
+        self.run_on_commit()
+
+        self.assertListEqual([{2}], calls)
+
+    def test_bulk_destroyed_objects_are_collected(self):
+        destroyer = _Destroyer()
+
+        destroyer.perform_bulk_destroy([1, 2, 3])
+
+        self.run_on_commit()
+
+        self.assertListEqual([{1, 2, 3}], destroyer.calls)
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework import exceptions
+
+from .exceptions import TryLater
+from .views import CachedDelay
+
+_caches = {
+    name: dict(BACKEND='django.core.cache.backends.locmem.LocMemCache', LOCATION=name)
+    for name in ['default', 'deferred-tasks', 'cached-delay-test']
+}
+
+
+class _Task(object):
+    def __init__(self, task_id: str, state: str = 'PENDING', result=None) -> None:
+        self.id = task_id
+        self.state = state
+        self.result = result
+
+    def as_tuple(self):
+        return self.id, None
+
+
+@override_settings(CACHES=_caches)
+class CachedDelayTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tasks = {}
+        patcher = patch('common.views.result_from_tuple', lambda task_id_tuple: self.tasks[task_id_tuple[0]])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cached_delay = CachedDelay('cached-delay-test', timeout=10, stale_timeout=100, negative_timeout=1)
+        self.cached_delay.cache.clear()
+        self.cached_delay.tasks_cache.clear()
+
+    def _generator(self, state: str = 'PENDING', result=None):
+        def generate():
+            task = _Task(str(len(self.tasks)), state, result)
+            self.tasks[task.id] = task
+            return task
+
+        return generate
+
+    def test_concurrent_misses_share_task(self):
+        for _ in range(3):
+            with self.assertRaises(TryLater):
+                self.cached_delay.get('key', self._generator())
+        self.assertEqual(1, len(self.tasks))
+
+        self.tasks['0'].state, self.tasks['0'].result = 'SUCCESS', 'value'
+        self.assertEqual('value', self.cached_delay.get('key', self._generator()))
+        self.assertEqual(1, len(self.tasks))
+
+    def test_lost_task_is_submitted_again(self):
+        with patch('time.time', return_value=1000):
+            with self.assertRaises(TryLater):
+                self.cached_delay.get('key', self._generator())
+
+        # the task is still pending, e.g. it was lost with the broker
+        with patch('time.time', return_value=1000 + self.cached_delay.task_timeout + 1):
+            with self.assertRaises(TryLater):
+                self.cached_delay.get('key', self._generator())
+        self.assertEqual(2, len(self.tasks))
+
+    def test_stale_value_is_served_while_refreshing(self):
+        with patch('time.time', return_value=1000):
+            self.assertEqual('old', self.cached_delay.get('key', self._generator('SUCCESS', 'old')))
+
+        with patch('time.time', return_value=1011):
+            self.assertEqual('old', self.cached_delay.get('key', self._generator()))
+            self.assertEqual('old', self.cached_delay.get('key', self._generator()))
+            self.assertEqual(2, len(self.tasks))
+
+            self.tasks['1'].state, self.tasks['1'].result = 'SUCCESS', 'new'
+            self.assertEqual('new', self.cached_delay.get('key', self._generator()))
+            self.assertEqual(2, len(self.tasks))
+
+    def test_failures_and_negative_results_are_cached_for_a_while(self):
+        with patch('time.time', return_value=1000):
+            with self.assertRaises(exceptions.NotFound):
+                self.cached_delay.get('failed', self._generator('FAILURE'))
+            with self.assertRaises(exceptions.NotFound):
+                self.cached_delay.get('failed', self._generator('FAILURE'))
+            self.assertIsNone(self.cached_delay.get('missing', self._generator('SUCCESS', None)))
+            self.assertIsNone(self.cached_delay.get('missing', self._generator('SUCCESS', None)))
+            self.assertEqual(2, len(self.tasks))
+
+        with patch('time.time', return_value=1002):
+            self.assertEqual('found', self.cached_delay.get('missing', self._generator('SUCCESS', 'found')))
+            self.assertEqual(3, len(self.tasks))
+
+    def test_stale_value_is_kept_when_refresh_fails(self):
+        with patch('time.time', return_value=1000):
+            self.assertEqual('good', self.cached_delay.get('key', self._generator('SUCCESS', 'good')))
+
+        with patch('time.time', return_value=1011):
+            self.assertDictEqual(
+                dict(key='good', other='value'),
+                self.cached_delay.get_many(['key', 'other'], lambda key: self._generator(
+                    'FAILURE' if key == 'key' else 'SUCCESS', 'value')()),
+            )
+            # the refresh is not tried again for a while
+            self.assertEqual('good', self.cached_delay.get('key', self._generator('FAILURE')))
+            self.assertEqual(3, len(self.tasks))
+
+        with patch('time.time', return_value=1013):
+            self.assertEqual('good', self.cached_delay.get('key', self._generator('SUCCESS', None)))
+            self.assertEqual(4, len(self.tasks))
+
+        with patch('time.time', return_value=1015):
+            self.assertEqual('new', self.cached_delay.get('key', self._generator('SUCCESS', 'new')))
+            self.assertEqual(5, len(self.tasks))
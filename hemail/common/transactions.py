@@ -0,0 +1,38 @@
+from typing import Callable, Hashable, Iterable, Set
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+class _BatchCallback(object):
+    def __init__(self, key: Hashable, func: Callable[[Set], None]) -> None:
+        self.key = key
+        self.func = func
+        self.items = set()
+
+    def __call__(self) -> None:
+        self.func(self.items)
+
+
+def on_commit_batch(key: Hashable, func: Callable[[Set], None], items: Iterable,
+                    using: str = DEFAULT_DB_ALIAS) -> None:
+    """
+    Calls `func` with the set of items once the transaction is committed, items given with the same `key`
+    are collected, so `func` is called once for all of them. Savepoints of a pending callback are either still
+    open and so enclose the current one too, or were already released and could only be rolled back together
+    with the current items, so the items never outlive their callback. Items of a savepoint rolled back later
+    are still passed to `func`, it must tolerate them. Outside of transactions `func` is called at once.
+    """
+    items = set(items)
+    if not items:
+        return
+
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block:
+        for _, callback in connection.run_on_commit:
+            if isinstance(callback, _BatchCallback) and callback.key == key:
+                callback.items.update(items)
+                return
+
+    callback = _BatchCallback(key, func)
+    callback.items.update(items)
+    transaction.on_commit(callback, using=using)
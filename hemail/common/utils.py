@@ -148,6 +148,10 @@ class FixedOffset(pytz._FixedOffset):
         hhmm = '%02d%02d' % divmod(abs(offset), 60)
         return 'UTC' + sign + hhmm
 
+    def __reduce__(self):
+        # pytz would unpickle it as its own fixed offset
+        return self.__class__, (self._minutes,)
+
     def __repr__(self) -> str:
         return 'pytz.FixedOffset(%d)' % self._minutes
 
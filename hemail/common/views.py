@@ -1,87 +1,145 @@
-import collections
-import statistics
 import time
-from typing import Iterable, List
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from celery.result import AsyncResult, result_from_tuple
-from celery.signals import task_postrun, task_prerun
 from django.core.cache import caches
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import exceptions, status
 
 from common.exceptions import TryLater
+from common.latency import task_latencies
 
-d = {}
+# retry hint when latency of the task is not known yet
+DEFAULT_WAIT = 2
+MIN_WAIT = 0.5
+MAX_WAIT = 60
 
-average_time = collections.deque(maxlen=5)
-average_time.append(2)
 
-
-@task_prerun.connect
-def task_prerun_handler(signal, sender, task_id, task, **kwargs):
-    d[task_id] = time.time()
-
-
-@task_postrun.connect
-def task_postrun_handler(signal, sender, task_id, task, **kwargs):
-    try:
-        cost = time.time() - d.pop(task_id)
-        average_time.append(cost)
-    except KeyError:
-        cost = -1
-
-
-def get_min_state(tasks: Iterable[AsyncResult]) -> str:
-    return min(tasks, key=lambda task: [
+def get_min_state(tasks: Iterable[Optional[AsyncResult]]) -> str:
+    # task which is not submitted yet (claimed by another process) is pending
+    return min([task.state if task is not None else 'PENDING' for task in tasks], key=lambda state: [
         "FAILURE",
         "RETRY",
         "PENDING",
         "STARTED",
         "SUCCESS",
-    ].index(task.state)).state
+    ].index(state))
+
+
+CachedEntry = namedtuple('CachedEntry', ['value', 'fresh_until', 'failed'])
 
 
 class CachedDelay(object):
-    tasks_cache = caches['deferred-tasks']
+    """
+    Caches results of celery tasks and raises `TryLater` while they are running.
 
-    def __init__(self, cache_name: str) -> None:
-        super().__init__()
-        self.cache_name = cache_name
-        self.cache = caches[cache_name]
+    Entries are fresh for `timeout` seconds and served stale for `stale_timeout` more while a single background
+    task refreshes them. Failures and negative results (see `is_negative`) are cached for `negative_timeout`,
+    unless a stale value is known, which is served until the refresh is tried again after `negative_timeout`.
+    Task of a key is shared by all processes, so concurrent misses submit one task only. The task is forgotten
+    after `task_timeout`, so the key is submitted again if the task was lost (or its result expired).
 
-    def get_many(self, keys: List[str], generator, detail=None) -> dict:
-        results = self.cache.get_many(keys)
-        if set(results.keys()) == set(keys):
-            return results
+    Clients are asked to retry after the median latency of `task_name` task.
+    """
 
-        task_keys = {self.cache_name + '|' + key: key for key in keys}
+    CLAIMED = 'claimed'
+    claim_timeout = 60
+
+    def __init__(self, cache_name: str, timeout: float = 5 * 60, stale_timeout: float = 60 * 60,
+                 negative_timeout: float = 60, task_name: Optional[str] = None, task_timeout: float = 5 * 60) -> None:
+        super().__init__()
+        self.cache_name = cache_name
+        self.task_name = task_name
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.negative_timeout = negative_timeout
+        self.task_timeout = task_timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_name]
+
+    @property
+    def tasks_cache(self):
+        return caches['deferred-tasks']
+
+    def _task_key(self, key: str) -> str:
+        return self.cache_name + '|' + key
+
+    def is_negative(self, value) -> bool:
+        return value is None
+
+    def _store(self, key: str, value, failed: bool = False) -> CachedEntry:
+        timeout = self.negative_timeout if failed or self.is_negative(value) else self.timeout
+        entry = CachedEntry(value, time.time() + timeout, failed)
+        self.cache.set(key, entry, timeout + self.stale_timeout)
+        self.tasks_cache.delete(self._task_key(key))
+        return entry
+
+    def _keep_stale(self, key: str, entry: CachedEntry) -> CachedEntry:
+        """
+        Serves the stale entry for `negative_timeout` more when its refresh failed, but not longer than
+        it would be served otherwise.
+        """
+        now = time.time()
+        expires = entry.fresh_until + self.stale_timeout
+        entry = CachedEntry(entry.value, min(now + self.negative_timeout, expires), False)
+        if expires > now:
+            self.cache.set(key, entry, expires - now)
+        self.tasks_cache.delete(self._task_key(key))
+        return entry
+
+    def _get_tasks(self, keys: List[str], generator) -> Dict[str, Optional[AsyncResult]]:
+        """
+        Returns running (or finished) tasks of keys, submits tasks for keys which have no one.
+        """
+        task_keys = {self._task_key(key): key for key in keys}
         task_ids_dict = self.tasks_cache.get_many(task_keys.keys())
-        not_cached_task_keys = set(task_keys.keys()) - set(task_ids_dict.keys())
-        keys_to_tasks = {}
-        if not_cached_task_keys:
-            for task_key in not_cached_task_keys:
-                task = generator(task_keys[task_key])
-                task_id_tuple = task.as_tuple()
-                self.tasks_cache.set(task_key, task_id_tuple)
-                keys_to_tasks[task_key] = task
-
-        keys_to_tasks.update(
-            {task_key: result_from_tuple(task_id_tuple) for task_key, task_id_tuple in task_ids_dict.items()}
-        )
 
-        for task_key, task in keys_to_tasks.items():
-            if task.state == 'FAILURE':
-                self.tasks_cache.delete(task_key)
+        tasks = {}
+        for task_key, key in task_keys.items():
+            task_id_tuple = task_ids_dict.get(task_key)
+            if task_id_tuple is None:
+                if self.tasks_cache.add(task_key, self.CLAIMED, self.claim_timeout):
+                    task = generator(key)
+                    self.tasks_cache.set(task_key, task.as_tuple(), self.task_timeout)
+                    tasks[key] = task
+                    continue
+                # another process is submitting the task right now
+                task_id_tuple = self.tasks_cache.get(task_key)
+
+            tasks[key] = result_from_tuple(task_id_tuple) if task_id_tuple not in (None, self.CLAIMED) else None
+        return tasks
 
-        min_state = get_min_state(keys_to_tasks.values())
-        if min_state == 'FAILURE':
+    def get_many(self, keys: List[str], generator, detail=None) -> dict:
+        now = time.time()
+        entries = self.cache.get_many(keys)
+        expired = [key for key in keys if key not in entries or entries[key].fresh_until <= now]
+
+        waiting = []
+        if expired:
+            for key, task in self._get_tasks(expired, generator).items():
+                state = task.state if task is not None else 'PENDING'
+                stale = entries.get(key)
+                has_value = stale is not None and not stale.failed and not self.is_negative(stale.value)
+                refresh_failed = state == 'FAILURE' or state == 'SUCCESS' and self.is_negative(task.result)
+                if refresh_failed and has_value:
+                    entries[key] = self._keep_stale(key, stale)
+                elif state == 'SUCCESS':
+                    entries[key] = self._store(key, task.result)
+                elif state == 'FAILURE':
+                    entries[key] = self._store(key, None, failed=True)
+                elif key not in entries:
+                    waiting.append(task)
+                # otherwise stale entry is served while the task is running
+
+        if any(entry.failed for entry in entries.values()):
             raise self.failure()
-        if min_state in ['PENDING', 'STARTED', 'RETRY']:
-            raise self.try_later(keys_to_tasks.values(), detail)
+        if waiting:
+            raise self.try_later(waiting, detail)
 
-        results = {task_keys[task_key]: task.result for task_key, task in keys_to_tasks.items()}
-        self.cache.set_many(results)
-        return results
+        return {key: entries[key].value for key in keys}
 
     def get(self, key: str, generator, detail=None):
         return self.get_many([key], lambda _: generator(), detail).get(key)
@@ -89,8 +147,18 @@ class CachedDelay(object):
     def __call__(self, key: str, generator, detail=None):
         return self.get(key, generator, detail)
 
-    def try_later(self, tasks: Iterable[AsyncResult], detail: str = None):
-        wait = statistics.mean(average_time)
+    def get_wait_estimates(self) -> Tuple[float, float]:
+        """
+        Returns median and 90th percentile of the task latency.
+        """
+        estimates = task_latencies.percentiles(self.task_name, [0.5, 0.9]) if self.task_name else None
+        if estimates is None:
+            return DEFAULT_WAIT, DEFAULT_WAIT
+        p50, p90 = (min(max(estimate, MIN_WAIT), MAX_WAIT) for estimate in estimates)
+        return p50, p90
+
+    def try_later(self, tasks: Iterable[Optional[AsyncResult]], detail: str = None):
+        wait, likely_wait = self.get_wait_estimates()
         min_state = get_min_state(tasks)
 
         raise TryLater(
@@ -98,7 +166,7 @@ class CachedDelay(object):
                 "detail": detail if detail else _("Request was accepted."),
                 "status": min_state,
                 "completion": {
-                    "estimate": time.time() + wait,
+                    "estimate": time.time() + likely_wait,
                     # "rejected-after": "Fri Sep 09 2011 12:00:00 GMT-0400",
                     "retry-after": wait,
                 },
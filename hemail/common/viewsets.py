@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import generics, mixins, viewsets
 
 
@@ -30,3 +31,26 @@ class RetrieveUpdateSingleModelViewSet(RetrieveSingleModelMixin,
                                        UpdateSingleModelMixin,
                                        GenericSingleViewSet):
     pass
+
+
+class AtomicWritesMixin(object):
+    """
+    Objects are written within a transaction, so all objects of a bulk request are committed at once
+    and their on-commit handlers run once for the whole request.
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+    def perform_bulk_destroy(self, objects):
+        with transaction.atomic():
+            super().perform_bulk_destroy(objects)
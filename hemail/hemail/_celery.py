@@ -18,6 +18,9 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+# Collect task latencies for retry hints of deferred requests.
+import common.latency  # noqa: E402,F401
+
 
 @app.task(bind=True)
 def debug_task(self):
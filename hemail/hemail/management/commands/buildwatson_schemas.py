@@ -1,11 +1,5 @@
-from tenant_schemas.management.commands import BaseTenantCommand
+from tenancy.management.base import ParallelTenantCommand
 
 
-class Command(BaseTenantCommand):
+class Command(ParallelTenantCommand):
     COMMAND_NAME = 'buildwatson'
-
-    def execute_command(self, tenant, command_name, *args, **options):
-        # TODO: temporal solution until tenant_schemas support Django 2
-        options.pop('schema_name')
-        options.pop('skip_public')
-        return super().execute_command(tenant, command_name, *args, **options)
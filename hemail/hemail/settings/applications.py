@@ -46,6 +46,8 @@ SHARED_APPS = [
     'pinax.notifications',
 
     'users',
+
+    'campaigns.providers.directory',
 ]
 
 TENANT_APPS = [
@@ -53,8 +53,12 @@ CACHES = {
         LOCATION="redis://localhost:6379/1",
     ),
     'providers-isp-configurations': dict(
-        BACKEND='django.core.cache.backends.locmem.LocMemCache',
-        LOCATION='providers-isp-configurations',
+        BACKEND="django_redis.cache.RedisCache",
+        LOCATION="redis://localhost:6379/3",
+    ),
+    'oauth2-tokens': dict(
+        BACKEND="django_redis.cache.RedisCache",
+        LOCATION="redis://localhost:6379/2",
     ),
 }
 
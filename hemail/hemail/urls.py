@@ -69,6 +69,8 @@ router.register(r'providers', providers_views.EmailAccountViewSet)
 
 router.register(r'importing/contacts/csv', contacts_importer_views.ContactsCsvSniffingViewSet,
                 base_name='importing-contacts-sniffing')
+router.register(r'importing/contacts/jobs', contacts_importer_views.ContactsImportJobViewSet,
+                base_name='importing-contacts-jobs')
 router.register(r'importing/contacts', contacts_importer_views.ContactsCsvViewSet,
                 base_name='importing-contacts')
 
@@ -82,6 +84,7 @@ contact_registration \
 contact_registration \
     .register(r'messages', campaigns_views.NestedContactEmailMessageViewSet,
               base_name='contacts-messaes', parents_query_lookups=['contact'])
+router.register(r'segments', contacts_views.SegmentViewSet)
 router.register(r'lists', contacts_views.ContactListViewSet) \
     .register(r'contacts', contacts_views.NestedContactListContactViewSet,
               base_name='contacts-list', parents_query_lookups=['lists'])
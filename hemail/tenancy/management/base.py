@@ -0,0 +1,137 @@
+import io
+import multiprocessing
+import os
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from tenant_schemas.management.commands import BaseTenantCommand
+from tenant_schemas.utils import get_public_schema_name, get_tenant_model
+
+# (schema name, elapsed seconds, error or None, output of the command)
+TenantResult = Tuple[str, float, Optional[str], str]
+
+# command and options of the running command, workers get them by forking
+_worker_context = None
+
+
+def _run_for_schema(schema_name: str) -> TenantResult:
+    command, args, options = _worker_context
+    output = io.StringIO()
+    started = time.monotonic()
+    error = None
+    try:
+        connection.set_schema_to_public()
+        tenant = get_tenant_model().objects.get(schema_name=schema_name)
+        command.execute_command(tenant, command.COMMAND_NAME, *args, stdout=output, stderr=output, **options)
+    except (Exception, SystemExit) as e:
+        # commands exit on errors, it should not stop other tenants
+        error = str(e) or e.__class__.__name__
+    return schema_name, time.monotonic() - started, error, output.getvalue()
+
+
+class ParallelTenantCommand(BaseTenantCommand):
+    """
+    Calls the command for every tenant, with `--parallel` tenants are processed by a pool of processes,
+    each of them opens its own connection to the database. Tenants are ordered by their schemas,
+    with `--progress-file` completed ones are recorded, so the run could be resumed with `--resume`.
+    """
+
+    def add_arguments(self, parser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument('--parallel', action='store', dest='parallel', type=int, default=1,
+                            help='Number of tenants processed at the same time. Default is 1.')
+        parser.add_argument('--progress-file', action='store', dest='progress_file', default=None,
+                            help='File to record completed tenants to.')
+        parser.add_argument('--resume', action='store_true', dest='resume', default=False,
+                            help='Skips tenants already recorded to the progress file.')
+
+    def execute_command(self, tenant, command_name: str, *args, **options) -> None:
+        connection.set_tenant(tenant)
+        call_command(command_name, *args, **options)
+
+    def get_schemas(self, options: dict) -> List[str]:
+        if options['schema_name']:
+            return [options['schema_name']]
+
+        tenants = get_tenant_model().objects.order_by('schema_name')
+        if options['skip_public']:
+            tenants = tenants.exclude(schema_name=get_public_schema_name())
+        schemas = list(tenants.values_list('schema_name', flat=True))
+
+        if options['resume']:
+            completed = self.read_progress(options['progress_file'])
+            schemas = [schema_name for schema_name in schemas if schema_name not in completed]
+        return schemas
+
+    @staticmethod
+    def read_progress(progress_file: Optional[str]) -> set:
+        if not progress_file:
+            raise CommandError("--progress-file is required to resume")
+        if not os.path.exists(progress_file):
+            return set()
+        with open(progress_file) as fp:
+            return set(line.strip() for line in fp if line.strip())
+
+    def handle(self, *args, **options) -> None:
+        global _worker_context
+
+        schemas = self.get_schemas(options)
+        processes = max(options.pop('parallel'), 1)
+        progress_file = options.pop('progress_file')
+        options.pop('resume')
+        # options of this command are not known to the called one
+        options.pop('schema_name')
+        options.pop('skip_public')
+        # output of every tenant is collected and written with its result
+        options.pop('stdout', None)
+        options.pop('stderr', None)
+        verbosity = int(options.get('verbosity', 1))
+
+        _worker_context = (self, args, options)
+        progress = open(progress_file, 'a') if progress_file else None
+        failed = []
+        started = time.monotonic()
+        try:
+            for schema_name, elapsed, error, output in self.run(schemas, processes):
+                if error is None:
+                    if progress is not None:
+                        progress.write(schema_name + '\n')
+                        progress.flush()
+                    if verbosity >= 1:
+                        self.stdout.write(self.style.SUCCESS("[%s] %s done in %.2fs" % (
+                            schema_name, self.COMMAND_NAME, elapsed)))
+                else:
+                    failed.append(schema_name)
+                    self.stderr.write("[%s] %s failed in %.2fs: %s" % (
+                        schema_name, self.COMMAND_NAME, elapsed, error))
+                if output and (verbosity >= 2 or error is not None):
+                    self.stdout.write(output.rstrip('\n'))
+        finally:
+            _worker_context = None
+            if progress is not None:
+                progress.close()
+
+        if verbosity >= 1:
+            self.stdout.write("%d of %d tenants done in %.2fs" % (
+                len(schemas) - len(failed), len(schemas), time.monotonic() - started))
+        if failed:
+            raise CommandError("%s failed for tenants: %s" % (self.COMMAND_NAME, ', '.join(failed)))
+
+    def run(self, schemas: List[str], processes: int) -> Iterable[TenantResult]:
+        if processes == 1 or len(schemas) <= 1:
+            for schema_name in schemas:
+                yield _run_for_schema(schema_name)
+            return
+
+        # forked processes must not share connections of this one,
+        # each of them opens its own on the first query and keeps it for all of its tenants
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(min(processes, len(schemas)))
+        try:
+            yield from pool.imap_unordered(_run_for_schema, schemas)
+        finally:
+            pool.terminate()
+            pool.join()
@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from django.db import connection
+from django.db import DEFAULT_DB_ALIAS, connection, connections
 from django.test import RequestFactory as DjangoRequestFactory, TestCase
 from django.utils.deprecation import MiddlewareMixin
 from rest_framework.test import APIRequestFactory
@@ -74,6 +74,16 @@ class TenantsTestCase(TestCase):
     def get_current_tenant(cls):
         return connection.tenant
 
+    @classmethod
+    def run_on_commit(cls, using=DEFAULT_DB_ALIAS):
+        """
+        Runs `transaction.on_commit` callbacks, as the transaction of the test case is never committed.
+        """
+        db_connection = connections[using]
+        callbacks, db_connection.run_on_commit = db_connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
+
     @classmethod
     def sync_shared(cls):
         call_command('migrate_schemas',
@@ -0,0 +1,78 @@
+import multiprocessing.dummy
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from tenancy.management.base import _run_for_schema
+from tenancy.test.cases import TenantsTestCase
+
+
+def _run_in_thread(schema_name):
+    try:
+        return _run_for_schema(schema_name)
+    finally:
+        # connections are opened per thread
+        connection.close()
+
+
+class ParallelTenantCommandTestCase(TenantsTestCase):
+    auto_create_schema = True
+    tenants_names = ['first', 'second']
+
+    def setUp(self):
+        super().setUp()
+        fd, self.progress_file = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.progress_file)
+        super().tearDown()
+
+    def call(self, **options):
+        stdout = StringIO()
+        call_command('check_campaigns_problems_schemas', skip_public=True, progress_file=self.progress_file,
+                     stdout=stdout, stderr=stdout, **options)
+        return stdout.getvalue()
+
+    def test_completed_tenants_are_skipped_on_resume(self):
+        output = self.call()
+        self.assertIn('[first] check_campaigns_problems done', output)
+        self.assertIn('[second] check_campaigns_problems done', output)
+        with open(self.progress_file) as fp:
+            self.assertEqual(['first', 'second'], fp.read().split())
+
+        with open(self.progress_file, 'w') as fp:
+            fp.write('first\n')
+        output = self.call(resume=True)
+        self.assertNotIn('[first]', output)
+        self.assertIn('[second] check_campaigns_problems done', output)
+
+    def test_failed_tenants_are_reported_and_not_completed(self):
+        with patch('campaigns.management.commands.check_campaigns_problems.Command.handle',
+                   side_effect=RuntimeError('boom')):
+            with self.assertRaisesMessage(CommandError, 'first, second'):
+                self.call()
+        with open(self.progress_file) as fp:
+            self.assertEqual('', fp.read())
+
+    def test_tenants_are_processed_in_parallel(self):
+        # forked processes could not use the connection of the test case, so the pool runs threads,
+        # which open their own connections as forked processes do
+        with patch('tenancy.management.base.multiprocessing') as multiprocessing_mock, \
+                patch('tenancy.management.base.connections.close_all') as close_all, \
+                patch('tenancy.management.base._run_for_schema', side_effect=_run_in_thread) as run_for_schema:
+            multiprocessing_mock.get_context.return_value = multiprocessing.dummy
+            output = self.call(parallel=2)
+
+        multiprocessing_mock.get_context.assert_called_once_with('fork')
+        close_all.assert_called_once_with()
+        self.assertEqual(2, run_for_schema.call_count)
+        self.assertIn('[first] check_campaigns_problems done', output)
+        self.assertIn('[second] check_campaigns_problems done', output)
+        self.assertIn('2 of 2 tenants done', output)
+        with open(self.progress_file) as fp:
+            self.assertEqual(['first', 'second'], sorted(fp.read().split()))
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from functools import wraps
 
 from celery import Task
 from celery.exceptions import Reject
@@ -50,3 +51,21 @@ class TenantSyncToAsync(DatabaseSyncToAsync):
 
 
 tenant_sync_to_async = TenantSyncToAsync
+
+
+def in_tenant_thread(func: callable) -> callable:
+    """
+    Wraps the function to be called from another thread within the schema of the current tenant.
+    Database connection opened by the thread is closed after each call.
+    """
+    tenant = connection.tenant
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            with tenant_context(tenant):
+                return func(*args, **kwargs)
+        finally:
+            connection.close()
+
+    return wrapper
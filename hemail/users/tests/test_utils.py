@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import caches
+from django.test import override_settings
+from django.utils import timezone
+
+from tenancy.test.cases import TenantsTestCase
+from users.utils import OAUTH2_TOKENS_CACHE, get_cached_oauth2_token, invalidate_cached_oauth2_token
+
+
+class _TokenEndpoint(BaseHTTPRequestHandler):
+    """ Local stand-in for provider's refresh token endpoint """
+
+    calls = 0
+
+    def do_POST(self) -> None:
+        type(self).calls += 1
+        self.rfile.read(int(self.headers['Content-Length']))
+
+        content = json.dumps(dict(
+            access_token='refreshed-%d' % type(self).calls,
+            token_type='Bearer',
+            expires_in=3600,
+        )).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class OAuth2TokenCacheTestCase(TenantsTestCase):
+    tenants_names = []
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), _TokenEndpoint)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        _TokenEndpoint.calls = 0
+        self.user = self.create_superuser('first', 'test@gmail.com', 'p')
+
+        app = SocialApp.objects.create(provider='google', name='google', client_id='id', secret='secret')
+        app.sites.add(Site.objects.get_current())
+        account = SocialAccount.objects.create(user=self.user, provider='google', uid='1')
+        SocialToken.objects.create(app=app, account=account, token='expired', token_secret='refresh',
+                                   expires_at=timezone.now() - timedelta(minutes=1))
+        invalidate_cached_oauth2_token('google', self.user)
+
+    def tearDown(self) -> None:
+        caches[OAUTH2_TOKENS_CACHE].clear()
+
+    def test_token_is_refreshed_once_and_cached(self) -> None:
+        providers = dict(settings.SOCIALACCOUNT_PROVIDERS)
+        refresh_token_url = 'http://%s:%d/token' % self.server.server_address
+        providers['google'] = dict(providers['google'], REFRESH_TOKEN_URL=refresh_token_url)
+
+        with override_settings(SOCIALACCOUNT_PROVIDERS=providers), \
+                patch.dict(os.environ, OAUTHLIB_INSECURE_TRANSPORT='1'):
+            self.assertEqual('refreshed-1', get_cached_oauth2_token('google', self.user))
+            self.assertEqual('refreshed-1', get_cached_oauth2_token('google', self.user))
+            self.assertEqual(1, _TokenEndpoint.calls)
+
+            self.assertEqual('refreshed-1', SocialToken.objects.get(account__user=self.user).token)
+
+            invalidate_cached_oauth2_token('google', self.user)
+            self.assertEqual('refreshed-1', get_cached_oauth2_token('google', self.user))
+            self.assertEqual(1, _TokenEndpoint.calls)
+
+    def test_no_token_stored(self) -> None:
+        self.assertIsNone(get_cached_oauth2_token('windowslive', self.user))
@@ -1,6 +1,8 @@
 import datetime
 import enum
 import logging
+import threading
+from collections import defaultdict
 from datetime import timedelta
 from typing import Optional
 from urllib.parse import urljoin
@@ -12,6 +14,7 @@ from allauth.socialaccount.models import SocialApp, SocialToken
 from allauth.utils import build_absolute_uri
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.db.models import Q
@@ -190,8 +193,12 @@ class MagicLinkMailer(object):
         return True
 
 
-def get_oauth2_session(social_token: SocialToken) -> OAuth2Session:
-    """ Create OAuth2 session which autoupdates the access token if it has expired """
+def get_oauth2_session(social_token: SocialToken,
+                       expiration_margin: timedelta = timedelta()) -> OAuth2Session:
+    """
+    Create OAuth2 session which autoupdates the access token if it has expired
+    or is going to expire in `expiration_margin`
+    """
 
     provider = social_token.account.get_provider()
     refresh_token_url = getattr(provider, 'refresh_token_url', None)
@@ -223,7 +230,7 @@ def get_oauth2_session(social_token: SocialToken) -> OAuth2Session:
     if not social_token.token_secret:
         raise ValueError("Social token '%s' doesn't provide refresh token ('token' field)")
 
-    expires_in = (social_token.expires_at - timezone.now()).total_seconds()
+    expires_in = (social_token.expires_at - timezone.now() - expiration_margin).total_seconds()
     token = {
         'access_token': social_token.token,
         'refresh_token': social_token.token_secret,
@@ -240,8 +247,8 @@ def get_oauth2_session(social_token: SocialToken) -> OAuth2Session:
     return session
 
 
-def get_oauth2_token(social_token: SocialToken) -> str:
-    session = get_oauth2_session(social_token)
+def get_oauth2_token(social_token: SocialToken, expiration_margin: timedelta = timedelta()) -> str:
+    session = get_oauth2_session(social_token, expiration_margin)
 
     class Dummy(HTTPAdapter):
         skip_url = 'https://example.com/imap/%s/' % hash(__file__)  # add some magic value to be sure that it is unique
@@ -269,6 +276,64 @@ def get_social_token(provider: str, user, request=None) -> Optional[SocialToken]
         return None
 
 
+OAUTH2_TOKENS_CACHE = 'oauth2-tokens'
+OAUTH2_TOKEN_EXPIRATION_MARGIN = timedelta(minutes=5)
+OAUTH2_TOKEN_REFRESH_TIMEOUT = 30
+
+_local_locks = defaultdict(threading.Lock)
+
+
+def _get_oauth2_token_cache_key(provider: str, user) -> str:
+    return 'oauth2-token|%s|%s' % (provider, user.pk)
+
+
+def _get_refresh_lock(cache, key: str):
+    """ Redis lock shared between workers or process local lock if cache doesn't support locking """
+    if hasattr(cache, 'lock'):
+        return cache.lock(key, timeout=OAUTH2_TOKEN_REFRESH_TIMEOUT)
+    return _local_locks[key]
+
+
+def get_cached_oauth2_token(provider: str, user) -> Optional[str]:
+    """
+    Returns access token stored in cache until it is going to expire. Only one worker refreshes
+    the token while others are waiting for it.
+    """
+    cache = caches[OAUTH2_TOKENS_CACHE]
+    key = _get_oauth2_token_cache_key(provider, user)
+
+    access_token = cache.get(key)
+    if access_token is not None:
+        return access_token
+
+    lock = _get_refresh_lock(cache, key + '|refresh')
+    locked = lock.acquire(True, OAUTH2_TOKEN_REFRESH_TIMEOUT)
+    if not locked:
+        logger.warning("Timed out waiting for '%s' token refresh of user %s", provider, user.pk)
+    try:
+        # the token could be refreshed by someone else while we were waiting for the lock
+        access_token = cache.get(key)
+        if access_token is not None:
+            return access_token
+
+        social_token = get_social_token(provider, user)
+        if social_token is None:
+            return None
+
+        access_token = get_oauth2_token(social_token, OAUTH2_TOKEN_EXPIRATION_MARGIN)
+        timeout = (social_token.expires_at - timezone.now() - OAUTH2_TOKEN_EXPIRATION_MARGIN).total_seconds()
+        if timeout > 0:
+            cache.set(key, access_token, timeout)
+        return access_token
+    finally:
+        if locked:
+            lock.release()
+
+
+def invalidate_cached_oauth2_token(provider: str, user) -> None:
+    caches[OAUTH2_TOKENS_CACHE].delete(_get_oauth2_token_cache_key(provider, user))
+
+
 def tenant_users() -> Q:
     from django.db import connection
     tenant = connection.tenant